@@ -1,104 +1,103 @@
 """Flask blog: authors, commenters, main feed (sort by date / content, author post count)."""
 
-from flask import Flask, request, jsonify, render_template_string
+import hashlib
 
+from flask import Flask, Response, request, jsonify, stream_with_context, url_for
+
+import connections
 import db
+import metrics
+import templates
+from config import BULK_MAX_ITEMS, read_from_cassandra, read_from_mongodb, write_to_cassandra, write_to_mongodb
 
 app = Flask(__name__)
 
-NAV = """
-  <h1>Blog</h1>
-  <nav>
-    <a href="/">Main feed (date)</a> |
-    <a href="/?sort=content">Main feed (content A-Z)</a> |
-    <a href="/users">Users</a> |
-    <a href="/posts/new">New post</a>
-  </nav>
-  <hr>
-"""
-
-FEED_HTML = """
-<!DOCTYPE html>
-<html>
-<head><title>Blog – Main feed</title></head>
-<body>
-""" + NAV + """
-  <h2>Main feed (sorted by {{ sort_label }})</h2>
-  {% for p in posts %}
-  <article style="border:1px solid #ccc; margin:10px 0; padding:10px;">
-    <h3>{{ p.title }}</h3>
-    <p><strong>Author:</strong> {{ p.author_name }} ({{ p.author_post_count }} posts)</p>
-    <p>{{ p.content }}</p>
-    <p><small>Posted {{ p.created_at }}</small></p>
-    <a href="/post/{{ p.id }}">View & comment</a>
-  </article>
-  {% endfor %}
-</body>
-</html>
-"""
-
-POST_HTML = """
-<!DOCTYPE html>
-<html>
-<head><title>Blog – Post</title></head>
-<body>
-""" + NAV + """
-  {% if post %}
-  <article style="border:1px solid #ccc; padding:15px;">
-    <h2>{{ post.title }}</h2>
-    <p><strong>Author:</strong> {{ post.author_name }} ({{ post.author_post_count }} posts)</p>
-    <p>{{ post.content }}</p>
-    <p><small>{{ post.created_at }}</small></p>
-  </article>
-  <h3>Comments</h3>
-  {% for c in comments %}
-  <p><strong>{{ c.author_name }}</strong>: {{ c.content }}</p>
-  {% endfor %}
-  <form method="post" action="/post/{{ post.id }}/comment">
-    <input type="text" name="user_id" placeholder="User ID" required>
-    <input type="text" name="content" placeholder="Comment" required>
-    <button type="submit">Add comment</button>
-  </form>
-  {% else %}
-  <p>Post not found.</p>
-  {% endif %}
-</body>
-</html>
-"""
-
-USERS_HTML = """
-<!DOCTYPE html>
-<html>
-<head><title>Blog – Users</title></head>
-<body>
-""" + NAV + """
-  <h2>Users (authors / commenters)</h2>
-  <ul>
-  {% for u in users %}
-  <li>{{ u.name }} &lt;{{ u.email }}&gt; [id: {{ u.id }}]</li>
-  {% endfor %}
-  </ul>
-  <form method="post" action="/users">
-    <input type="text" name="name" placeholder="Name" required>
-    <input type="email" name="email" placeholder="Email" required>
-    <button type="submit">Add user</button>
-  </form>
-</body>
-</html>
-"""
+
+def _query_variant() -> str:
+    """Short stable digest of the query parameters, so each variant of a URL gets its own ETag."""
+    items = sorted(request.args.items(multi=True))
+    return hashlib.sha1(repr(items).encode()).hexdigest()[:12] if items else ""
+
+
+def _with_validators(resp, etag, last_modified):
+    resp.set_etag(etag, weak=True)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "no-cache"  # cache, but revalidate every time
+    return resp
+
+
+def _not_modified(etag, last_modified):
+    """A 304 response if the client's validators are still current, else None.
+
+    Called with the stored change versions, before any data is read; If-None-Match wins over
+    If-Modified-Since (RFC 9110), which is ignored while last_modified is None (see versions).
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return _with_validators(app.response_class(status=304), etag, last_modified)
+
+
+def _streamed(chunks):
+    """HTML response sent chunk by chunk as the template renders (see templates.stream)."""
+    return Response(stream_with_context(chunks), mimetype="text/html")
+
+
+FEED_PAGE_SIZE = 50
+FEED_MAX_PAGE_SIZE = 200
+# The HTML feed shows summaries; the full body is on the post page.
+FEED_HTML_EXCERPT_LEN = 300
+
+
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+USER_LOOKUP_LIMIT = 10
+USER_LOOKUP_MAX_LIMIT = 50
+
+
+def _limit_arg(default: int, maximum: int) -> int:
+    limit = request.args.get("limit", default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def _feed_limit() -> int:
+    return _limit_arg(FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE)
+
+
+def _user_view(u: dict) -> dict:
+    return {"id": u["id"], "name": u.get("name", ""), "email": u.get("email", "")}
 
 
 @app.route("/")
 def main_feed():
+    etag, last_modified = db.feed_validator("html-" + _query_variant())
+    cached = _not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
     sort_by = request.args.get("sort", "date")
     if sort_by == "content":
         sort_label = "content (A-Z)"
     else:
         sort_label = "date (newest first)"
-    posts = db.feed_posts(sort_by=sort_by, limit=50)
+    try:
+        posts, next_cursor = db.feed_page(
+            sort_by=sort_by, limit=_feed_limit(), cursor=request.args.get("cursor"), excerpt_len=FEED_HTML_EXCERPT_LEN
+        )
+    except ValueError:
+        return "invalid cursor", 400
     for p in posts:
         p["created_at"] = str(p.get("created_at", ""))
-    return render_template_string(FEED_HTML, posts=posts, sort_label=sort_label)
+    next_url = None
+    if next_cursor:
+        next_url = url_for("main_feed", **{**request.args.to_dict(), "cursor": next_cursor})
+    page = templates.stream(templates.FEED, posts=posts, sort_label=sort_label, next_url=next_url)
+    return _with_validators(_streamed(page), etag, last_modified)
 
 
 @app.route("/post/<post_id>", methods=["GET", "POST"])
@@ -111,12 +110,13 @@ def post_detail(post_id):
     post["author_post_count"] = db.count_posts_by_user(post["user_id"])
     post["created_at"] = str(post.get("created_at", ""))
     comments = db.get_comments_for_post(post_id)
+    users = db.get_users(c["user_id"] for c in comments)
     for c in comments:
-        u = db.get_user(c["user_id"])
+        u = users.get(c["user_id"])
         c["author_name"] = u["name"] if u else "Unknown"
         c["user_name"] = c["author_name"]
         c["created_at"] = str(c.get("created_at", ""))
-    return render_template_string(POST_HTML, post=post, comments=comments)
+    return _streamed(templates.stream(templates.POST, post=post, comments=comments))
 
 
 @app.route("/post/<post_id>/comment", methods=["POST"])
@@ -138,25 +138,9 @@ def new_post():
         if user_id and title:
             db.create_post(user_id, title, content)
             return __import__("flask").redirect("/")
-    users_list = db.list_users()
-    new_post_html = """
-<!DOCTYPE html>
-<html>
-<head><title>Blog – New post</title></head>
-<body>
-""" + NAV + """
-  <h2>New post</h2>
-  <form method="post" action="/posts/new">
-    <p><label>Author (user id): <input type="text" name="user_id" required></label></p>
-    <p><label>Title: <input type="text" name="title" required></label></p>
-    <p><label>Content: <textarea name="content" rows="4"></textarea></label></p>
-    <button type="submit">Create post</button>
-  </form>
-  <p>User IDs: {% for u in users %}{{ u.id }} ({{ u.name }}) {% endfor %}</p>
-</body>
-</html>
-"""
-    return render_template_string(new_post_html, users=users_list)
+    q = request.args.get("q", "")
+    users_list = db.find_users(q, USER_LOOKUP_LIMIT) if q else []
+    return templates.NEW_POST.render(users=users_list, q=q)
 
 
 @app.route("/users", methods=["GET", "POST"])
@@ -167,8 +151,12 @@ def users():
         if name and email:
             db.create_user(name, email)
         return __import__("flask").redirect("/users")
-    users_list = db.list_users()
-    return render_template_string(USERS_HTML, users=users_list)
+    try:
+        users_list, next_cursor = db.list_users_page(USERS_PAGE_SIZE, request.args.get("cursor"))
+    except ValueError:
+        return "invalid cursor", 400
+    next_url = url_for("users", cursor=next_cursor) if next_cursor else None
+    return templates.USERS.render(users=users_list, next_url=next_url)
 
 
 # --- API for programmatic use ---
@@ -181,9 +169,32 @@ def api_create_user():
     if not name or not email:
         return jsonify({"error": "name and email required"}), 400
     user = db.create_user(name, email)
+    user.pop("_id", None)
     return jsonify(user), 201
 
 
+@app.route("/api/users", methods=["GET"])
+def api_list_users():
+    """User directory ordered by name (case-insensitive): {"users": [{id, name, email}], "next_cursor"}.
+
+    ?limit=N sets the page size; pass the returned next_cursor as ?cursor=... for the next page.
+    """
+    try:
+        users_list, next_cursor = db.list_users_page(
+            _limit_arg(USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE), request.args.get("cursor")
+        )
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    return jsonify({"users": [_user_view(u) for u in users_list], "next_cursor": next_cursor})
+
+
+@app.route("/api/users/lookup")
+def api_lookup_users():
+    """Users whose name or email starts with ?q= (case-insensitive), at most ?limit= (default 10)."""
+    users_list = db.find_users(request.args.get("q", ""), _limit_arg(USER_LOOKUP_LIMIT, USER_LOOKUP_MAX_LIMIT))
+    return jsonify({"users": [_user_view(u) for u in users_list]})
+
+
 @app.route("/api/posts", methods=["POST"])
 def api_create_post():
     data = request.get_json() or {}
@@ -193,15 +204,105 @@ def api_create_post():
     if not user_id or not title:
         return jsonify({"error": "user_id and title required"}), 400
     post = db.create_post(user_id, title, content or "")
+    post.pop("_id", None)
     return jsonify(post), 201
 
 
+class _BulkRejected(Exception):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.message, self.status = message, status
+
+
+def _bulk_items(data, key: str, fields: tuple, required: tuple) -> tuple[list, list, list]:
+    """Validate a bulk body: a JSON array of items or {key: [...]}, at most BULK_MAX_ITEMS.
+
+    Returns (results, valid, positions): results has an error for each invalid item and None
+    elsewhere; valid holds the cleaned items to write and positions their input indexes.
+    Raises _BulkRejected when the body as a whole is unusable.
+    """
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise _BulkRejected(f"expected a JSON array or {{\"{key}\": [...]}}", 400)
+    if len(items) > BULK_MAX_ITEMS:
+        raise _BulkRejected(f"at most {BULK_MAX_ITEMS} {key} per request", 413)
+    results = [None] * len(items)
+    valid, positions = [], []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {"error": "item must be an object"}
+            continue
+        values = {f: str(item.get(f) or "").strip() for f in fields}
+        missing = [f for f in required if not values[f]]
+        if missing:
+            results[i] = {"error": f"{' and '.join(missing)} required"}
+            continue
+        valid.append(values)
+        positions.append(i)
+    return results, valid, positions
+
+
+def _bulk_summary(results: list) -> tuple[dict, int]:
+    """Response body and status: 201 if every item was created, 207 if some failed."""
+    created = sum("id" in r for r in results)
+    return {"created": created, "failed": len(results) - created, "results": results}, (
+        201 if created == len(results) else 207
+    )
+
+
+def _bulk_create(key: str, fields: tuple, required: tuple, create_many):
+    """Shared body of the /api/*/bulk routes: invalid items get an error result, the rest go to
+    create_many in one call; one result per input item, in order."""
+    try:
+        results, valid, positions = _bulk_items(request.get_json(silent=True), key, fields, required)
+    except _BulkRejected as e:
+        return jsonify({"error": e.message}), e.status
+    if valid:
+        for i, r in zip(positions, create_many(valid)):
+            results[i] = r
+    body, status = _bulk_summary(results)
+    return jsonify(body), status
+
+
+@app.route("/api/users/bulk", methods=["POST"])
+def api_create_users_bulk():
+    return _bulk_create("users", ("name", "email"), ("name", "email"), db.create_users)
+
+
+@app.route("/api/posts/bulk", methods=["POST"])
+def api_create_posts_bulk():
+    return _bulk_create("posts", ("user_id", "title", "content"), ("user_id", "title"), db.create_posts)
+
+
+@app.route("/api/comments/bulk", methods=["POST"])
+def api_create_comments_bulk():
+    return _bulk_create(
+        "comments", ("post_id", "user_id", "content"), ("post_id", "user_id", "content"), db.create_comments
+    )
+
+
 @app.route("/api/feed")
 def api_feed():
-    """Main feed: list of posts. Each post has user_name, user_id, created_at, id, content, author_post_count (Iteration 2)."""
+    """Main feed: list of posts. Each post has user_name, user_id, created_at, id, content, author_post_count (Iteration 2).
+
+    ?limit=N sets the page size; pass the returned next_cursor as ?cursor=... for the next page.
+    ?excerpt_len=N returns summaries: "excerpt" (first N characters, N <= FEED_EXCERPT_MAX_LEN) and
+    "truncated" in place of "content"; the full body is on /api/post/<id>.
+    """
+    etag, last_modified = db.feed_validator("api-" + _query_variant())
+    cached = _not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
     sort_by = request.args.get("sort", "date")
     include_comments = request.args.get("comments", "").lower() in ("1", "true", "yes")
-    posts = db.feed_posts(sort_by=sort_by, limit=50)
+    excerpt_len = request.args.get("excerpt_len", type=int)
+    try:
+        posts, next_cursor = db.feed_page(
+            sort_by=sort_by, limit=_feed_limit(), cursor=request.args.get("cursor"), excerpt_len=excerpt_len
+        )
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    comments = db.get_comments_for_posts_with_authors(p["id"] for p in posts) if include_comments else {}
     out = []
     for p in posts:
         o = {
@@ -209,25 +310,61 @@ def api_feed():
             "user_id": p.get("user_id"),
             "user_name": p.get("user_name", p.get("author_name", "Unknown")),
             "created_at": str(p.get("created_at", "")),
-            "content": p.get("content", ""),
             "title": p.get("title", ""),
             "author_post_count": p.get("author_post_count", 0),
         }
+        if excerpt_len is None:
+            o["content"] = p.get("content", "")
+        else:
+            o["excerpt"] = p.get("excerpt", "")
+            o["truncated"] = p.get("content_length", 0) > len(o["excerpt"])
         if include_comments:
-            full = db.get_post_with_comments(p["id"])
-            o["comments"] = full["comments"] if full else []
+            o["comments"] = comments.get(p["id"], [])
         out.append(o)
-    return jsonify({"posts": out})
+    return _with_validators(jsonify({"posts": out, "next_cursor": next_cursor}), etag, last_modified)
 
 
 @app.route("/api/post/<post_id>")
 def api_post_detail(post_id):
-    """Single post in Iteration 2 shape: user_name, user_id, created_at, id, content, comments (user_name, user_id, content)."""
-    post = db.get_post_with_comments(post_id)
+    """Single post in Iteration 2 shape: user_name, user_id, created_at, id, content, comments (user_name, user_id, content).
+
+    Optional ?comments_limit=N&comments_cursor=... pages the comments (next_comments_cursor in the response).
+    """
+    etag, last_modified = db.post_validator(post_id, _query_variant())
+    cached = _not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    comments_limit = request.args.get("comments_limit", type=int)
+    if comments_limit is not None:
+        comments_limit = max(1, min(comments_limit, 500))
+    try:
+        post = db.get_post_with_comments(
+            post_id, comments_limit=comments_limit, comments_cursor=request.args.get("comments_cursor")
+        )
+    except ValueError:
+        return jsonify({"error": "invalid comments_cursor"}), 400
     if not post:
         return jsonify({"error": "Post not found"}), 404
+    post.pop("_id", None)  # MongoDB ObjectId; "id" carries the same value as a string
     post["created_at"] = str(post.get("created_at", ""))
-    return jsonify(post)
+    return _with_validators(jsonify(post), etag, last_modified)
+
+
+@app.route("/healthz")
+def healthz():
+    """Ping the backends the current READ_SOURCE mode actually uses."""
+    status = connections.health(
+        mongodb=read_from_mongodb() or write_to_mongodb(),
+        cassandra=read_from_cassandra() or write_to_cassandra(),
+    )
+    ok = all(status.values())
+    return jsonify({"ok": ok, "backends": status}), 200 if ok else 503
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of the operation metrics (summed over workers when METRICS_DIR is set)."""
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 
 if __name__ == "__main__":
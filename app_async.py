@@ -0,0 +1,324 @@
+"""ASGI variant of app.py on Quart and db_async: same routes, templates and responses.
+
+A page's independent lookups are awaited concurrently (see db_async.get_post_page), and a
+worker keeps many requests in flight while they wait on MongoDB or Cassandra instead of
+holding a thread per request. Run with an ASGI server, e.g.:
+  hypercorn app_async:app --workers 4 --bind 0.0.0.0:5000
+"""
+
+import asyncio
+import hashlib
+
+from quart import Quart, Response, jsonify, redirect, request, url_for
+
+import connections
+import db_async
+import metrics
+import templates
+from app import (
+    FEED_HTML_EXCERPT_LEN,
+    FEED_MAX_PAGE_SIZE,
+    FEED_PAGE_SIZE,
+    USER_LOOKUP_LIMIT,
+    USER_LOOKUP_MAX_LIMIT,
+    USERS_MAX_PAGE_SIZE,
+    USERS_PAGE_SIZE,
+    _BulkRejected,
+    _bulk_items,
+    _bulk_summary,
+    _user_view,
+)
+from config import read_from_cassandra, read_from_mongodb, write_to_cassandra, write_to_mongodb
+
+app = Quart(__name__)
+
+
+@app.before_serving
+async def _connect():
+    # Connect (and run the schema / index / prepare hooks) before the first request, off the loop.
+    await asyncio.to_thread(
+        connections.health,
+        mongodb=read_from_mongodb() or write_to_mongodb(),
+        cassandra=read_from_cassandra() or write_to_cassandra(),
+    )
+
+
+def _query_variant() -> str:
+    items = sorted(request.args.items(multi=True))
+    return hashlib.sha1(repr(items).encode()).hexdigest()[:12] if items else ""
+
+
+def _with_validators(resp, etag, last_modified):
+    resp.set_etag(etag, weak=True)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def _not_modified(etag, last_modified):
+    """A 304 response if the client's validators are still current, else None (see app._not_modified)."""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return _with_validators(app.response_class("", status=304), etag, last_modified)
+
+
+def _streamed(chunks):
+    """Chunked HTML response (see app._streamed); an async body so Quart does not hop a thread per chunk."""
+    async def body():
+        for chunk in chunks:
+            yield chunk.encode()
+    return Response(body(), mimetype="text/html")
+
+
+def _limit_arg(default: int, maximum: int) -> int:
+    limit = request.args.get("limit", default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def _feed_limit() -> int:
+    return _limit_arg(FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE)
+
+
+@app.route("/")
+async def main_feed():
+    etag, last_modified = await db_async.feed_validator("html-" + _query_variant())
+    cached = _not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    sort_by = request.args.get("sort", "date")
+    sort_label = "content (A-Z)" if sort_by == "content" else "date (newest first)"
+    try:
+        posts, next_cursor = await db_async.feed_page(
+            sort_by=sort_by, limit=_feed_limit(), cursor=request.args.get("cursor"), excerpt_len=FEED_HTML_EXCERPT_LEN
+        )
+    except ValueError:
+        return "invalid cursor", 400
+    for p in posts:
+        p["created_at"] = str(p.get("created_at", ""))
+    next_url = None
+    if next_cursor:
+        next_url = url_for("main_feed", **{**request.args.to_dict(), "cursor": next_cursor})
+    page = templates.stream(templates.FEED, posts=posts, sort_label=sort_label, next_url=next_url)
+    return _with_validators(_streamed(page), etag, last_modified)
+
+
+@app.route("/post/<post_id>", methods=["GET", "POST"])
+async def post_detail(post_id):
+    page = await db_async.get_post_page(post_id)
+    if page is None:
+        return "Post not found", 404
+    post, comments, users = page
+    post["created_at"] = str(post.get("created_at", ""))
+    for c in comments:
+        u = users.get(c["user_id"])
+        c["author_name"] = c["user_name"] = u["name"] if u else "Unknown"
+        c["created_at"] = str(c.get("created_at", ""))
+    return _streamed(templates.stream(templates.POST, post=post, comments=comments))
+
+
+@app.route("/post/<post_id>/comment", methods=["POST"])
+async def add_comment(post_id):
+    form = await request.form
+    user_id = form.get("user_id", "").strip()
+    content = form.get("content", "").strip()
+    if not user_id or not content:
+        return "user_id and content required", 400
+    await db_async.create_comment(post_id, user_id, content)
+    return redirect(f"/post/{post_id}")
+
+
+@app.route("/posts/new", methods=["GET", "POST"])
+async def new_post():
+    if request.method == "POST":
+        form = await request.form
+        user_id = form.get("user_id", "").strip()
+        title = form.get("title", "").strip()
+        content = form.get("content", "").strip()
+        if user_id and title:
+            await db_async.create_post(user_id, title, content)
+            return redirect("/")
+    q = request.args.get("q", "")
+    users = await db_async.find_users(q, USER_LOOKUP_LIMIT) if q else []
+    return templates.NEW_POST.render(users=users, q=q)
+
+
+@app.route("/users", methods=["GET", "POST"])
+async def users():
+    if request.method == "POST":
+        form = await request.form
+        name = form.get("name", "").strip()
+        email = form.get("email", "").strip()
+        if name and email:
+            await db_async.create_user(name, email)
+        return redirect("/users")
+    try:
+        users_list, next_cursor = await db_async.list_users_page(USERS_PAGE_SIZE, request.args.get("cursor"))
+    except ValueError:
+        return "invalid cursor", 400
+    next_url = url_for("users", cursor=next_cursor) if next_cursor else None
+    return templates.USERS.render(users=users_list, next_url=next_url)
+
+
+# --- API for programmatic use ---
+
+@app.route("/api/users", methods=["POST"])
+async def api_create_user():
+    data = await request.get_json(silent=True) or {}
+    name = str(data.get("name") or "").strip()
+    email = str(data.get("email") or "").strip()
+    if not name or not email:
+        return jsonify({"error": "name and email required"}), 400
+    user = await db_async.create_user(name, email)
+    user.pop("_id", None)
+    return jsonify(user), 201
+
+
+@app.route("/api/users", methods=["GET"])
+async def api_list_users():
+    """User directory page, same shape and parameters as app.api_list_users (limit, cursor)."""
+    try:
+        users_list, next_cursor = await db_async.list_users_page(
+            _limit_arg(USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE), request.args.get("cursor")
+        )
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    return jsonify({"users": [_user_view(u) for u in users_list], "next_cursor": next_cursor})
+
+
+@app.route("/api/users/lookup")
+async def api_lookup_users():
+    """Name / email prefix lookup, same shape and parameters as app.api_lookup_users (q, limit)."""
+    users_list = await db_async.find_users(
+        request.args.get("q", ""), _limit_arg(USER_LOOKUP_LIMIT, USER_LOOKUP_MAX_LIMIT)
+    )
+    return jsonify({"users": [_user_view(u) for u in users_list]})
+
+
+@app.route("/api/posts", methods=["POST"])
+async def api_create_post():
+    data = await request.get_json(silent=True) or {}
+    user_id = str(data.get("user_id") or "").strip()
+    title = str(data.get("title") or "").strip()
+    content = str(data.get("content") or "").strip()
+    if not user_id or not title:
+        return jsonify({"error": "user_id and title required"}), 400
+    post = await db_async.create_post(user_id, title, content)
+    post.pop("_id", None)
+    return jsonify(post), 201
+
+
+async def _bulk_create(key: str, fields: tuple, required: tuple, create_many):
+    try:
+        results, valid, positions = _bulk_items(await request.get_json(silent=True), key, fields, required)
+    except _BulkRejected as e:
+        return jsonify({"error": e.message}), e.status
+    if valid:
+        for i, r in zip(positions, await create_many(valid)):
+            results[i] = r
+    body, status = _bulk_summary(results)
+    return jsonify(body), status
+
+
+@app.route("/api/users/bulk", methods=["POST"])
+async def api_create_users_bulk():
+    return await _bulk_create("users", ("name", "email"), ("name", "email"), db_async.create_users)
+
+
+@app.route("/api/posts/bulk", methods=["POST"])
+async def api_create_posts_bulk():
+    return await _bulk_create("posts", ("user_id", "title", "content"), ("user_id", "title"), db_async.create_posts)
+
+
+@app.route("/api/comments/bulk", methods=["POST"])
+async def api_create_comments_bulk():
+    return await _bulk_create(
+        "comments", ("post_id", "user_id", "content"), ("post_id", "user_id", "content"), db_async.create_comments
+    )
+
+
+@app.route("/api/feed")
+async def api_feed():
+    """Main feed, same shape and parameters as app.api_feed (limit, cursor, sort, comments, excerpt_len)."""
+    etag, last_modified = await db_async.feed_validator("api-" + _query_variant())
+    cached = _not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    sort_by = request.args.get("sort", "date")
+    include_comments = request.args.get("comments", "").lower() in ("1", "true", "yes")
+    excerpt_len = request.args.get("excerpt_len", type=int)
+    try:
+        posts, next_cursor = await db_async.feed_page(
+            sort_by=sort_by, limit=_feed_limit(), cursor=request.args.get("cursor"), excerpt_len=excerpt_len
+        )
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    comments = await db_async.get_comments_for_posts_with_authors(p["id"] for p in posts) if include_comments else {}
+    out = []
+    for p in posts:
+        o = {
+            "id": p.get("id"),
+            "user_id": p.get("user_id"),
+            "user_name": p.get("user_name", p.get("author_name", "Unknown")),
+            "created_at": str(p.get("created_at", "")),
+            "title": p.get("title", ""),
+            "author_post_count": p.get("author_post_count", 0),
+        }
+        if excerpt_len is None:
+            o["content"] = p.get("content", "")
+        else:
+            o["excerpt"] = p.get("excerpt", "")
+            o["truncated"] = p.get("content_length", 0) > len(o["excerpt"])
+        if include_comments:
+            o["comments"] = comments.get(p["id"], [])
+        out.append(o)
+    return _with_validators(jsonify({"posts": out, "next_cursor": next_cursor}), etag, last_modified)
+
+
+@app.route("/api/post/<post_id>")
+async def api_post_detail(post_id):
+    """Single post, same shape and parameters as app.api_post_detail (comments_limit, comments_cursor)."""
+    etag, last_modified = await db_async.post_validator(post_id, _query_variant())
+    cached = _not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    comments_limit = request.args.get("comments_limit", type=int)
+    if comments_limit is not None:
+        comments_limit = max(1, min(comments_limit, 500))
+    try:
+        post = await db_async.get_post_with_comments(
+            post_id, comments_limit=comments_limit, comments_cursor=request.args.get("comments_cursor")
+        )
+    except ValueError:
+        return jsonify({"error": "invalid comments_cursor"}), 400
+    if not post:
+        return jsonify({"error": "Post not found"}), 404
+    post.pop("_id", None)
+    post["created_at"] = str(post.get("created_at", ""))
+    return _with_validators(jsonify(post), etag, last_modified)
+
+
+@app.route("/healthz")
+async def healthz():
+    status = await asyncio.to_thread(
+        connections.health,
+        mongodb=read_from_mongodb() or write_to_mongodb(),
+        cassandra=read_from_cassandra() or write_to_cassandra(),
+    )
+    ok = all(status.values())
+    return jsonify({"ok": ok, "backends": status}), 200 if ok else 503
+
+
+@app.route("/metrics")
+async def metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,24 @@
+"""
+Backfill job: set content_sort_key on MongoDB posts created before it existed.
+
+The content-sorted feed reads posts by content_sort_key (cursors.content_sort_key, the same
+key Cassandra's posts_by_content is clustered by); posts without it are missing from that
+feed until this runs. Idempotent, so it can be rerun safely. Cassandra needs nothing.
+Usage:
+  python backfill_content_sort_key.py
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+
+def main(argv):
+    import db_mongo
+    print(f"MongoDB: set content_sort_key on {db_mongo.mongo_backfill_content_sort_key()} posts")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,35 @@
+"""
+Backfill job: build the user directory / prefix lookup data for users created before it existed.
+
+MongoDB users get their name_lower / email_lower fields; Cassandra's users_by_prefix table is
+rebuilt from users. Both are idempotent, so the job can be rerun safely.
+Usage:
+  python backfill_user_lookup.py [--mongodb] [--cassandra]
+
+With no flags, backfills whichever stores the current READ_SOURCE mode writes to.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from config import write_to_cassandra, write_to_mongodb
+
+
+def main(argv):
+    do_mongo = "--mongodb" in argv
+    do_cassandra = "--cassandra" in argv
+    if not do_mongo and not do_cassandra:
+        do_mongo, do_cassandra = write_to_mongodb(), write_to_cassandra()
+    if do_mongo:
+        import db_mongo
+        print(f"MongoDB: set lookup fields on {db_mongo.mongo_backfill_user_lookup()} users")
+    if do_cassandra:
+        import db_cassandra
+        print(f"Cassandra: wrote users_by_prefix rows for {db_cassandra.cassandra_backfill_users_by_prefix()} users")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
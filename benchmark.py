@@ -0,0 +1,795 @@
+"""
+Benchmark: seed a dataset, drive the app.py endpoints and report latency and queries per request.
+
+Runs fully offline: MongoDB is mongomock and Cassandra is an in-memory fake session that
+executes the statements registered in db_cassandra.STATEMENTS, so numbers measure the
+application's own work (routing, fan-out, serialisation, templates) and the number of
+backend round trips, not a real cluster. Compare runs against a saved baseline to see what
+a change did.
+Usage:
+  python benchmark.py                                    # all modes, default dataset
+  python benchmark.py --users 500 --posts 5000 --comments 20000 --requests 300
+  python benchmark.py --modes mongodb_only,cassandra_only --only api_feed,api_post
+  python benchmark.py --out bench.json                   # save results ...
+  python benchmark.py --baseline bench.json              # ... and compare a later run with them
+
+The same seeded dataset (deterministic for a given --seed) is written to both stores, then
+every scenario runs --requests times in each READ_SOURCE mode through the Flask test client.
+Reads run before writes in each mode; the write scenarios grow the dataset a little as they
+go. Queries per request count MongoDB collection operations and Cassandra executions
+(a batch counts once, concurrent statements each count); dual-write and shadow-read
+replays on background threads are included.
+
+Requires: mongomock (no MongoDB or Cassandra needed).
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import mongomock
+from cassandra.metadata import Murmur3Token
+from bson import ObjectId
+
+import config
+import connections
+import db
+import db_cassandra
+import db_mongo
+import shadow
+from app import app
+
+MODES = ("mongodb_only", "double_write", "shadow_read", "read_migration", "cassandra_only")
+EPOCH = datetime(2024, 1, 1)
+WORDS = (
+    "apple banana cassandra delta echo feed graph hello index join kernel latency mongo node "
+    "order partition query replica shard token update vector write yield zone"
+).split()
+
+_counts_lock = threading.Lock()
+_counts = {"mongodb": 0, "cassandra": 0}
+
+
+def _count(backend: str, n: int = 1):
+    with _counts_lock:
+        _counts[backend] += n
+
+
+def query_counts() -> tuple[int, int]:
+    with _counts_lock:
+        return _counts["mongodb"], _counts["cassandra"]
+
+
+# --- MongoDB stand-in ---
+
+_MONGO_OPS = (
+    "find", "find_one", "insert_one", "insert_many", "update_one", "update_many", "count_documents",
+    "aggregate", "bulk_write", "find_one_and_update", "delete_one", "delete_many", "distinct",
+)
+
+
+def _counted(fn):
+    def wrapper(self, *args, **kwargs):
+        _count("mongodb")
+        return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def _evaluate(expr, doc):
+    """The few aggregation expressions db_mongo uses in find() projections, which mongomock lacks."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict):
+        (op, arg), = expr.items()
+        if op == "$ifNull":
+            value = _evaluate(arg[0], doc)
+            return _evaluate(arg[1], doc) if value is None else value
+        if op == "$substrCP":
+            return _evaluate(arg[0], doc)[arg[1]:arg[1] + arg[2]]
+        if op == "$strLenCP":
+            return len(_evaluate(arg, doc))
+    return expr
+
+
+class _ProjectedCursor:
+    """mongomock cursor wrapper adding computed projection fields to each document."""
+
+    def __init__(self, cursor, keep: set, computed: dict):
+        self.cursor, self.keep, self.computed = cursor, keep, computed
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self.cursor = self.cursor.limit(n)
+        return self
+
+    def __iter__(self):
+        for doc in self.cursor:
+            source = dict(doc)
+            for field in list(doc):
+                if field not in self.keep:
+                    del doc[field]
+            doc.update({field: _evaluate(expr, source) for field, expr in self.computed.items()})
+            yield doc
+
+
+def _find_with_expressions(find):
+    def wrapper(self, filter=None, projection=None, *args, **kwargs):
+        if not isinstance(projection, dict) or not any(isinstance(v, dict) for v in projection.values()):
+            return find(self, filter, projection, *args, **kwargs)
+        computed = {k: v for k, v in projection.items() if isinstance(v, dict)}
+        keep = {"_id"} | {k for k, v in projection.items() if not isinstance(v, dict)}
+        return _ProjectedCursor(find(self, filter, None, *args, **kwargs), keep, computed)
+    return wrapper
+
+
+def _without_sort(add):
+    """mongomock's bulk builder predates the sort option pymongo now passes for UpdateOne/ReplaceOne."""
+    def wrapper(self, *args, sort=None, **kwargs):
+        return add(self, *args, **kwargs)
+    wrapper._patched = True
+    return wrapper
+
+
+def install_mongomock():
+    """Point connections at a mongomock client (indexes provisioned as ensure_indexes.py does) and count its operations."""
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        if not getattr(getattr(builder, name), "_patched", False):
+            setattr(builder, name, _without_sort(getattr(builder, name)))
+    for name in _MONGO_OPS:
+        fn = getattr(mongomock.collection.Collection, name, None)
+        if fn is not None and not getattr(fn, "_counted", False):
+            wrapped = _counted(fn)
+            wrapped._counted = True
+            setattr(mongomock.collection.Collection, name, wrapped)
+    find = mongomock.collection.Collection.find
+    if not getattr(find, "_expressions", False):
+        wrapped = _find_with_expressions(find)
+        wrapped._counted = wrapped._expressions = True
+        mongomock.collection.Collection.find = wrapped
+    client = mongomock.MongoClient()
+    for hook in connections._mongo_hooks:
+        hook(client)
+    db_mongo.mongo_ensure_indexes(client)
+    connections._mongo_client = client
+
+
+# --- Cassandra stand-in ---
+
+class FakeResult(list):
+    def one(self):
+        return self[0] if self else None
+
+
+class FakeResponseFuture:
+    has_more_pages = False
+
+    def __init__(self, rows=None, error=None):
+        self.rows, self.error = rows, error
+
+    def add_callbacks(self, callback, errback):
+        if self.error is not None:
+            errback(self.error)
+        else:
+            callback(self.rows)
+
+
+class FakeBatch:
+    """Stand-in for cassandra.query.BatchStatement: applied by FakeSession.execute as one round trip."""
+
+    def __init__(self, *args, **kwargs):
+        self.entries = []
+
+    def add(self, statement, parameters=()):
+        self.entries.append((statement, tuple(parameters or ())))
+
+
+class FakePrepared:
+    def __init__(self, name: str, cql: str):
+        self.name = name
+        self.fetch_size = None
+        self.is_idempotent = False
+        m = re.match(r"SELECT (.+?) FROM", cql)
+        columns = [] if not m else [c.strip() for c in m.group(1).split(",")]
+        columns = ["count" if c == "COUNT(*)" else c for c in columns]
+        self.row_type = namedtuple(f"{name}_row", columns) if columns else None
+
+
+class _Clustered:
+    """One partition: rows by clustering key, iterated in clustering order (sorted lazily)."""
+
+    def __init__(self, descending: bool = False):
+        self.rows = {}
+        self.descending = descending
+        self._keys = None
+
+    def put(self, key, row):
+        self.rows[key] = row
+        self._keys = None
+
+    def delete(self, key):
+        if self.rows.pop(key, None) is not None:
+            self._keys = None
+
+    def keys(self):
+        if self._keys is None:
+            self._keys = sorted(self.rows, reverse=self.descending)
+        return self._keys
+
+
+class FakeSession:
+    """In-memory Cassandra session executing the statements registered in db_cassandra.STATEMENTS.
+
+    Raw CQL strings (schema DDL, health checks) are accepted and ignored; prepared statements
+    are dispatched on their registry name to a handler below.
+    """
+
+    def __init__(self):
+        self.default_timeout = None
+        self.users = {}
+        self.posts = {}
+        self.comments = {}
+        self.post_counts = {}
+        self.posts_by_day = {}
+        self.posts_by_content = {}
+        self.post_summaries_by_day = {}
+        self.users_by_prefix = {}
+        self.post_summaries_by_content = {}
+        self.comments_by_post = {}
+        self.feed_buckets = {}
+        self.change_versions = {}
+        self._lock = threading.RLock()
+
+    def set_keyspace(self, keyspace: str):
+        pass
+
+    def prepare(self, cql: str):
+        name = _STATEMENT_NAMES[cql]
+        return FakePrepared(name, cql)
+
+    def execute(self, statement, parameters=(), timeout=None):
+        _count("cassandra")
+        return self._run(statement, parameters)
+
+    def execute_async(self, statement, parameters=(), timeout=None):
+        """Completed single-page response future, for db_async."""
+        _count("cassandra")
+        try:
+            return FakeResponseFuture(self._run(statement, parameters))
+        except Exception as e:
+            return FakeResponseFuture(error=e)
+
+    def _run(self, statement, parameters):
+        if isinstance(statement, str):
+            return FakeResult()
+        with self._lock:
+            if isinstance(statement, FakeBatch):
+                for stmt, params in statement.entries:
+                    self._run(stmt, params)
+                return FakeResult()
+            handler = getattr(self, "_" + statement.name, None)
+            if handler is None:
+                raise NotImplementedError(f"benchmark session does not implement {statement.name}")
+            rows = handler(*(parameters or ())) or []
+            if statement.row_type is None:
+                return FakeResult()
+            fields = statement.row_type._fields
+            return FakeResult(statement.row_type(*(r.get(f) for f in fields)) for r in rows)
+
+    def _partition(self, table: dict, key, descending: bool = False) -> _Clustered:
+        part = table.get(key)
+        if part is None:
+            part = table[key] = _Clustered(descending)
+        return part
+
+    @staticmethod
+    def _page(part, limit, after=None, before=None):
+        out = []
+        if part is None:
+            return out
+        for key in part.keys():
+            if after is not None and key <= after:
+                continue
+            if before is not None and key >= before:
+                continue
+            out.append(part.rows[key])
+            if len(out) >= limit:
+                break
+        return out
+
+    # users
+    def _user_insert(self, uid, name, email, created_at):
+        self.users[uid] = {"id": uid, "name": name, "email": email, "created_at": created_at}
+
+    def _user_get(self, uid):
+        return [self.users[uid]] if uid in self.users else []
+
+    def _user_scan(self):
+        return list(self.users.values())
+
+    def _user_delete(self, uid):
+        self.users.pop(uid, None)
+
+    def _user_by_prefix_insert(self, field, prefix, term, uid, name, email, created_at):
+        row = {"field": field, "prefix": prefix, "term": term, "id": uid, "name": name, "email": email,
+               "created_at": created_at}
+        self._partition(self.users_by_prefix, (field, prefix)).put((term, uid), row)
+
+    def _users_by_prefix_range(self, field, prefix, lo, hi, limit):
+        part = self.users_by_prefix.get((field, prefix))
+        rows = [] if part is None else [part.rows[k] for k in part.keys() if lo <= k[0] < hi]
+        return rows[:limit]
+
+    def _users_by_prefix_page(self, field, prefix, limit):
+        return self._page(self.users_by_prefix.get((field, prefix)), limit)
+
+    def _users_by_prefix_after(self, field, prefix, term, uid, limit):
+        return self._page(self.users_by_prefix.get((field, prefix)), limit, after=(term, uid))
+
+    def _user_by_prefix_delete(self, field, prefix, term, uid):
+        if (field, prefix) in self.users_by_prefix:
+            self.users_by_prefix[(field, prefix)].delete((term, uid))
+
+    # change versions
+    def _version_set(self, version, changed_at, key):
+        self.change_versions[key] = {"key": key, "version": version, "changed_at": changed_at}
+
+    def _versions_get(self, keys):
+        return [self.change_versions[k] for k in keys if k in self.change_versions]
+
+    # counters
+    def _post_count_get(self, uid):
+        return [{"user_id": uid, "post_count": self.post_counts[uid]}] if uid in self.post_counts else []
+
+    def _post_count_add(self, delta, uid):
+        self.post_counts[uid] = self.post_counts.get(uid, 0) + delta
+
+    def _post_count_scan(self):
+        return [{"user_id": uid, "post_count": n} for uid, n in self.post_counts.items()]
+
+    def _post_count_by_author(self, uid):
+        return [{"count": sum(1 for p in self.posts.values() if p["user_id"] == uid)}]
+
+    # posts and feed tables
+    def _post_insert(self, pid, user_id, title, content, created_at):
+        self.posts[pid] = {"id": pid, "user_id": user_id, "title": title, "content": content, "created_at": created_at}
+
+    def _post_by_day_insert(self, day, created_at, pid, user_id, title, content):
+        row = {"day": day, "id": pid, "user_id": user_id, "title": title, "content": content, "created_at": created_at}
+        self._partition(self.posts_by_day, day, descending=True).put((created_at, pid), row)
+
+    def _post_by_content_insert(self, prefix, sort_key, pid, user_id, title, content, created_at):
+        row = {"prefix": prefix, "sort_key": sort_key, "id": pid, "user_id": user_id, "title": title,
+               "content": content, "created_at": created_at}
+        self._partition(self.posts_by_content, prefix).put((sort_key, pid), row)
+
+    def _post_summary_by_day_insert(self, day, created_at, pid, user_id, title, excerpt, content_length):
+        row = {"day": day, "id": pid, "user_id": user_id, "title": title, "excerpt": excerpt,
+               "content_length": content_length, "created_at": created_at}
+        self._partition(self.post_summaries_by_day, day, descending=True).put((created_at, pid), row)
+
+    def _post_summary_by_content_insert(self, prefix, sort_key, pid, user_id, title, excerpt, content_length,
+                                        created_at):
+        row = {"prefix": prefix, "sort_key": sort_key, "id": pid, "user_id": user_id, "title": title,
+               "excerpt": excerpt, "content_length": content_length, "created_at": created_at}
+        self._partition(self.post_summaries_by_content, prefix).put((sort_key, pid), row)
+
+    def _feed_bucket_insert(self, feed, bucket):
+        self.feed_buckets.setdefault(feed, set()).add(bucket)
+
+    def _post_get(self, pid):
+        return [self.posts[pid]] if pid in self.posts else []
+
+    def _post_scan(self):
+        return list(self.posts.values())
+
+    def _post_author_scan(self):
+        return list(self.posts.values())
+
+    def _feed_buckets_desc(self, feed):
+        return [{"bucket": b} for b in sorted(self.feed_buckets.get(feed, ()), reverse=True)]
+
+    def _feed_buckets_asc(self, feed):
+        return [{"bucket": b} for b in sorted(self.feed_buckets.get(feed, ()))]
+
+    def _feed_buckets_before(self, feed, bucket):
+        return [{"bucket": b} for b in sorted(self.feed_buckets.get(feed, ()), reverse=True) if b < bucket]
+
+    def _feed_buckets_range(self, feed, lo, hi):
+        return [{"bucket": b} for b in sorted(self.feed_buckets.get(feed, ())) if lo <= b < hi]
+
+    def _feed_buckets_after(self, feed, bucket):
+        return [{"bucket": b} for b in sorted(self.feed_buckets.get(feed, ())) if b > bucket]
+
+    def _posts_by_day_page(self, day, limit):
+        return self._page(self.posts_by_day.get(day), limit)
+
+    def _posts_by_day_after(self, day, created_at, pid, limit):
+        return self._page(self.posts_by_day.get(day), limit, before=(created_at, pid))
+
+    def _posts_by_content_page(self, prefix, limit):
+        return self._page(self.posts_by_content.get(prefix), limit)
+
+    def _posts_by_content_after(self, prefix, sort_key, pid, limit):
+        return self._page(self.posts_by_content.get(prefix), limit, after=(sort_key, pid))
+
+    def _post_summaries_by_day_page(self, day, limit):
+        return self._page(self.post_summaries_by_day.get(day), limit)
+
+    def _post_summaries_by_day_after(self, day, created_at, pid, limit):
+        return self._page(self.post_summaries_by_day.get(day), limit, before=(created_at, pid))
+
+    def _post_summaries_by_content_page(self, prefix, limit):
+        return self._page(self.post_summaries_by_content.get(prefix), limit)
+
+    def _post_summaries_by_content_after(self, prefix, sort_key, pid, limit):
+        return self._page(self.post_summaries_by_content.get(prefix), limit, after=(sort_key, pid))
+
+    def _post_delete(self, pid):
+        self.posts.pop(pid, None)
+
+    def _post_by_day_delete(self, day, created_at, pid):
+        if day in self.posts_by_day:
+            self.posts_by_day[day].delete((created_at, pid))
+
+    def _post_by_content_delete(self, prefix, sort_key, pid):
+        if prefix in self.posts_by_content:
+            self.posts_by_content[prefix].delete((sort_key, pid))
+
+    def _post_summary_by_day_delete(self, day, created_at, pid):
+        if day in self.post_summaries_by_day:
+            self.post_summaries_by_day[day].delete((created_at, pid))
+
+    def _post_summary_by_content_delete(self, prefix, sort_key, pid):
+        if prefix in self.post_summaries_by_content:
+            self.post_summaries_by_content[prefix].delete((sort_key, pid))
+
+    # comments
+    def _comment_insert(self, cid, post_id, user_id, content, created_at):
+        self.comments[cid] = {
+            "id": cid, "post_id": post_id, "user_id": user_id, "content": content, "created_at": created_at,
+        }
+
+    def _comment_by_post_insert(self, post_id, created_at, cid, user_id, content):
+        row = {"post_id": post_id, "id": cid, "user_id": user_id, "content": content, "created_at": created_at}
+        self._partition(self.comments_by_post, post_id).put((created_at, cid), row)
+
+    def _comment_get(self, cid):
+        return [self.comments[cid]] if cid in self.comments else []
+
+    def _comment_scan(self):
+        return list(self.comments.values())
+
+    def _comments_by_post(self, post_id):
+        return self._page(self.comments_by_post.get(post_id), math.inf)
+
+    def _comments_by_post_page(self, post_id, limit):
+        return self._page(self.comments_by_post.get(post_id), limit)
+
+    def _comments_by_post_after(self, post_id, created_at, cid, limit):
+        return self._page(self.comments_by_post.get(post_id), limit, after=(created_at, cid))
+
+    def _comment_delete(self, cid):
+        self.comments.pop(cid, None)
+
+    def _comment_by_post_delete(self, post_id, created_at, cid):
+        if post_id in self.comments_by_post:
+            self.comments_by_post[post_id].delete((created_at, cid))
+
+    # consistency checks (verify_migration.py): token ranges over each table's partition key
+    @staticmethod
+    def _in_range(key, lo, hi):
+        if not isinstance(key, str):
+            key = "\x00".join(key)
+        return lo < Murmur3Token.from_key(key.encode()).value <= hi
+
+    def _partition_range(self, table: dict, lo, hi):
+        return [row for key, part in table.items() if self._in_range(key, lo, hi) for row in part.rows.values()]
+
+    def _user_token_range(self, lo, hi):
+        return [r for uid, r in self.users.items() if self._in_range(uid, lo, hi)]
+
+    def _post_token_range(self, lo, hi):
+        return [r for pid, r in self.posts.items() if self._in_range(pid, lo, hi)]
+
+    def _comment_token_range(self, lo, hi):
+        return [r for cid, r in self.comments.items() if self._in_range(cid, lo, hi)]
+
+    def _users_by_prefix_token_range(self, lo, hi):
+        return self._partition_range(self.users_by_prefix, lo, hi)
+
+    def _posts_by_day_token_range(self, lo, hi):
+        return self._partition_range(self.posts_by_day, lo, hi)
+
+    def _posts_by_content_token_range(self, lo, hi):
+        return self._partition_range(self.posts_by_content, lo, hi)
+
+    def _post_summaries_by_day_token_range(self, lo, hi):
+        return self._partition_range(self.post_summaries_by_day, lo, hi)
+
+    def _post_summaries_by_content_token_range(self, lo, hi):
+        return self._partition_range(self.post_summaries_by_content, lo, hi)
+
+    def _comments_by_post_token_range(self, lo, hi):
+        return self._partition_range(self.comments_by_post, lo, hi)
+
+    def _feed_bucket_scan(self):
+        return [{"feed": feed, "bucket": b} for feed, buckets in self.feed_buckets.items() for b in buckets]
+
+
+_STATEMENT_NAMES = {cql: name for name, (cql, _) in db_cassandra.STATEMENTS.items()}
+
+
+def fake_execute_concurrent_with_args(session, statement, parameters, concurrency=100, raise_on_first_error=True):
+    results = []
+    for params in parameters:
+        try:
+            results.append((True, session.execute(statement, params)))
+        except Exception as e:
+            if raise_on_first_error:
+                raise
+            results.append((False, e))
+    return results
+
+
+def fake_execute_concurrent(session, statements_and_parameters, concurrency=100, raise_on_first_error=True):
+    results = []
+    for statement, params in statements_and_parameters:
+        try:
+            results.append((True, session.execute(statement, params)))
+        except Exception as e:
+            if raise_on_first_error:
+                raise
+            results.append((False, e))
+    return results
+
+
+def install_fake_cassandra() -> FakeSession:
+    """Point connections at a FakeSession (schema and statement hooks run as usual)."""
+    session = FakeSession()
+    db_cassandra.BatchStatement = FakeBatch
+    db_cassandra.execute_concurrent_with_args = fake_execute_concurrent_with_args
+    if hasattr(db_cassandra, "execute_concurrent"):
+        db_cassandra.execute_concurrent = fake_execute_concurrent
+    for hook in connections._cassandra_hooks:
+        hook(session)
+    connections._cassandra_session = session
+    return session
+
+
+# --- Dataset ---
+
+def _object_id(ts: datetime, n: int) -> str:
+    """Deterministic ObjectId: the timestamp of ts followed by a sequence number."""
+    return str(ObjectId(f"{int(ts.timestamp()) & 0xFFFFFFFF:08x}{n:016x}"))
+
+
+def _text(rng: random.Random, lo: int, hi: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def seed(n_users: int, n_posts: int, n_comments: int, days: int, seed_value: int) -> dict:
+    """Write the same users, posts and comments (same ids and timestamps) to both stores.
+
+    Posts are spread over `days` days and comments follow their post, so the feed walks several
+    day partitions and the comment threads have realistic ordering. Returns the ids created.
+    """
+    rng = random.Random(seed_value)
+    span = days * 86400
+    seq = 0
+
+    user_ids = []
+    for i in range(n_users):
+        created_at = EPOCH + timedelta(seconds=rng.uniform(0, span / 10))
+        seq += 1
+        uid = _object_id(created_at, seq)
+        name, email = f"user{i}", f"user{i}@example.com"
+        db_mongo.mongo_create_user(name, email, doc_id=uid, created_at=created_at)
+        db_cassandra.cassandra_create_user(name, email, doc_id=uid, created_at=created_at)
+        user_ids.append(uid)
+
+    posts = []
+    for _ in range(n_posts):
+        created_at = EPOCH + timedelta(seconds=rng.uniform(span / 10, span))
+        seq += 1
+        pid = _object_id(created_at, seq)
+        user_id, title, content = rng.choice(user_ids), _text(rng, 2, 6), _text(rng, 10, 60).capitalize()
+        db_mongo.mongo_create_post(user_id, title, content, doc_id=pid, created_at=created_at)
+        db_cassandra.cassandra_create_post(user_id, title, content, doc_id=pid, created_at=created_at)
+        posts.append((pid, created_at))
+
+    for _ in range(n_comments):
+        post_id, post_created = rng.choice(posts)
+        created_at = post_created + timedelta(seconds=rng.uniform(1, 86400))
+        seq += 1
+        cid = _object_id(created_at, seq)
+        user_id, content = rng.choice(user_ids), _text(rng, 3, 20)
+        db_mongo.mongo_create_comment(post_id, user_id, content, doc_id=cid, created_at=created_at)
+        db_cassandra.cassandra_create_comment(post_id, user_id, content, doc_id=cid, created_at=created_at)
+
+    return {"users": user_ids, "posts": [pid for pid, _ in posts]}
+
+
+# --- Driver ---
+
+def scenarios(client, ids: dict, rng: random.Random) -> list[tuple]:
+    """(name, kind, request fn) in run order: reads first, then writes."""
+    def first_cursor():
+        return client.get("/api/feed").get_json()["next_cursor"]
+
+    cursor = {}
+
+    def api_feed_page2():
+        if "c" not in cursor:
+            cursor["c"] = first_cursor()
+        return client.get("/api/feed", query_string={"cursor": cursor["c"]})
+
+    def post_id():
+        return rng.choice(ids["posts"])
+
+    def user_id():
+        return rng.choice(ids["users"])
+
+    n = {"i": 0}
+
+    def seq():
+        n["i"] += 1
+        return n["i"]
+
+    return [
+        ("feed_html", "read", lambda: client.get("/")),
+        ("feed_html_content", "read", lambda: client.get("/?sort=content")),
+        ("api_feed", "read", lambda: client.get("/api/feed")),
+        ("api_feed_page2", "read", api_feed_page2),
+        ("api_feed_comments", "read", lambda: client.get("/api/feed?comments=1")),
+        ("api_feed_summary", "read", lambda: client.get("/api/feed?excerpt_len=200")),
+        ("api_post", "read", lambda: client.get(f"/api/post/{post_id()}")),
+        ("post_html", "read", lambda: client.get(f"/post/{post_id()}")),
+        ("users_html", "read", lambda: client.get("/users")),
+        ("api_users", "read", lambda: client.get("/api/users")),
+        ("user_lookup", "read", lambda: client.get("/api/users/lookup?q=user1")),
+        ("new_post_form", "read", lambda: client.get("/posts/new")),
+        ("create_user", "write", lambda: client.post(
+            "/api/users", json={"name": f"bench{seq()}", "email": f"bench{n['i']}@example.com"})),
+        ("create_post", "write", lambda: client.post(
+            "/api/posts", json={"user_id": user_id(), "title": "bench", "content": _text(rng, 10, 40)})),
+        ("create_comment", "write", lambda: client.post(
+            f"/post/{post_id()}/comment", data={"user_id": user_id(), "content": _text(rng, 3, 12)})),
+    ]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def fetch(fn):
+    """Issue one request and read the whole body, so streamed pages are timed to their last byte."""
+    resp = fn()
+    resp.get_data()
+    resp.close()
+    return resp
+
+
+def run_scenario(fn, requests: int, warmup: int, wait_for_shadow: bool) -> dict:
+    for _ in range(warmup):
+        fetch(fn)
+    if wait_for_shadow:
+        shadow.drain()
+    latencies, errors = [], 0
+    mongo_before, cassandra_before = query_counts()
+    for _ in range(requests):
+        start = time.perf_counter()
+        resp = fetch(fn)
+        latencies.append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            errors += 1
+        if wait_for_shadow:
+            shadow.drain()  # attribute the replayed queries to the request that sampled them
+    mongo_after, cassandra_after = query_counts()
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mongodb_queries": (mongo_after - mongo_before) / requests,
+        "cassandra_queries": (cassandra_after - cassandra_before) / requests,
+    }
+
+
+def run(args) -> dict:
+    results = {}
+    client = app.test_client()
+    only = {s.strip() for s in args.only.split(",") if s.strip()} if args.only else None
+    shadow.SHADOW_SAMPLE_RATE = args.shadow_sample
+    for mode in args.modes.split(","):
+        mode = mode.strip()
+        if mode not in MODES:
+            raise SystemExit(f"unknown mode {mode!r}; expected one of {', '.join(MODES)}")
+        config.READ_SOURCE = mode
+        db.clear_caches()
+        rng = random.Random(args.seed)
+        for name, kind, fn in scenarios(client, args.ids, rng):
+            if only and name not in only:
+                continue
+            r = run_scenario(fn, args.requests, args.warmup, wait_for_shadow=mode == "shadow_read")
+            results[f"{mode}/{name}"] = r
+            print_row(mode, name, r, args.baseline.get(f"{mode}/{name}") if args.baseline else None)
+    return results
+
+
+HEADER = f"{'mode':<16} {'scenario':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mongo q':>8} {'cass q':>8} {'err':>4}"
+
+
+def print_row(mode: str, name: str, r: dict, base: dict | None = None):
+    line = (f"{mode:<16} {name:<18} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+            f"{r['mongodb_queries']:>8.1f} {r['cassandra_queries']:>8.1f} {r['errors']:>4}")
+    if base:
+        def delta(key):
+            return (r[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+        line += f"   p50 {delta('p50_ms'):+.0f}%  p95 {delta('p95_ms'):+.0f}%"
+        q_before = base["mongodb_queries"] + base["cassandra_queries"]
+        q_after = r["mongodb_queries"] + r["cassandra_queries"]
+        if q_after != q_before:
+            line += f"  queries {q_before:.1f} -> {q_after:.1f}"
+    print(line, flush=True)
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=8000)
+    parser.add_argument("--days", type=int, default=30, help="posts are spread over this many days")
+    parser.add_argument("--seed", type=int, default=1, help="dataset and request mix are deterministic per seed")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario and mode")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated READ_SOURCE modes")
+    parser.add_argument("--only", default="", help="comma-separated scenarios (default: all)")
+    parser.add_argument("--shadow-sample", type=float, default=1.0, help="SHADOW_SAMPLE_RATE for shadow_read")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --out run to compare against")
+    args = parser.parse_args(list(argv))
+    args.baseline = json.loads(Path(args.baseline).read_text())["results"] if args.baseline else None
+
+    # Writes made in one mode are missing from the other store in the next, so shadow_read
+    # reports mismatches that are artefacts of the benchmark; its stats still count them.
+    logging.getLogger("shadow").setLevel(logging.ERROR)
+    install_mongomock()
+    install_fake_cassandra()
+    start = time.perf_counter()
+    args.ids = seed(args.users, args.posts, args.comments, args.days, args.seed)
+    print(f"seeded {args.users} users, {args.posts} posts, {args.comments} comments "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(HEADER)
+    results = run(args)
+
+    if args.out:
+        params = {k: getattr(args, k) for k in ("users", "posts", "comments", "days", "seed", "requests", "warmup")}
+        Path(args.out).write_text(json.dumps({"params": params, "results": results}, indent=2))
+        print(f"results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
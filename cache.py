@@ -0,0 +1,77 @@
+"""In-process read-through cache for entity lookups (LRU size bound, TTL, negative caching)."""
+
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class EntityCache:
+    """Thread-safe LRU of id -> entity dict (or None for "known not to exist").
+
+    Values are copied on the way in and out, so callers may mutate what they get back.
+    maxsize=0 disables caching entirely.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, negative_ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached value (None for a cached miss), or MISSING if absent/expired."""
+        if self.maxsize <= 0:
+            return MISSING
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return dict(value) if value is not None else None
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        stored = dict(value) if value is not None else None
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, stored)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
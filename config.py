@@ -5,27 +5,82 @@ import os
 # MongoDB (default)
 MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/")
 MONGODB_DB = os.environ.get("MONGODB_DB", "blog")
+MONGODB_MAX_POOL_SIZE = int(os.environ.get("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.environ.get("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Indexes (db_mongo.MONGO_INDEXES) are provisioned at deploy time by ensure_indexes.py. Setting this
+# makes every process create collections and indexes when it connects instead (local development).
+MONGODB_AUTO_INDEX = os.environ.get("MONGODB_AUTO_INDEX", "false").lower() == "true"
 
 # Cassandra (for migration)
 CASSANDRA_HOSTS = os.environ.get("CASSANDRA_HOSTS", "127.0.0.1").split(",")
 CASSANDRA_KEYSPACE = os.environ.get("CASSANDRA_KEYSPACE", "blog")
+CASSANDRA_EXECUTOR_THREADS = int(os.environ.get("CASSANDRA_EXECUTOR_THREADS", "2"))
+CASSANDRA_CONNECT_TIMEOUT = float(os.environ.get("CASSANDRA_CONNECT_TIMEOUT", "5"))
+CASSANDRA_REQUEST_TIMEOUT = float(os.environ.get("CASSANDRA_REQUEST_TIMEOUT", "10"))
+
+# Read-through cache for get_user / get_post (per process; size 0 disables).
+ENTITY_CACHE_SIZE = int(os.environ.get("ENTITY_CACHE_SIZE", "10000"))
+ENTITY_CACHE_TTL = float(os.environ.get("ENTITY_CACHE_TTL", "300"))
+ENTITY_CACHE_NEGATIVE_TTL = float(os.environ.get("ENTITY_CACHE_NEGATIVE_TTL", "5"))
+
+# Summary feed (/api/feed?excerpt_len=N, HTML feed): longest post excerpt served. Cassandra stores
+# excerpts of this length in its post_summaries_* tables, so raising it needs --backfill-feeds.
+FEED_EXCERPT_MAX_LEN = int(os.environ.get("FEED_EXCERPT_MAX_LEN", "500"))
+
+# Bulk create APIs (/api/*/bulk): items accepted per request, Cassandra inserts in flight per call.
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", "1000"))
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "64"))
+
+# Bulk migration (migrate_mongo_to_cassandra.py)
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", "1000"))
+MIGRATION_CONCURRENCY = int(os.environ.get("MIGRATION_CONCURRENCY", "128"))
+MIGRATION_CHECKPOINT_FILE = os.environ.get("MIGRATION_CHECKPOINT_FILE", "migration_checkpoint.json")
+MIGRATION_WATERMARK_OVERLAP = float(os.environ.get("MIGRATION_WATERMARK_OVERLAP", "30"))
 
 # Migration strategy:
 # - "mongodb_only"     : read from MongoDB, write to MongoDB only
 # - "double_write"     : read from MongoDB, write to BOTH MongoDB and Cassandra
+# - "shadow_read"      : like double_write, and a sample of reads is replayed against Cassandra
+#                        in the background to compare results and latency (see shadow.py)
 # - "read_migration"   : read from Cassandra, write to BOTH
 # - "cassandra_only"   : read from Cassandra, write to Cassandra only (cleanup)
-READ_SOURCE = os.environ.get("READ_SOURCE", "mongodb_only")  # mongodb_only | double_write | read_migration | cassandra_only
+READ_SOURCE = os.environ.get("READ_SOURCE", "mongodb_only")  # mongodb_only | double_write | shadow_read | read_migration | cassandra_only
 WRITE_BOTH = os.environ.get("WRITE_BOTH", "false").lower() == "true"
+# Threads issuing the per-backend writes concurrently when both stores are written.
+DUAL_WRITE_WORKERS = int(os.environ.get("DUAL_WRITE_WORKERS", "8"))
+# Write-behind (write_behind.py): when both stores are written, only the primary is written in the
+# request; the secondary write is queued, retried with exponential backoff, and spooled to a local
+# file when the queue is full or retries run out.
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_WORKERS = int(os.environ.get("WRITE_BEHIND_WORKERS", "4"))
+WRITE_BEHIND_QUEUE_SIZE = int(os.environ.get("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", "8"))
+WRITE_BEHIND_BACKOFF = float(os.environ.get("WRITE_BEHIND_BACKOFF", "0.1"))
+WRITE_BEHIND_BACKOFF_MAX = float(os.environ.get("WRITE_BEHIND_BACKOFF_MAX", "10"))
+WRITE_BEHIND_SPOOL_FILE = os.environ.get("WRITE_BEHIND_SPOOL_FILE", "write_behind_spool.jsonl")
+WRITE_BEHIND_SPOOL_INTERVAL = float(os.environ.get("WRITE_BEHIND_SPOOL_INTERVAL", "5"))
+# Metrics (metrics.py): directory shared by the worker processes of one server. Each worker writes its
+# counters there every METRICS_FLUSH_INTERVAL seconds and /metrics sums all of them; empty keeps the
+# counters of the answering worker only. Empty the directory when the server starts.
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1"))
+# shadow_read: fraction of reads replayed, background workers, and pending replays kept (extra are dropped).
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_WORKERS = int(os.environ.get("SHADOW_WORKERS", "4"))
+SHADOW_QUEUE_SIZE = int(os.environ.get("SHADOW_QUEUE_SIZE", "1000"))
 
 def read_from_mongodb() -> bool:
-    return READ_SOURCE in ("mongodb_only", "double_write")
+    return READ_SOURCE in ("mongodb_only", "double_write", "shadow_read")
 
 def read_from_cassandra() -> bool:
     return READ_SOURCE in ("read_migration", "cassandra_only")
 
 def write_to_mongodb() -> bool:
-    return READ_SOURCE in ("mongodb_only", "double_write", "read_migration")
+    return READ_SOURCE in ("mongodb_only", "double_write", "shadow_read", "read_migration")
 
 def write_to_cassandra() -> bool:
-    return WRITE_BOTH or READ_SOURCE in ("double_write", "read_migration", "cassandra_only")
+    return WRITE_BOTH or READ_SOURCE in ("double_write", "shadow_read", "read_migration", "cassandra_only")
+
+def shadow_reads() -> bool:
+    return READ_SOURCE == "shadow_read"
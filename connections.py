@@ -0,0 +1,163 @@
+"""Process-wide connection manager: one pooled MongoDB client and one Cassandra session per process.
+
+Both are created lazily on first use, shared by every request thread, and
+dropped (not closed) in a forked child so pre-fork servers such as gunicorn
+re-create them in each worker instead of sharing the parent's sockets.
+"""
+
+import atexit
+import os
+import threading
+
+from config import (
+    CASSANDRA_CONNECT_TIMEOUT,
+    CASSANDRA_EXECUTOR_THREADS,
+    CASSANDRA_HOSTS,
+    CASSANDRA_REQUEST_TIMEOUT,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    MONGODB_URI,
+)
+
+_lock = threading.RLock()
+_pid = os.getpid()
+
+_mongo_client = None
+_cassandra_cluster = None
+_cassandra_session = None
+
+# Callables run once on every newly created client/session, before it is handed out
+# (schema creation, index provisioning, statement preparation).
+_mongo_hooks = []
+_cassandra_hooks = []
+
+
+def on_mongo_client(fn):
+    """Register fn(client) to run whenever a new MongoClient is created."""
+    _mongo_hooks.append(fn)
+    return fn
+
+
+def on_cassandra_session(fn):
+    """Register fn(session) to run whenever a new Cassandra session is created."""
+    _cassandra_hooks.append(fn)
+    return fn
+
+
+def _reset_after_fork():
+    """Forget the parent's connections; the child builds its own on first use."""
+    global _lock, _pid, _mongo_client, _cassandra_cluster, _cassandra_session
+    _lock = threading.RLock()
+    _pid = os.getpid()
+    _mongo_client = None
+    _cassandra_cluster = None
+    _cassandra_session = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _check_pid():
+    # Fallback for forks that bypass os.fork() hooks (e.g. some multiprocessing start methods).
+    if os.getpid() != _pid:
+        _reset_after_fork()
+
+
+# --- MongoDB ---
+
+def get_mongo_client():
+    global _mongo_client
+    _check_pid()
+    client = _mongo_client
+    if client is not None:
+        return client
+    with _lock:
+        if _mongo_client is None:
+            from pymongo import MongoClient
+            client = MongoClient(
+                MONGODB_URI,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=MONGODB_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                connect=False,
+            )
+            for hook in _mongo_hooks:
+                hook(client)
+            _mongo_client = client
+        return _mongo_client
+
+
+def mongo_health() -> bool:
+    try:
+        get_mongo_client().admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+# --- Cassandra ---
+
+def get_cassandra_session():
+    global _cassandra_cluster, _cassandra_session
+    _check_pid()
+    session = _cassandra_session
+    if session is not None:
+        return session
+    with _lock:
+        if _cassandra_session is None:
+            from cassandra.cluster import Cluster
+            cluster = Cluster(
+                CASSANDRA_HOSTS,
+                executor_threads=CASSANDRA_EXECUTOR_THREADS,
+                connect_timeout=CASSANDRA_CONNECT_TIMEOUT,
+            )
+            session = cluster.connect()
+            session.default_timeout = CASSANDRA_REQUEST_TIMEOUT
+            try:
+                for hook in _cassandra_hooks:
+                    hook(session)
+            except Exception:
+                cluster.shutdown()
+                raise
+            _cassandra_cluster = cluster
+            _cassandra_session = session
+        return _cassandra_session
+
+
+def cassandra_health() -> bool:
+    try:
+        get_cassandra_session().execute("SELECT release_version FROM system.local")
+        return True
+    except Exception:
+        return False
+
+
+# --- Lifecycle ---
+
+def health(mongodb: bool = True, cassandra: bool = True) -> dict:
+    out = {}
+    if mongodb:
+        out["mongodb"] = mongo_health()
+    if cassandra:
+        out["cassandra"] = cassandra_health()
+    return out
+
+
+def close_all():
+    """Close pooled connections owned by this process (safe to call repeatedly)."""
+    global _mongo_client, _cassandra_cluster, _cassandra_session
+    with _lock:
+        if os.getpid() != _pid:
+            return
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+        if _cassandra_cluster is not None:
+            _cassandra_cluster.shutdown()
+            _cassandra_cluster = None
+            _cassandra_session = None
+
+
+atexit.register(close_all)
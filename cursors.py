@@ -0,0 +1,56 @@
+"""Opaque pagination cursors shared by the MongoDB and Cassandra read paths.
+
+A cursor carries the sort key of the last row returned (keyset pagination), so
+the next page is a bounded range read no matter how deep it is. Keys are
+backend-neutral (epoch-ms timestamps, string ids) so a cursor stays valid when
+READ_SOURCE changes.
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+
+CONTENT_SORT_KEY_LEN = 256
+
+
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str | None) -> dict | None:
+    """Decode a cursor from a request; None/empty means first page. Raises ValueError if malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, dict):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def dt_to_ms(dt: datetime | None) -> int | None:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def ms_to_dt(ms: int | None) -> datetime | None:
+    """Naive UTC datetime, matching what both drivers store and return."""
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def content_sort_key(content: str | None) -> str:
+    """Key of the content-sorted feed in both stores: lowercased, truncated, compared by code point.
+
+    MongoDB stores it as posts.content_sort_key (simple collation) and Cassandra as the
+    posts_by_content clustering key; ties are broken by id in both, so the order is identical.
+    """
+    return (content or "").lower()[:CONTENT_SORT_KEY_LEN]
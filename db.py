@@ -1,39 +1,326 @@
 """Unified DB layer: routes to MongoDB or Cassandra based on config (migration strategy)."""
 
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+
+from cache import MISSING, EntityCache
 from config import (
+    DUAL_WRITE_WORKERS,
+    ENTITY_CACHE_NEGATIVE_TTL,
+    ENTITY_CACHE_SIZE,
+    ENTITY_CACHE_TTL,
+    FEED_EXCERPT_MAX_LEN,
+    WRITE_BEHIND,
     read_from_mongodb,
     read_from_cassandra,
+    shadow_reads,
     write_to_mongodb,
     write_to_cassandra,
 )
+from cursors import decode_cursor, dt_to_ms, encode_cursor, ms_to_dt
 import db_mongo
 import db_cassandra
+import metrics
+import shadow
+import versions
+import write_behind
 
+log = logging.getLogger(__name__)
 
-# --- Users ---
+# get_user / get_post results, whichever backend served them; invalidated by the create paths.
+# Per process, so other workers see a change after at most ENTITY_CACHE_TTL seconds.
+_user_cache = EntityCache("users", ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL, ENTITY_CACHE_NEGATIVE_TTL)
+_post_cache = EntityCache("posts", ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL, ENTITY_CACHE_NEGATIVE_TTL)
 
-def create_user(name: str, email: str) -> dict:
-    out = None
+
+def cache_stats() -> dict:
+    return {"users": _user_cache.stats(), "posts": _post_cache.stats()}
+
+
+def clear_caches():
+    _user_cache.clear()
+    _post_cache.clear()
+
+
+@metrics.collector
+def _cache_metrics():
+    stats = cache_stats()
+    return [
+        (f"entity_cache_{field}", kind, help_text, [({"cache": name}, st[field]) for name, st in stats.items()])
+        for field, kind, help_text in (
+            ("size", "gauge", "Entries currently cached."),
+            ("hits", "counter", "Cache hits."),
+            ("misses", "counter", "Cache misses."),
+            ("evictions", "counter", "Entries evicted for size."),
+        )
+    ]
+
+
+def _read(op: str, mongo_fn, cassandra_fn, *args, **kwargs):
+    """MongoDB read; in shadow_read mode a sample is also replayed against Cassandra off-thread."""
+    if shadow_reads():
+        return shadow.read(op, mongo_fn, cassandra_fn, *args, **kwargs)
+    return mongo_fn(*args, **kwargs)
+
+
+# --- Conditional GET validators ---
+
+def _versions(keys: list[str]) -> tuple[str, dict, datetime]:
+    """(store, {key: (token, changed_at)}, read_at) from the store reads are served from (one point read)."""
+    read_at = datetime.utcnow()
+    if read_from_mongodb():
+        return "mongodb", db_mongo.mongo_get_versions(keys), read_at
+    return "cassandra", db_cassandra.cassandra_get_versions(keys), read_at
+
+
+@metrics.timed("db")
+def feed_validator(variant: str = "") -> tuple[str, datetime | None]:
+    """(etag, last_modified) for a feed response; variant distinguishes query parameters."""
+    store, found, read_at = _versions([versions.FEED])
+    return versions.validator("feed", store, [versions.FEED], found, read_at, variant)
+
+
+@metrics.timed("db")
+def post_validator(post_id: str, variant: str = "") -> tuple[str, datetime | None]:
+    """(etag, last_modified) for a post page: changes with its comments or any author post count."""
+    keys = versions.post_validator_keys(post_id)
+    store, found, read_at = _versions(keys)
+    return versions.validator("post", store, keys, found, read_at, variant)
+
+
+# --- Dual write ---
+
+_write_executor = None
+
+
+def _reset_write_executor():
+    # Worker threads do not survive fork; a child must build its own pool.
+    global _write_executor
+    _write_executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_write_executor)
+
+
+def _get_write_executor() -> ThreadPoolExecutor:
+    global _write_executor
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(max_workers=DUAL_WRITE_WORKERS, thread_name_prefix="dual-write")
+    return _write_executor
+
+
+def _new_id() -> str:
+    """Id shared by every backend written; ObjectId-shaped whenever MongoDB is one of them."""
     if write_to_mongodb():
-        out = db_mongo.mongo_create_user(name, email)
+        from bson import ObjectId
+        return str(ObjectId())
+    return str(uuid4())
+
+
+def _primary(targets: dict) -> str:
+    """The written backend reads are served from (the first one written if reads use neither)."""
+    if read_from_cassandra() and "cassandra" in targets:
+        return "cassandra"
+    if read_from_mongodb() and "mongodb" in targets:
+        return "mongodb"
+    return next(iter(targets))
+
+
+def _write(entity: str, mongo_fn, cassandra_fn, *args) -> dict:
+    """Write one entity exactly once to each backend the mode targets, concurrently, under one id.
+
+    The store reads are served from is the primary: if its write fails the error is raised; a
+    failed secondary write is logged. The returned entity (the primary's) carries a "writes"
+    map of backend -> "ok" / "error: ..." / "queued" so callers can see per-backend outcomes.
+    With WRITE_BEHIND the secondary write is handed to write_behind instead of awaited.
+    """
+    kwargs = {"doc_id": _new_id(), "created_at": datetime.utcnow()}
+    targets = {}
+    if write_to_mongodb():
+        targets["mongodb"] = mongo_fn
+    if write_to_cassandra():
+        targets["cassandra"] = cassandra_fn
+    primary = _primary(targets)
+
+    if len(targets) == 1 or WRITE_BEHIND:
+        out = targets[primary](*args, **kwargs)
+        out["writes"] = {primary: "ok"}
+        for name, fn in targets.items():
+            if name != primary:
+                write_behind.submit(fn, *args, **kwargs)
+                out["writes"][name] = "queued"
+        return out
+
+    # Latency is max(mongo, cassandra): both writes are in flight at once.
+    executor = _get_write_executor()
+    futures = {name: executor.submit(fn, *args, **kwargs) for name, fn in targets.items()}
+    results, errors, writes = {}, {}, {}
+    for name, fut in futures.items():
+        try:
+            results[name] = fut.result()
+            writes[name] = "ok"
+        except Exception as e:
+            errors[name] = e
+            writes[name] = f"error: {e}"
+            log.warning("%s write to %s failed (id=%s): %s", entity, name, kwargs["doc_id"], e)
+    if primary in errors:
+        raise errors[primary]
+    out = results[primary]
+    out["writes"] = writes
+    return out
+
+
+def _write_many(entity: str, mongo_fn, cassandra_fn, items: list[dict]) -> list[dict]:
+    """Bulk counterpart of _write: one call per backend for the whole list, both backends concurrently.
+
+    Each item gets a shared id and created_at. The backend functions return one insert error
+    (or None) per item and the error of any follow-up update made after the inserts (author
+    counters), or None. An item succeeds when the primary stored it; a failed follow-up does
+    not fail stored items but shows in their "writes" status ("ok; ..."). Returns one result
+    per item in input order: the stored entity, or {"error": ...}, each with its per-backend
+    "writes" map.
+    """
+    now = datetime.utcnow()
+    docs = [{"id": _new_id(), **item, "created_at": now} for item in items]
+    targets = {}
+    if write_to_mongodb():
+        targets["mongodb"] = mongo_fn
     if write_to_cassandra():
-        c_out = db_cassandra.cassandra_create_user(name, email)
-        if out is None:
-            out = c_out
+        targets["cassandra"] = cassandra_fn
+    primary = _primary(targets)
+    queued = [name for name in targets if name != primary] if WRITE_BEHIND else []
+    for name in queued:
+        write_behind.submit(targets.pop(name), docs)
+
+    executor = _get_write_executor() if len(targets) > 1 else None
+    futures = {name: executor.submit(fn, docs) if executor else None for name, fn in targets.items()}
+    outcomes = {}
+    for name, fn in targets.items():
+        try:
+            outcomes[name] = futures[name].result() if executor else fn(docs)
+        except Exception as e:
+            # The whole call failed (connection, timeout): every item failed on this backend.
+            outcomes[name] = ([str(e)] * len(docs), None)
+    results = []
+    for i, doc in enumerate(docs):
+        writes = {name: _bulk_status(errs[i], note) for name, (errs, note) in outcomes.items()}
+        writes.update(dict.fromkeys(queued, "queued"))
+        err = outcomes[primary][0][i]
+        if err is None:
+            results.append({**doc, "writes": writes})
         else:
-            db_cassandra.cassandra_create_user(name, email)
-    return out or db_cassandra.cassandra_create_user(name, email)
+            results.append({"error": err, "writes": writes})
+    for name, (errs, note) in outcomes.items():
+        failed = sum(err is not None for err in errs)
+        if failed:
+            log.warning("bulk %s write to %s: %d of %d items failed", entity, name, failed, len(docs))
+        if note:
+            log.warning("bulk %s write to %s: items stored, %s", entity, name, note)
+    return results
 
 
+def _bulk_status(err: str | None, note: str | None) -> str:
+    if err is not None:
+        return f"error: {err}"
+    return f"ok; {note}" if note else "ok"
+
+
+# --- Users ---
+
+@metrics.timed("db")
+def create_user(name: str, email: str) -> dict:
+    out = _write("user", db_mongo.mongo_create_user, db_cassandra.cassandra_create_user, name, email)
+    _user_cache.invalidate(out["id"])  # drop a cached "not found" for this id
+    return out
+
+
+@metrics.timed("db")
+def create_users(users: list[dict]) -> list[dict]:
+    """Create many users ({name, email}); one result per item (see _write_many)."""
+    results = _write_many("user", db_mongo.mongo_create_users, db_cassandra.cassandra_create_users, users)
+    for r in results:
+        if "id" in r:
+            _user_cache.invalidate(r["id"])
+    return results
+
+
+@metrics.timed("db")
 def list_users() -> list:
+    """Every user (a full scan; pages use list_users_page / find_users)."""
     if read_from_mongodb():
-        return db_mongo.mongo_list_users()
+        return _read("list_users", db_mongo.mongo_list_users, db_cassandra.cassandra_list_users)
     return db_cassandra.cassandra_list_users()
 
 
+@metrics.timed("db")
+def list_users_page(limit: int = 50, cursor: str | None = None) -> tuple[list, str | None]:
+    """One page of the user directory (by name, case-insensitive) and the cursor for the next page.
+
+    Raises ValueError for a malformed cursor.
+    """
+    after = _users_after(cursor)
+    if read_from_mongodb():
+        users = _read(
+            "list_users_page", db_mongo.mongo_list_users_page, db_cassandra.cassandra_list_users_page, limit + 1, after
+        )
+    else:
+        users = db_cassandra.cassandra_list_users_page(limit + 1, after)
+    return _users_next_page(users, limit)
+
+
+def _users_after(cursor: str | None):
+    """(lowercased name, id) position encoded in a users cursor, or None for the first page."""
+    pos = decode_cursor(cursor)
+    if pos is None:
+        return None
+    if not isinstance(pos.get("n"), str) or not isinstance(pos.get("id"), str):
+        raise ValueError("invalid cursor")
+    return (pos["n"], pos["id"])
+
+
+def _users_next_page(users: list, limit: int) -> tuple[list, str | None]:
+    if len(users) <= limit:
+        return users, None
+    users = users[:limit]
+    last = users[-1]
+    return users, encode_cursor({"n": (last.get("name") or "").lower(), "id": last["id"]})
+
+
+@metrics.timed("db")
+def find_users(prefix: str, limit: int = 10) -> list:
+    """Users whose name or email starts with prefix (case-insensitive), at most limit; [] for a blank prefix.
+
+    An index range read in MongoDB and a users_by_prefix slice in Cassandra: the cost follows
+    limit, not the number of users.
+    """
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    if read_from_mongodb():
+        return _read(
+            "find_users", db_mongo.mongo_find_users_by_prefix, db_cassandra.cassandra_find_users_by_prefix,
+            prefix, limit,
+        )
+    return db_cassandra.cassandra_find_users_by_prefix(prefix, limit)
+
+
+@metrics.timed("db")
 def get_user(user_id: str):
+    u = _user_cache.get(user_id)
+    if u is not MISSING:
+        return u
+    u = _load_user(user_id)
+    _user_cache.set(user_id, u)
+    return u
+
+
+def _load_user(user_id: str):
     if read_from_mongodb():
-        u = db_mongo.mongo_get_user(user_id)
+        u = _read("get_user", db_mongo.mongo_get_user, db_cassandra.cassandra_get_user, user_id)
         if u:
             return u
     if read_from_cassandra():
@@ -41,30 +328,79 @@ def get_user(user_id: str):
     return None
 
 
+@metrics.timed("db")
+def get_users(user_ids) -> dict:
+    """Resolve many users in one pass per backend; returns {id: user} for the ids found.
+
+    Cached ids are served from the entity cache; only the rest hit a backend.
+    """
+    users, ids = {}, set()
+    for uid in set(user_ids):
+        if not uid:
+            continue
+        u = _user_cache.get(uid)
+        if u is MISSING:
+            ids.add(uid)
+        elif u is not None:
+            users[uid] = u
+    found = {}
+    if read_from_mongodb() and ids:
+        found.update(_read("get_users", db_mongo.mongo_get_users, db_cassandra.cassandra_get_users, ids))
+    missing = ids - found.keys()
+    if read_from_cassandra() and missing:
+        found.update(db_cassandra.cassandra_get_users(missing))
+    for uid in ids:
+        _user_cache.set(uid, found.get(uid))
+    users.update(found)
+    return users
+
+
+@metrics.timed("db")
 def count_posts_by_user(user_id: str) -> int:
+    """Author post count from the counters maintained at write time (no scan)."""
     if read_from_mongodb():
-        return db_mongo.mongo_count_posts_by_user(user_id)
+        return _read(
+            "count_posts_by_user", db_mongo.mongo_count_posts_by_user, db_cassandra.cassandra_count_posts_by_user,
+            user_id,
+        )
     return db_cassandra.cassandra_count_posts_by_user(user_id)
 
 
 # --- Posts ---
 
+@metrics.timed("db")
 def create_post(user_id: str, title: str, content: str) -> dict:
-    out = None
-    if write_to_mongodb():
-        out = db_mongo.mongo_create_post(user_id, title, content)
-    if write_to_cassandra():
-        c_out = db_cassandra.cassandra_create_post(user_id, title, content)
-        if out is None:
-            out = c_out
-        else:
-            db_cassandra.cassandra_create_post(user_id, title, content)
-    return out or db_cassandra.cassandra_create_post(user_id, title, content)
+    # Exactly one write per backend: each create also bumps that backend's author post counter.
+    out = _write("post", db_mongo.mongo_create_post, db_cassandra.cassandra_create_post, user_id, title, content)
+    _post_cache.invalidate(out["id"])
+    _user_cache.invalidate(user_id)  # MongoDB user documents carry post_count
+    return out
+
+
+@metrics.timed("db")
+def create_posts(posts: list[dict]) -> list[dict]:
+    """Create many posts ({user_id, title, content}); author counters move once per author per backend."""
+    results = _write_many("post", db_mongo.mongo_create_posts, db_cassandra.cassandra_create_posts, posts)
+    for r in results:
+        if "id" in r:
+            _post_cache.invalidate(r["id"])
+            _user_cache.invalidate(r["user_id"])
+    return results
 
 
+@metrics.timed("db")
 def get_post(post_id: str):
+    p = _post_cache.get(post_id)
+    if p is not MISSING:
+        return p
+    p = _load_post(post_id)
+    _post_cache.set(post_id, p)
+    return p
+
+
+def _load_post(post_id: str):
     if read_from_mongodb():
-        p = db_mongo.mongo_get_post(post_id)
+        p = _read("get_post", db_mongo.mongo_get_post, db_cassandra.cassandra_get_post, post_id)
         if p:
             return p
     if read_from_cassandra():
@@ -74,22 +410,24 @@ def get_post(post_id: str):
 
 # --- Comments ---
 
+@metrics.timed("db")
 def create_comment(post_id: str, user_id: str, content: str) -> dict:
-    out = None
-    if write_to_mongodb():
-        out = db_mongo.mongo_create_comment(post_id, user_id, content)
-    if write_to_cassandra():
-        c_out = db_cassandra.cassandra_create_comment(post_id, user_id, content)
-        if out is None:
-            out = c_out
-        else:
-            db_cassandra.cassandra_create_comment(post_id, user_id, content)
-    return out or db_cassandra.cassandra_create_comment(post_id, user_id, content)
+    return _write("comment", db_mongo.mongo_create_comment, db_cassandra.cassandra_create_comment, post_id, user_id, content)
+
+
+@metrics.timed("db")
+def create_comments(comments: list[dict]) -> list[dict]:
+    """Create many comments ({post_id, user_id, content}); one result per item (see _write_many)."""
+    return _write_many("comment", db_mongo.mongo_create_comments, db_cassandra.cassandra_create_comments, comments)
 
 
+@metrics.timed("db")
 def get_comments_for_post(post_id: str) -> list:
     if read_from_mongodb():
-        c = db_mongo.mongo_get_comments_for_post(post_id)
+        c = _read(
+            "get_comments_for_post", db_mongo.mongo_get_comments_for_post, db_cassandra.cassandra_get_comments_for_post,
+            post_id,
+        )
         if c is not None:
             return c
     if read_from_cassandra():
@@ -97,10 +435,66 @@ def get_comments_for_post(post_id: str) -> list:
     return []
 
 
+@metrics.timed("db")
+def get_comments_for_posts(post_ids) -> dict:
+    """Comments of many posts in one batched pass, {post_id: [comment]} (every requested id present)."""
+    ids = list(dict.fromkeys(pid for pid in post_ids if pid))
+    if not ids:
+        return {}
+    if read_from_mongodb():
+        return _read(
+            "get_comments_for_posts", db_mongo.mongo_get_comments_for_posts,
+            db_cassandra.cassandra_get_comments_for_posts, ids,
+        )
+    return db_cassandra.cassandra_get_comments_for_posts(ids)
+
+
+@metrics.timed("db")
+def get_comments_page(post_id: str, limit: int, cursor: str | None = None) -> tuple[list, str | None]:
+    """One page of a post's comments, oldest first, and the cursor for the next page (None at the end).
+
+    Raises ValueError for a malformed cursor.
+    """
+    after = _comments_after(cursor)
+    # Ask for one extra row to learn whether another page exists.
+    if read_from_mongodb():
+        comments = _read(
+            "get_comments_page", db_mongo.mongo_get_comments_page, db_cassandra.cassandra_get_comments_page,
+            post_id, limit + 1, after,
+        )
+    else:
+        comments = db_cassandra.cassandra_get_comments_page(post_id, limit + 1, after)
+    return _comments_next_page(comments, limit)
+
+
+def _comments_after(cursor: str | None):
+    """(created_at, id) position encoded in a comments cursor, or None for the first page."""
+    pos = decode_cursor(cursor)
+    if pos is None:
+        return None
+    try:
+        return (ms_to_dt(pos["t"]), str(pos["id"]))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _comments_next_page(comments: list, limit: int) -> tuple[list, str | None]:
+    """Trim a limit + 1 read to limit rows and encode the next cursor if the extra row was there."""
+    if len(comments) <= limit:
+        return comments, None
+    comments = comments[:limit]
+    last = comments[-1]
+    return comments, encode_cursor({"t": dt_to_ms(last["created_at"]), "id": last["id"]})
+
+
 # --- Main feed ---
 
-def get_post_with_comments(post_id: str) -> dict | None:
-    """Return post in Iteration 2 shape: user_name, user_id, created_at, id, content, comments (user_name, user_id, content)."""
+@metrics.timed("db")
+def get_post_with_comments(post_id: str, comments_limit: int | None = None, comments_cursor: str | None = None) -> dict | None:
+    """Return post in Iteration 2 shape: user_name, user_id, created_at, id, content, comments (user_name, user_id, content).
+
+    With comments_limit, only one page of comments is included and next_comments_cursor points at the next one.
+    """
     post = get_post(post_id)
     if not post:
         return None
@@ -108,19 +502,100 @@ def get_post_with_comments(post_id: str) -> dict | None:
     post["user_name"] = author["name"] if author else "Unknown"
     post["author_name"] = post["user_name"]
     post["author_post_count"] = count_posts_by_user(post["user_id"])
-    comments = get_comments_for_post(post_id)
-    post["comments"] = []
-    for c in comments:
-        u = get_user(c["user_id"])
-        post["comments"].append({
-            "user_id": c["user_id"],
-            "user_name": u["name"] if u else "Unknown",
-            "content": c["content"],
-        })
+    if comments_limit is None:
+        comments = get_comments_for_post(post_id)
+    else:
+        comments, post["next_comments_cursor"] = get_comments_page(post_id, comments_limit, comments_cursor)
+    users = get_users(c["user_id"] for c in comments)
+    post["comments"] = [_comment_view(c, users) for c in comments]
     return post
 
 
+def _comment_view(c: dict, users: dict) -> dict:
+    u = users.get(c["user_id"])
+    return {"user_id": c["user_id"], "user_name": u["name"] if u else "Unknown", "content": c["content"]}
+
+
+@metrics.timed("db")
+def get_comments_for_posts_with_authors(post_ids) -> dict:
+    """Comments of many posts in Iteration 2 shape, {post_id: [comment]}, oldest first.
+
+    One batched comment read per backend plus one bulk user lookup for every commenter,
+    however many posts are passed; callers keep the post/author data they already loaded.
+    """
+    by_post = get_comments_for_posts(post_ids)
+    users = get_users(c["user_id"] for comments in by_post.values() for c in comments)
+    return {pid: [_comment_view(c, users) for c in comments] for pid, comments in by_post.items()}
+
+
+@metrics.timed("db")
 def feed_posts(sort_by: str = "date", limit: int = 50) -> list:
+    return feed_page(sort_by=sort_by, limit=limit)[0]
+
+
+def _feed_cursor(sort_by: str, cursor: str | None) -> dict | None:
+    """Validated feed cursor payload, or None for the first page."""
+    pos = decode_cursor(cursor)
+    if pos is None:
+        return None
+    if pos.get("s") != sort_by or not isinstance(pos.get("id"), str):
+        raise ValueError("invalid cursor")
+    if sort_by == "date" and not isinstance(pos.get("t"), int):
+        raise ValueError("invalid cursor")
+    return pos
+
+
+def _feed_after(sort_by: str, cursor: str | None):
+    """Keyset position encoded in a feed cursor: (created_at, id) for date, (content, id) for content."""
+    pos = _feed_cursor(sort_by, cursor)
+    if pos is None:
+        return None
+    if sort_by == "content":
+        # Content can be long, so the cursor only names the last post; its sort key is re-read (usually cached).
+        last = get_post(pos["id"])
+        if last is None:
+            raise ValueError("invalid cursor")
+        return (last.get("content") or "", pos["id"])
+    return (ms_to_dt(pos["t"]), pos["id"])
+
+
+def _feed_next_page(sort_by: str, posts: list, limit: int) -> tuple[list, str | None]:
+    """Trim a limit + 1 read to limit posts and encode the next cursor if the extra post was there."""
+    if len(posts) <= limit:
+        return posts, None
+    posts = posts[:limit]
+    last = posts[-1]
+    pos = {"s": sort_by, "id": last["id"]}
+    if sort_by == "date":
+        pos["t"] = dt_to_ms(last["created_at"])
+    return posts, encode_cursor(pos)
+
+
+def _excerpt_len(excerpt_len: int | None) -> int | None:
+    return None if excerpt_len is None else max(0, min(excerpt_len, FEED_EXCERPT_MAX_LEN))
+
+
+@metrics.timed("db")
+def feed_page(
+    sort_by: str = "date", limit: int = 50, cursor: str | None = None, excerpt_len: int | None = None
+) -> tuple[list, str | None]:
+    """One page of the main feed and an opaque cursor for the next (None on the last page).
+
+    Pages are keyset range reads, so page N costs the same as page 1. Raises ValueError for a
+    malformed cursor or one issued for a different sort. With excerpt_len (capped at
+    FEED_EXCERPT_MAX_LEN) posts are summaries: excerpt and content_length instead of content.
+    """
+    sort_by = "content" if sort_by == "content" else "date"
+    after = _feed_after(sort_by, cursor)
+    excerpt_len = _excerpt_len(excerpt_len)
+    # One extra row tells us whether another page exists.
     if read_from_mongodb():
-        return db_mongo.mongo_feed_posts(sort_by=sort_by, limit=limit)
-    return db_cassandra.cassandra_feed_posts(sort_by=sort_by, limit=limit)
+        posts = _read(
+            "feed_posts", db_mongo.mongo_feed_posts, db_cassandra.cassandra_feed_posts,
+            sort_by=sort_by, limit=limit + 1, after=after, excerpt_len=excerpt_len,
+        )
+    else:
+        posts = db_cassandra.cassandra_feed_posts(
+            sort_by=sort_by, limit=limit + 1, after=after, excerpt_len=excerpt_len
+        )
+    return _feed_next_page(sort_by, posts, limit)
@@ -0,0 +1,523 @@
+"""Async DB layer for app_async.py: db.py's read routing on pymongo's AsyncMongoClient and Cassandra execute_async.
+
+Same READ_SOURCE routing, entity caches, cursors and result shapes as db.py, but a page's
+independent lookups run concurrently on the event loop, so a post page costs about its
+slowest query instead of the sum, and a worker keeps many requests in flight while they wait.
+
+Writes (dual-write, write-behind, cache invalidation) are delegated to db.py in a worker
+thread so there is exactly one write path; the change versions behind ETags are read here. In
+shadow_read a sample of MongoDB reads is replayed against Cassandra on shadow.py's worker
+threads, as in db.py.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+
+from config import (
+    MONGODB_DB,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    MONGODB_URI,
+    read_from_cassandra,
+    read_from_mongodb,
+    shadow_reads,
+)
+from cache import MISSING
+from cursors import content_sort_key, ms_to_dt
+import db
+import db_cassandra
+import db_mongo
+import metrics
+import shadow
+import versions
+
+_mongo_client = None
+_mongo_pid = None
+_cassandra_pid = None
+
+
+# --- MongoDB (AsyncMongoClient) ---
+
+def _mdb():
+    """This process's async MongoDB database (one pooled client, created lazily, rebuilt after fork)."""
+    global _mongo_client, _mongo_pid
+    if _mongo_pid != os.getpid():
+        from pymongo import AsyncMongoClient
+        _mongo_client = AsyncMongoClient(
+            MONGODB_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        )
+        _mongo_pid = os.getpid()
+    return _mongo_client[MONGODB_DB]
+
+
+def _oid(value: str):
+    from bson import ObjectId
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+def _with_str_id(doc: dict) -> dict:
+    doc["id"] = str(doc["_id"])
+    return doc
+
+
+@metrics.timed("mongodb")
+async def mongo_get_versions(keys) -> dict:
+    docs = await _mdb().change_versions.find({"_id": {"$in": list(keys)}}).to_list(None)
+    return {doc["_id"]: (doc["v"], doc["at"]) for doc in docs}
+
+
+@metrics.timed("mongodb")
+async def mongo_get_user(user_id: str):
+    oid = _oid(user_id)
+    doc = await _mdb().users.find_one({"_id": oid}) if oid else None
+    return _with_str_id(doc) if doc else None
+
+
+@metrics.timed("mongodb")
+async def mongo_get_users(user_ids) -> dict:
+    oids = [oid for oid in (_oid(uid) for uid in set(user_ids)) if oid]
+    if not oids:
+        return {}
+    docs = await _mdb().users.find({"_id": {"$in": oids}}).to_list(None)
+    return {doc["id"]: doc for doc in map(_with_str_id, docs)}
+
+
+@metrics.timed("mongodb")
+async def mongo_count_posts_by_user(user_id: str) -> int:
+    oid = _oid(user_id)
+    user = await _mdb().users.find_one({"_id": oid}, {"post_count": 1}) if oid else None
+    return db_mongo._post_count(user)
+
+
+@metrics.timed("mongodb")
+async def mongo_get_post(post_id: str):
+    oid = _oid(post_id)
+    doc = await _mdb().posts.find_one({"_id": oid}, db_mongo.POST_PROJECTION) if oid else None
+    return _with_str_id(doc) if doc else None
+
+
+@metrics.timed("mongodb")
+async def mongo_feed_posts(sort_by: str = "date", limit: int = 50, after=None, excerpt_len=None) -> list:
+    query, sort = db_mongo.feed_query(sort_by, after)
+    projection = db_mongo.summary_projection(excerpt_len) if excerpt_len is not None else db_mongo.POST_PROJECTION
+    cursor = _mdb().posts.find(query, projection).sort(sort).limit(limit)
+    posts = [_with_str_id(doc) for doc in await cursor.to_list(limit)]
+    # One $in read for the distinct authors; post counts come from those documents, no query per author.
+    authors = await mongo_get_users({p["user_id"] for p in posts})
+    for p in posts:
+        author = authors.get(p["user_id"])
+        p["author_post_count"] = db_mongo._post_count(author)
+        p["author_name"] = author["name"] if author else "Unknown"
+        p["user_name"] = p["author_name"]
+    return posts
+
+
+@metrics.timed("mongodb")
+async def mongo_get_comments_for_post(post_id: str) -> list:
+    cursor = _mdb().comments.find({"post_id": post_id}).sort("created_at", 1)
+    return [_with_str_id(doc) for doc in await cursor.to_list(None)]
+
+
+@metrics.timed("mongodb")
+async def mongo_get_comments_for_posts(post_ids) -> dict:
+    ids = list(post_ids)
+    out = {pid: [] for pid in ids}
+    cursor = _mdb().comments.find({"post_id": {"$in": ids}}).sort([("post_id", 1), ("created_at", 1), ("_id", 1)])
+    for doc in await cursor.to_list(None):
+        out[doc["post_id"]].append(_with_str_id(doc))
+    return out
+
+
+@metrics.timed("mongodb")
+async def mongo_get_comments_page(post_id: str, limit: int, after=None) -> list:
+    query = db_mongo.comments_page_query(post_id, after)
+    cursor = _mdb().comments.find(query).sort(db_mongo.COMMENTS_PAGE_SORT).limit(limit)
+    return [_with_str_id(doc) for doc in await cursor.to_list(limit)]
+
+
+# --- Cassandra (execute_async) ---
+
+async def _session():
+    """The shared session; the first call connects (schema + prepare hooks) in a thread, off the loop."""
+    global _cassandra_pid
+    if _cassandra_pid == os.getpid():
+        return db_cassandra.get_cassandra_session()
+    session = await asyncio.to_thread(db_cassandra.get_cassandra_session)
+    _cassandra_pid = os.getpid()
+    return session
+
+
+async def _execute(name: str, params=()) -> list:
+    """Run a registered statement without blocking the loop; every page is fetched, rows returned as a list."""
+    s = await _session()
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    timeout = db_cassandra.STATEMENTS[name][1].get("timeout")
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    rf = s.execute_async(db_cassandra._stmt(name), params, **kwargs)
+    rows = []
+
+    def resolve(result=None, error=None):
+        if fut.done():
+            return
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    # Driver callbacks run on its event thread: hand results back to the asyncio loop.
+    def on_page(page):
+        rows.extend(page)
+        if rf.has_more_pages:
+            rf.start_fetching_next_page()
+        else:
+            loop.call_soon_threadsafe(resolve, rows)
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(resolve, None, exc)
+
+    rf.add_callbacks(on_page, on_error)
+    return await fut
+
+
+def _user_row(r) -> dict:
+    return {"id": r.id, "name": r.name, "email": r.email, "created_at": r.created_at}
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_versions(keys) -> dict:
+    return {r.key: (r.version, r.changed_at) for r in await _execute("versions_get", (list(keys),))}
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_user(user_id: str):
+    rows = await _execute("user_get", (user_id,))
+    return _user_row(rows[0]) if rows else None
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_users(user_ids) -> dict:
+    ids = list(set(user_ids))
+    found = await asyncio.gather(*(cassandra_get_user(uid) for uid in ids))
+    return {u["id"]: u for u in found if u}
+
+
+@metrics.timed("cassandra")
+async def cassandra_count_posts_by_user(user_id: str) -> int:
+    rows = await _execute("post_count_get", (user_id,))
+    return rows[0].post_count or 0 if rows else 0
+
+
+@metrics.timed("cassandra")
+async def cassandra_count_posts_by_users(user_ids) -> dict:
+    ids = list(set(user_ids))
+    counts = await asyncio.gather(*(cassandra_count_posts_by_user(uid) for uid in ids))
+    return dict(zip(ids, counts))
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_post(post_id: str):
+    rows = await _execute("post_get", (post_id,))
+    return db_cassandra._post_row(rows[0]) if rows else None
+
+
+async def _walk_feed(limit: int, first, buckets: list, page_stmt: str, row) -> list:
+    """Async db_cassandra._walk_feed: partitions are read in order until limit rows are collected."""
+    posts = []
+    if first is not None:
+        name, params = first
+        posts.extend(row(r) for r in await _execute(name, params + (limit,)))
+    for b in buckets:
+        if len(posts) >= limit:
+            break
+        posts.extend(row(r) for r in await _execute(page_stmt, (b.bucket, limit - len(posts))))
+    return posts
+
+
+async def _list_posts(sort_by: str, limit: int, after, excerpt_len=None) -> list:
+    if sort_by == "content":
+        table, row = db_cassandra._feed_table("posts_by_content", excerpt_len)
+        if after is None:
+            buckets = await _execute("feed_buckets_asc", ("content",))
+            return await _walk_feed(limit, None, buckets, f"{table}_page", row)
+        sort_key = content_sort_key(after[0])
+        prefix = db_cassandra._content_bucket(sort_key)
+        first = (f"{table}_after", (prefix, sort_key, after[1]))
+        buckets = await _execute("feed_buckets_after", ("content", prefix))
+        return await _walk_feed(limit, first, buckets, f"{table}_page", row)
+    table, row = db_cassandra._feed_table("posts_by_day", excerpt_len)
+    if after is None:
+        return await _walk_feed(limit, None, await _execute("feed_buckets_desc", ("day",)), f"{table}_page", row)
+    created_at, last_id = after
+    day = db_cassandra._day_bucket(created_at)
+    first = (f"{table}_after", (day, created_at, last_id))
+    return await _walk_feed(limit, first, await _execute("feed_buckets_before", ("day", day)), f"{table}_page", row)
+
+
+@metrics.timed("cassandra")
+async def cassandra_feed_posts(sort_by: str = "date", limit: int = 50, after=None, excerpt_len=None) -> list:
+    posts = await _list_posts(sort_by, limit, after, excerpt_len)
+    author_ids = {p["user_id"] for p in posts}
+    authors, counts = await asyncio.gather(cassandra_get_users(author_ids), cassandra_count_posts_by_users(author_ids))
+    for p in posts:
+        p["author_post_count"] = counts.get(p["user_id"], 0)
+        author = authors.get(p["user_id"])
+        p["author_name"] = author["name"] if author else "Unknown"
+        p["user_name"] = p["author_name"]
+    return posts
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_comments_for_post(post_id: str) -> list:
+    return [db_cassandra._comment_row(r, post_id) for r in await _execute("comments_by_post", (post_id,))]
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_comments_for_posts(post_ids) -> dict:
+    ids = list(post_ids)
+    found = await asyncio.gather(*(cassandra_get_comments_for_post(pid) for pid in ids))
+    return dict(zip(ids, found))
+
+
+@metrics.timed("cassandra")
+async def cassandra_get_comments_page(post_id: str, limit: int, after=None) -> list:
+    if after is None:
+        rows = await _execute("comments_by_post_page", (post_id, limit))
+    else:
+        rows = await _execute("comments_by_post_after", (post_id, after[0], after[1], limit))
+    return [db_cassandra._comment_row(r, post_id) for r in rows]
+
+
+# --- Routed reads (db.py semantics) ---
+
+async def _read(op: str, mongo_fn, cassandra_fn, *args, **kwargs):
+    """db._read for an async MongoDB read; cassandra_fn is the db_cassandra function shadow.py replays."""
+    if shadow_reads():
+        return await shadow.read_async(op, mongo_fn, cassandra_fn, *args, **kwargs)
+    return await mongo_fn(*args, **kwargs)
+
+
+async def _versions(keys: list[str]) -> tuple[str, dict, datetime]:
+    read_at = datetime.utcnow()
+    if read_from_mongodb():
+        return "mongodb", await mongo_get_versions(keys), read_at
+    return "cassandra", await cassandra_get_versions(keys), read_at
+
+
+@metrics.timed("db_async")
+async def feed_validator(variant: str = ""):
+    """db.feed_validator: (etag, last_modified) for a feed response."""
+    store, found, read_at = await _versions([versions.FEED])
+    return versions.validator("feed", store, [versions.FEED], found, read_at, variant)
+
+
+@metrics.timed("db_async")
+async def post_validator(post_id: str, variant: str = ""):
+    """db.post_validator: (etag, last_modified) for a post page."""
+    keys = versions.post_validator_keys(post_id)
+    store, found, read_at = await _versions(keys)
+    return versions.validator("post", store, keys, found, read_at, variant)
+
+
+@metrics.timed("db_async")
+async def get_user(user_id: str):
+    u = db._user_cache.get(user_id)
+    if u is not MISSING:
+        return u
+    u = None
+    if read_from_mongodb():
+        u = await _read("get_user", mongo_get_user, db_cassandra.cassandra_get_user, user_id)
+    if u is None and read_from_cassandra():
+        u = await cassandra_get_user(user_id)
+    db._user_cache.set(user_id, u)
+    return u
+
+
+@metrics.timed("db_async")
+async def get_users(user_ids) -> dict:
+    users, ids = {}, set()
+    for uid in set(user_ids):
+        if not uid:
+            continue
+        u = db._user_cache.get(uid)
+        if u is MISSING:
+            ids.add(uid)
+        elif u is not None:
+            users[uid] = u
+    found = {}
+    if read_from_mongodb() and ids:
+        found.update(await _read("get_users", mongo_get_users, db_cassandra.cassandra_get_users, ids))
+    missing = ids - found.keys()
+    if read_from_cassandra() and missing:
+        found.update(await cassandra_get_users(missing))
+    for uid in ids:
+        db._user_cache.set(uid, found.get(uid))
+    users.update(found)
+    return users
+
+
+@metrics.timed("db_async")
+async def count_posts_by_user(user_id: str) -> int:
+    if read_from_mongodb():
+        return await _read(
+            "count_posts_by_user", mongo_count_posts_by_user, db_cassandra.cassandra_count_posts_by_user, user_id
+        )
+    return await cassandra_count_posts_by_user(user_id)
+
+
+@metrics.timed("db_async")
+async def get_post(post_id: str):
+    p = db._post_cache.get(post_id)
+    if p is not MISSING:
+        return p
+    p = None
+    if read_from_mongodb():
+        p = await _read("get_post", mongo_get_post, db_cassandra.cassandra_get_post, post_id)
+    if p is None and read_from_cassandra():
+        p = await cassandra_get_post(post_id)
+    db._post_cache.set(post_id, p)
+    return p
+
+
+@metrics.timed("db_async")
+async def get_comments_for_post(post_id: str) -> list:
+    if read_from_mongodb():
+        return await _read(
+            "get_comments_for_post", mongo_get_comments_for_post, db_cassandra.cassandra_get_comments_for_post, post_id
+        )
+    return await cassandra_get_comments_for_post(post_id)
+
+
+@metrics.timed("db_async")
+async def get_comments_for_posts(post_ids) -> dict:
+    ids = list(dict.fromkeys(pid for pid in post_ids if pid))
+    if not ids:
+        return {}
+    if read_from_mongodb():
+        return await _read(
+            "get_comments_for_posts", mongo_get_comments_for_posts, db_cassandra.cassandra_get_comments_for_posts, ids
+        )
+    return await cassandra_get_comments_for_posts(ids)
+
+
+@metrics.timed("db_async")
+async def get_comments_page(post_id: str, limit: int, cursor: str | None = None) -> tuple[list, str | None]:
+    after = db._comments_after(cursor)
+    if read_from_mongodb():
+        comments = await _read(
+            "get_comments_page", mongo_get_comments_page, db_cassandra.cassandra_get_comments_page,
+            post_id, limit + 1, after,
+        )
+    else:
+        comments = await cassandra_get_comments_page(post_id, limit + 1, after)
+    return db._comments_next_page(comments, limit)
+
+
+@metrics.timed("db_async")
+async def feed_page(
+    sort_by: str = "date", limit: int = 50, cursor: str | None = None, excerpt_len: int | None = None
+) -> tuple[list, str | None]:
+    sort_by = "content" if sort_by == "content" else "date"
+    excerpt_len = db._excerpt_len(excerpt_len)
+    pos = db._feed_cursor(sort_by, cursor)
+    after = None
+    if pos is not None and sort_by == "content":
+        last = await get_post(pos["id"])
+        if last is None:
+            raise ValueError("invalid cursor")
+        after = (last.get("content") or "", pos["id"])
+    elif pos is not None:
+        after = (ms_to_dt(pos["t"]), pos["id"])
+    if read_from_mongodb():
+        posts = await _read(
+            "feed_posts", mongo_feed_posts, db_cassandra.cassandra_feed_posts,
+            sort_by=sort_by, limit=limit + 1, after=after, excerpt_len=excerpt_len,
+        )
+    else:
+        posts = await cassandra_feed_posts(sort_by=sort_by, limit=limit + 1, after=after, excerpt_len=excerpt_len)
+    return db._feed_next_page(sort_by, posts, limit)
+
+
+@metrics.timed("db_async")
+async def get_post_page(post_id: str, comments_limit: int | None = None, comments_cursor: str | None = None):
+    """(post, comments, users by id) for a post page in two concurrent rounds, or None if the post is missing.
+
+    Round one reads the post and its comments together; round two resolves the author, every
+    commenter and the author's post count together. The post carries author_name,
+    author_post_count and, when paged, next_comments_cursor.
+    """
+    if comments_limit is None:
+        comments_read = get_comments_for_post(post_id)
+    else:
+        comments_read = get_comments_page(post_id, comments_limit, comments_cursor)
+    post, comments = await asyncio.gather(get_post(post_id), comments_read)
+    if not post:
+        return None
+    if comments_limit is not None:
+        comments, post["next_comments_cursor"] = comments
+    user_ids = {c["user_id"] for c in comments} | {post["user_id"]}
+    users, post["author_post_count"] = await asyncio.gather(get_users(user_ids), count_posts_by_user(post["user_id"]))
+    author = users.get(post["user_id"])
+    post["author_name"] = post["user_name"] = author["name"] if author else "Unknown"
+    return post, comments, users
+
+
+@metrics.timed("db_async")
+async def get_post_with_comments(post_id: str, comments_limit: int | None = None, comments_cursor: str | None = None):
+    """db.get_post_with_comments shape (Iteration 2), built with get_post_page."""
+    page = await get_post_page(post_id, comments_limit, comments_cursor)
+    if page is None:
+        return None
+    post, comments, users = page
+    post["comments"] = [db._comment_view(c, users) for c in comments]
+    return post
+
+
+@metrics.timed("db_async")
+async def get_comments_for_posts_with_authors(post_ids) -> dict:
+    by_post = await get_comments_for_posts(post_ids)
+    users = await get_users(c["user_id"] for comments in by_post.values() for c in comments)
+    return {pid: [db._comment_view(c, users) for c in comments] for pid, comments in by_post.items()}
+
+
+# --- Writes, scans and the user directory (db.py in a worker thread) ---
+
+async def list_users() -> list:
+    return await asyncio.to_thread(db.list_users)
+
+
+async def list_users_page(limit: int = 50, cursor: str | None = None) -> tuple[list, str | None]:
+    return await asyncio.to_thread(db.list_users_page, limit, cursor)
+
+
+async def find_users(prefix: str, limit: int = 10) -> list:
+    return await asyncio.to_thread(db.find_users, prefix, limit)
+
+
+async def create_user(name: str, email: str) -> dict:
+    return await asyncio.to_thread(db.create_user, name, email)
+
+
+async def create_users(users: list) -> list:
+    return await asyncio.to_thread(db.create_users, users)
+
+
+async def create_post(user_id: str, title: str, content: str) -> dict:
+    return await asyncio.to_thread(db.create_post, user_id, title, content)
+
+
+async def create_posts(posts: list) -> list:
+    return await asyncio.to_thread(db.create_posts, posts)
+
+
+async def create_comment(post_id: str, user_id: str, content: str) -> dict:
+    return await asyncio.to_thread(db.create_comment, post_id, user_id, content)
+
+
+async def create_comments(comments: list) -> list:
+    return await asyncio.to_thread(db.create_comments, comments)
@@ -1,31 +1,259 @@
 """Cassandra access: same schema as MongoDB for migration."""
 
+import re
 from datetime import datetime
 from typing import Any, Optional
 from uuid import uuid4
 
-from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+from cassandra.query import BatchStatement
 
-from config import CASSANDRA_HOSTS, CASSANDRA_KEYSPACE
+import connections
+import metrics
+import versions
+from config import BULK_CONCURRENCY, BULK_MAX_ITEMS, CASSANDRA_KEYSPACE, FEED_EXCERPT_MAX_LEN
+from cursors import content_sort_key
 
-_session = None
+
+# Every statement on the request and job paths, prepared once per session (see _prepare_statements).
+# name -> (cql, options); options: fetch_size (rows per page), idempotent (safe to retry/speculate),
+# timeout (seconds, overrides the session default).
+STATEMENTS: dict[str, tuple[str, dict]] = {
+    # users
+    "user_insert": ("INSERT INTO users (id, name, email, created_at) VALUES (?, ?, ?, ?)", {"idempotent": True}),
+    "user_get": ("SELECT id, name, email, created_at FROM users WHERE id = ?", {"idempotent": True}),
+    "user_scan": ("SELECT id, name, email, created_at FROM users", {"idempotent": True, "fetch_size": 1000}),
+    "user_by_prefix_insert": (
+        "INSERT INTO users_by_prefix (field, prefix, term, id, name, email, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        {"idempotent": True},
+    ),
+    "users_by_prefix_range": (
+        "SELECT term, id, name, email, created_at FROM users_by_prefix "
+        "WHERE field = ? AND prefix = ? AND term >= ? AND term < ? LIMIT ?",
+        {"idempotent": True},
+    ),
+    "users_by_prefix_page": (
+        "SELECT term, id, name, email, created_at FROM users_by_prefix WHERE field = ? AND prefix = ? LIMIT ?",
+        {"idempotent": True},
+    ),
+    "users_by_prefix_after": (
+        "SELECT term, id, name, email, created_at FROM users_by_prefix "
+        "WHERE field = ? AND prefix = ? AND (term, id) > (?, ?) LIMIT ?",
+        {"idempotent": True},
+    ),
+    # per-author post counters (counter updates are not idempotent)
+    "post_count_get": ("SELECT user_id, post_count FROM user_post_counts WHERE user_id = ?", {"idempotent": True}),
+    "post_count_add": ("UPDATE user_post_counts SET post_count = post_count + ? WHERE user_id = ?", {}),
+    "post_count_scan": (
+        "SELECT user_id, post_count FROM user_post_counts", {"idempotent": True, "fetch_size": 1000, "timeout": 60}
+    ),
+    "post_count_by_author": ("SELECT COUNT(*) FROM posts WHERE user_id = ?", {"idempotent": True, "timeout": 30}),
+    # posts and feed tables
+    "post_insert": (
+        "INSERT INTO posts (id, user_id, title, content, created_at) VALUES (?, ?, ?, ?, ?)", {"idempotent": True}
+    ),
+    "post_by_day_insert": (
+        "INSERT INTO posts_by_day (day, created_at, id, user_id, title, content) VALUES (?, ?, ?, ?, ?, ?)",
+        {"idempotent": True},
+    ),
+    "post_by_content_insert": (
+        "INSERT INTO posts_by_content (prefix, sort_key, id, user_id, title, content, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        {"idempotent": True},
+    ),
+    "post_summary_by_day_insert": (
+        "INSERT INTO post_summaries_by_day (day, created_at, id, user_id, title, excerpt, content_length) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        {"idempotent": True},
+    ),
+    "post_summary_by_content_insert": (
+        "INSERT INTO post_summaries_by_content (prefix, sort_key, id, user_id, title, excerpt, content_length, "
+        "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        {"idempotent": True},
+    ),
+    "feed_bucket_insert": ("INSERT INTO feed_buckets (feed, bucket) VALUES (?, ?)", {"idempotent": True}),
+    "post_get": ("SELECT id, user_id, title, content, created_at FROM posts WHERE id = ?", {"idempotent": True}),
+    "post_scan": (
+        "SELECT id, user_id, title, content, created_at FROM posts", {"idempotent": True, "fetch_size": 500, "timeout": 60}
+    ),
+    "post_author_scan": ("SELECT user_id FROM posts", {"idempotent": True, "fetch_size": 1000, "timeout": 60}),
+    "feed_buckets_desc": (
+        "SELECT bucket FROM feed_buckets WHERE feed = ? ORDER BY bucket DESC", {"idempotent": True, "fetch_size": 100}
+    ),
+    "feed_buckets_asc": (
+        "SELECT bucket FROM feed_buckets WHERE feed = ? ORDER BY bucket ASC", {"idempotent": True, "fetch_size": 100}
+    ),
+    "feed_buckets_before": (
+        "SELECT bucket FROM feed_buckets WHERE feed = ? AND bucket < ? ORDER BY bucket DESC",
+        {"idempotent": True, "fetch_size": 100},
+    ),
+    "feed_buckets_range": (
+        "SELECT bucket FROM feed_buckets WHERE feed = ? AND bucket >= ? AND bucket < ? ORDER BY bucket ASC",
+        {"idempotent": True, "fetch_size": 100},
+    ),
+    "feed_buckets_after": (
+        "SELECT bucket FROM feed_buckets WHERE feed = ? AND bucket > ? ORDER BY bucket ASC",
+        {"idempotent": True, "fetch_size": 100},
+    ),
+    "posts_by_day_page": (
+        "SELECT id, user_id, title, content, created_at FROM posts_by_day WHERE day = ? LIMIT ?", {"idempotent": True}
+    ),
+    "posts_by_content_page": (
+        "SELECT id, user_id, title, content, created_at FROM posts_by_content WHERE prefix = ? LIMIT ?",
+        {"idempotent": True},
+    ),
+    "posts_by_day_after": (
+        "SELECT id, user_id, title, content, created_at FROM posts_by_day "
+        "WHERE day = ? AND (created_at, id) < (?, ?) LIMIT ?",
+        {"idempotent": True},
+    ),
+    "posts_by_content_after": (
+        "SELECT id, user_id, title, content, created_at FROM posts_by_content "
+        "WHERE prefix = ? AND (sort_key, id) > (?, ?) LIMIT ?",
+        {"idempotent": True},
+    ),
+    "post_summaries_by_day_page": (
+        "SELECT id, user_id, title, excerpt, content_length, created_at FROM post_summaries_by_day "
+        "WHERE day = ? LIMIT ?",
+        {"idempotent": True},
+    ),
+    "post_summaries_by_content_page": (
+        "SELECT id, user_id, title, excerpt, content_length, created_at FROM post_summaries_by_content "
+        "WHERE prefix = ? LIMIT ?",
+        {"idempotent": True},
+    ),
+    "post_summaries_by_day_after": (
+        "SELECT id, user_id, title, excerpt, content_length, created_at FROM post_summaries_by_day "
+        "WHERE day = ? AND (created_at, id) < (?, ?) LIMIT ?",
+        {"idempotent": True},
+    ),
+    "post_summaries_by_content_after": (
+        "SELECT id, user_id, title, excerpt, content_length, created_at FROM post_summaries_by_content "
+        "WHERE prefix = ? AND (sort_key, id) > (?, ?) LIMIT ?",
+        {"idempotent": True},
+    ),
+    # comments
+    "comment_insert": (
+        "INSERT INTO comments (id, post_id, user_id, content, created_at) VALUES (?, ?, ?, ?, ?)", {"idempotent": True}
+    ),
+    "comment_by_post_insert": (
+        "INSERT INTO comments_by_post (post_id, created_at, id, user_id, content) VALUES (?, ?, ?, ?, ?)",
+        {"idempotent": True},
+    ),
+    "comment_scan": (
+        "SELECT id, post_id, user_id, content, created_at FROM comments",
+        {"idempotent": True, "fetch_size": 500, "timeout": 60},
+    ),
+    "comments_by_post": (
+        "SELECT id, user_id, content, created_at FROM comments_by_post WHERE post_id = ?",
+        {"idempotent": True, "fetch_size": 1000},
+    ),
+    "comments_by_post_page": (
+        "SELECT id, user_id, content, created_at FROM comments_by_post WHERE post_id = ? LIMIT ?", {"idempotent": True}
+    ),
+    "comments_by_post_after": (
+        "SELECT id, user_id, content, created_at FROM comments_by_post "
+        "WHERE post_id = ? AND (created_at, id) > (?, ?) LIMIT ?",
+        {"idempotent": True},
+    ),
+    # change versions (conditional GET, see versions.py)
+    "version_set": ("UPDATE change_versions SET version = ?, changed_at = ? WHERE key = ?", {"idempotent": True}),
+    "versions_get": ("SELECT key, version, changed_at FROM change_versions WHERE key IN ?", {"idempotent": True}),
+    # consistency checks and repair (verify_migration.py, migrate_mongo_to_cassandra.py --repair)
+    "user_token_range": (
+        "SELECT id, name, email, created_at FROM users WHERE token(id) > ? AND token(id) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "post_token_range": (
+        "SELECT id, user_id, title, content, created_at FROM posts WHERE token(id) > ? AND token(id) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "comment_token_range": (
+        "SELECT id, post_id, user_id, content, created_at FROM comments WHERE token(id) > ? AND token(id) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "users_by_prefix_token_range": (
+        "SELECT field, prefix, term, id, name, email, created_at FROM users_by_prefix "
+        "WHERE token(field, prefix) > ? AND token(field, prefix) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "posts_by_day_token_range": (
+        "SELECT day, created_at, id, user_id, title, content FROM posts_by_day WHERE token(day) > ? AND token(day) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "posts_by_content_token_range": (
+        "SELECT prefix, sort_key, id, user_id, title, content, created_at FROM posts_by_content "
+        "WHERE token(prefix) > ? AND token(prefix) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "post_summaries_by_day_token_range": (
+        "SELECT day, created_at, id, user_id, title, excerpt, content_length FROM post_summaries_by_day "
+        "WHERE token(day) > ? AND token(day) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "post_summaries_by_content_token_range": (
+        "SELECT prefix, sort_key, id, user_id, title, excerpt, content_length, created_at FROM post_summaries_by_content "
+        "WHERE token(prefix) > ? AND token(prefix) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "comments_by_post_token_range": (
+        "SELECT post_id, created_at, id, user_id, content FROM comments_by_post "
+        "WHERE token(post_id) > ? AND token(post_id) <= ?",
+        {"idempotent": True, "fetch_size": 1000, "timeout": 60},
+    ),
+    "feed_bucket_scan": ("SELECT feed, bucket FROM feed_buckets", {"idempotent": True, "fetch_size": 1000}),
+    "comment_get": (
+        "SELECT id, post_id, user_id, content, created_at FROM comments WHERE id = ?", {"idempotent": True}
+    ),
+    "user_delete": ("DELETE FROM users WHERE id = ?", {"idempotent": True}),
+    "user_by_prefix_delete": (
+        "DELETE FROM users_by_prefix WHERE field = ? AND prefix = ? AND term = ? AND id = ?", {"idempotent": True}
+    ),
+    "post_delete": ("DELETE FROM posts WHERE id = ?", {"idempotent": True}),
+    "post_by_day_delete": (
+        "DELETE FROM posts_by_day WHERE day = ? AND created_at = ? AND id = ?", {"idempotent": True}
+    ),
+    "post_by_content_delete": (
+        "DELETE FROM posts_by_content WHERE prefix = ? AND sort_key = ? AND id = ?", {"idempotent": True}
+    ),
+    "post_summary_by_day_delete": (
+        "DELETE FROM post_summaries_by_day WHERE day = ? AND created_at = ? AND id = ?", {"idempotent": True}
+    ),
+    "post_summary_by_content_delete": (
+        "DELETE FROM post_summaries_by_content WHERE prefix = ? AND sort_key = ? AND id = ?", {"idempotent": True}
+    ),
+    "comment_delete": ("DELETE FROM comments WHERE id = ?", {"idempotent": True}),
+    "comment_by_post_delete": (
+        "DELETE FROM comments_by_post WHERE post_id = ? AND created_at = ? AND id = ?", {"idempotent": True}
+    ),
+}
+
+_prepared: dict = {}
 
 
 def get_cassandra_session():
-    global _session
-    if _session is None:
-        cassandra_init_schema()
-    return _session
+    """Shared session for this process; schema and prepared statements are set up when it is created (see connections.py)."""
+    return connections.get_cassandra_session()
+
+
+def _stmt(name: str):
+    """Prepared statement registered under name (prepared for the current session)."""
+    get_cassandra_session()
+    return _prepared[name]
 
 
+def _execute(s, name: str, params=()):
+    """Execute a registered statement, honouring its per-statement timeout."""
+    timeout = STATEMENTS[name][1].get("timeout")
+    if timeout is None:
+        return s.execute(_stmt(name), params)
+    return s.execute(_stmt(name), params, timeout=timeout)
+
+
+@connections.on_cassandra_session
 def cassandra_init_schema(session=None):
     """Create keyspace and tables if not exist."""
-    global _session
-    if session is None and _session is None:
-        cluster = Cluster(CASSANDRA_HOSTS)
-        _session = cluster.connect()
-    s = session or _session
+    s = session or get_cassandra_session()
     s.execute(f"""
         CREATE KEYSPACE IF NOT EXISTS {CASSANDRA_KEYSPACE}
         WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
@@ -57,66 +285,570 @@ def cassandra_init_schema(session=None):
             created_at timestamp
         )
     """)
-    try:
-        s.execute(f"CREATE INDEX IF NOT EXISTS ON {CASSANDRA_KEYSPACE}.comments (post_id)")
-    except Exception:
-        pass
+    # User directory and name/email prefix lookup: one row per user and field, keyed by the
+    # lowercased value and partitioned by its first USER_PREFIX_LEN characters.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS users_by_prefix (
+            field text,
+            prefix text,
+            term text,
+            id text,
+            name text,
+            email text,
+            created_at timestamp,
+            PRIMARY KEY ((field, prefix), term, id)
+        )
+    """)
+    # Query-first feed table: newest posts of a UTC day in one partition, already in feed order.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS posts_by_day (
+            day text,
+            created_at timestamp,
+            id text,
+            user_id text,
+            title text,
+            content text,
+            PRIMARY KEY ((day), created_at, id)
+        ) WITH CLUSTERING ORDER BY (created_at DESC, id DESC)
+    """)
+    # Content-sorted feed: partitioned by a short prefix of cursors.content_sort_key, clustered by that key.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS posts_by_content (
+            prefix text,
+            sort_key text,
+            id text,
+            user_id text,
+            title text,
+            content text,
+            created_at timestamp,
+            PRIMARY KEY ((prefix), sort_key, id)
+        )
+    """)
+    # Summary feed: the two feed tables again with a bounded excerpt (FEED_EXCERPT_MAX_LEN) instead of
+    # the body, so a summary page reads a few hundred bytes per post whatever the posts' length.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS post_summaries_by_day (
+            day text,
+            created_at timestamp,
+            id text,
+            user_id text,
+            title text,
+            excerpt text,
+            content_length int,
+            PRIMARY KEY ((day), created_at, id)
+        ) WITH CLUSTERING ORDER BY (created_at DESC, id DESC)
+    """)
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS post_summaries_by_content (
+            prefix text,
+            sort_key text,
+            id text,
+            user_id text,
+            title text,
+            excerpt text,
+            content_length int,
+            created_at timestamp,
+            PRIMARY KEY ((prefix), sort_key, id)
+        )
+    """)
+    # Directory of non-empty feed (and users_by_prefix) partitions, so readers never probe empty buckets.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS feed_buckets (
+            feed text,
+            bucket text,
+            PRIMARY KEY ((feed), bucket)
+        )
+    """)
+    # Comments of one post in a single partition, already in display order.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS comments_by_post (
+            post_id text,
+            created_at timestamp,
+            id text,
+            user_id text,
+            content text,
+            PRIMARY KEY ((post_id), created_at, id)
+        ) WITH CLUSTERING ORDER BY (created_at ASC, id ASC)
+    """)
+    # Change versions behind the ETag / Last-Modified validators: one row per versions key.
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS change_versions (
+            key text PRIMARY KEY,
+            version text,
+            changed_at timestamp
+        )
+    """)
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS user_post_counts (
+            user_id text PRIMARY KEY,
+            post_count counter
+        )
+    """)
     try:
         s.execute(f"CREATE INDEX IF NOT EXISTS ON {CASSANDRA_KEYSPACE}.posts (user_id)")
     except Exception:
         pass
 
 
+@connections.on_cassandra_session
+def _prepare_statements(session):
+    """Prepare every registered statement for a new session (runs after the schema exists).
+
+    A fresh session (first use, after fork, after close_all) gets a fresh set; the driver
+    itself re-prepares on nodes that restart while the session is alive.
+    """
+    global _prepared
+    prepared = {}
+    for name, (cql, opts) in STATEMENTS.items():
+        ps = session.prepare(cql)
+        if "fetch_size" in opts:
+            ps.fetch_size = opts["fetch_size"]
+        ps.is_idempotent = opts.get("idempotent", False)
+        prepared[name] = ps
+    _prepared = prepared
+
+
+# --- Change versions (conditional GET, see versions.py) ---
+
+def cassandra_version_writes(keys) -> list[tuple]:
+    """(statement, params) pairs giving each key a new version (idempotent upserts)."""
+    token, at = versions.new_version()
+    return [(_stmt("version_set"), (token, at, k)) for k in dict.fromkeys(keys)]
+
+
+@metrics.timed("cassandra")
+def cassandra_bump_versions(keys) -> None:
+    s = get_cassandra_session()
+    writes = cassandra_version_writes(keys)
+    if writes:
+        execute_concurrent(s, writes, concurrency=BULK_CONCURRENCY, raise_on_first_error=True)
+
+
+@metrics.timed("cassandra")
+def cassandra_get_versions(keys) -> dict[str, tuple]:
+    """{key: (token, changed_at)} for the keys that have a version (one read; callers pass one or two keys)."""
+    s = get_cassandra_session()
+    return {r.key: (r.version, r.changed_at) for r in _execute(s, "versions_get", (list(keys),))}
+
+
+def _bump_stored_versions(keys: list[str], shared: list[str]) -> list[str]:
+    """Bump the versions of stored bulk items (plus shared keys if any were stored); [] or [error note]."""
+    if not keys:
+        return []
+    try:
+        cassandra_bump_versions(shared + keys)
+    except Exception as e:
+        return [f"change versions not updated: {e}"]
+    return []
+
+
 # --- Users ---
 
-def cassandra_create_user(name: str, email: str) -> dict:
+USER_PREFIX_LEN = 2
+_USER_LOOKUP_FIELDS = ("name", "email")
+
+
+def _user_bucket(term: str) -> str:
+    return term[:USER_PREFIX_LEN] or _EMPTY_PREFIX
+
+
+def _user_rows(uid: str, name: str, email: str, created_at: datetime) -> list[tuple]:
+    """(statement name, params) pairs behind cassandra_user_writes."""
+    rows = [("user_insert", (uid, name, email, created_at))]
+    for field, value in zip(_USER_LOOKUP_FIELDS, (name, email)):
+        term = (value or "").lower()
+        prefix = _user_bucket(term)
+        rows += [
+            ("user_by_prefix_insert", (field, prefix, term, uid, name, email, created_at)),
+            ("feed_bucket_insert", (f"user_{field}", prefix)),
+        ]
+    return rows
+
+
+def cassandra_user_writes(uid: str, name: str, email: str, created_at: datetime) -> list[tuple]:
+    """(statement, params) pairs storing a user in users and users_by_prefix (idempotent upserts)."""
+    return [(_stmt(stmt_name), params) for stmt_name, params in _user_rows(uid, name, email, created_at)]
+
+
+@metrics.timed("cassandra")
+def cassandra_create_user(
+    name: str, email: str, doc_id: Optional[str] = None, created_at: Optional[datetime] = None
+) -> dict:
+    """Insert a user into users and the lookup table (one logged batch)."""
     s = get_cassandra_session()
-    uid = str(uuid4())
-    s.execute(
-        "INSERT INTO users (id, name, email, created_at) VALUES (%s, %s, %s, %s)",
-        (uid, name, email, datetime.utcnow()),
-    )
-    return {"id": uid, "name": name, "email": email}
+    uid = doc_id or str(uuid4())
+    created_at = created_at or datetime.utcnow()
+    batch = BatchStatement()
+    for stmt, params in cassandra_user_writes(uid, name, email, created_at):
+        batch.add(stmt, params)
+    s.execute(batch)
+    return {"id": uid, "name": name, "email": email, "created_at": created_at}
+
+
+def _execute_writes(s, writes_per_item: list[list[tuple]]) -> list[Optional[str]]:
+    """Run every item's (statement, params) writes concurrently; returns one error (or None) per item.
 
+    Identical writes shared by several items (e.g. the same feed bucket row) are sent once and
+    a failure is charged to every item that needed it.
+    """
+    errors = [None] * len(writes_per_item)
+    owners = {}  # (statement, params) -> item indexes
+    for i, writes in enumerate(writes_per_item):
+        for stmt, params in writes:
+            owners.setdefault((stmt, params), []).append(i)
+    if not owners:
+        return errors
+    keys = list(owners)
+    results = execute_concurrent(s, keys, concurrency=BULK_CONCURRENCY, raise_on_first_error=False)
+    for key, (ok, result) in zip(keys, results):
+        if not ok:
+            for i in owners[key]:
+                errors[i] = errors[i] or str(result)
+    return errors
+
+
+@metrics.timed("cassandra")
+def cassandra_create_users(users: list[dict]) -> tuple[list[Optional[str]], Optional[str]]:
+    """Insert many users ({id, name, email, created_at}) with concurrent idempotent inserts; (errors, None)."""
+    s = get_cassandra_session()
+    return _execute_writes(
+        s, [cassandra_user_writes(u["id"], u["name"], u["email"], u["created_at"]) for u in users]
+    ), None
 
+
+@metrics.timed("cassandra")
 def cassandra_list_users() -> list[dict]:
     s = get_cassandra_session()
-    rows = list(s.execute("SELECT id, name, email, created_at FROM users"))
+    rows = _execute(s, "user_scan")
     return [{"id": r.id, "name": r.name, "email": r.email} for r in rows]
 
 
+def _directory_row(r) -> dict:
+    return {"id": r.id, "name": r.name, "email": r.email, "created_at": r.created_at}
+
+
+@metrics.timed("cassandra")
+def cassandra_list_users_page(limit: int, after: Optional[tuple] = None) -> list[dict]:
+    """Users by lowercased name, then id: walk the name partitions of users_by_prefix in order.
+
+    `after` = (lowercased name, id) of the last user already seen.
+    """
+    s = get_cassandra_session()
+    users = []
+    if after is None:
+        buckets = _execute(s, "feed_buckets_asc", ("user_name",))
+    else:
+        prefix = _user_bucket(after[0])
+        users.extend(_execute(s, "users_by_prefix_after", ("name", prefix, after[0], after[1], limit)))
+        buckets = _execute(s, "feed_buckets_after", ("user_name", prefix))
+    for b in buckets:
+        if len(users) >= limit:
+            break
+        users.extend(_execute(s, "users_by_prefix_page", ("name", b.bucket, limit - len(users))))
+    return [_directory_row(r) for r in users]
+
+
+@metrics.timed("cassandra")
+def cassandra_find_users_by_prefix(prefix: str, limit: int) -> list[dict]:
+    """Up to limit users whose lowercased name or email starts with the lowercase prefix.
+
+    Same order as db_mongo.mongo_find_users_by_prefix. A prefix of USER_PREFIX_LEN characters
+    or more is one partition slice per field; shorter ones walk the matching partitions.
+    """
+    s = get_cassandra_session()
+    end = prefix + "\U0010ffff"
+    matches = []
+    for field in _USER_LOOKUP_FIELDS:
+        if len(prefix) >= USER_PREFIX_LEN:
+            buckets = [prefix[:USER_PREFIX_LEN]]
+        else:
+            buckets = [r.bucket for r in _execute(s, "feed_buckets_range", (f"user_{field}", prefix, end))]
+        n = 0
+        for b in buckets:
+            if n >= limit:
+                break
+            rows = list(_execute(s, "users_by_prefix_range", (field, b, prefix, end, limit - n)))
+            matches.extend((r.term, r.id, r) for r in rows)
+            n += len(rows)
+    users, seen = [], set()
+    for _, uid, r in sorted(matches, key=lambda m: m[:2]):
+        if uid not in seen:
+            seen.add(uid)
+            users.append(_directory_row(r))
+    return users[:limit]
+
+
+@metrics.timed("cassandra")
+def cassandra_backfill_users_by_prefix() -> int:
+    """Rebuild users_by_prefix from users (for users written before it existed). Returns users processed."""
+    s = get_cassandra_session()
+    n, chunk = 0, []
+    rows = iter(_execute(s, "user_scan"))
+    while True:
+        for r in rows:
+            chunk.append(cassandra_user_writes(r.id, r.name, r.email, r.created_at))
+            if len(chunk) >= BULK_MAX_ITEMS:
+                break
+        if not chunk:
+            return n
+        failed = [e for e in _execute_writes(s, chunk) if e is not None]
+        if failed:
+            raise RuntimeError(f"{len(failed)} users not backfilled, first error: {failed[0]}")
+        n, chunk = n + len(chunk), []
+
+
+@metrics.timed("cassandra")
 def cassandra_get_user(user_id: str) -> Optional[dict]:
     s = get_cassandra_session()
-    row = s.execute("SELECT id, name, email, created_at FROM users WHERE id = %s", (user_id,)).one()
+    row = _execute(s, "user_get", (user_id,)).one()
     if not row:
         return None
     return {"id": row.id, "name": row.name, "email": row.email, "created_at": row.created_at}
 
 
+@metrics.timed("cassandra")
+def cassandra_get_users(user_ids) -> dict[str, dict]:
+    """Resolve many users with concurrent single-partition reads; returns {id: user} for the ids that exist.
+
+    Concurrent point reads are routed straight to each partition's replicas, unlike a
+    multi-partition IN which funnels every key through one coordinator.
+    """
+    ids = list(set(user_ids))
+    if not ids:
+        return {}
+    s = get_cassandra_session()
+    users = {}
+    results = execute_concurrent_with_args(s, _stmt("user_get"), [(uid,) for uid in ids], concurrency=50)
+    for ok, rows in results:
+        if not ok:
+            raise rows
+        for row in rows:
+            users[row.id] = {"id": row.id, "name": row.name, "email": row.email, "created_at": row.created_at}
+    return users
+
+
+@metrics.timed("cassandra")
 def cassandra_count_posts_by_user(user_id: str) -> int:
+    """Read the maintained counter (kept current by cassandra_create_post)."""
+    s = get_cassandra_session()
+    row = _execute(s, "post_count_get", (user_id,)).one()
+    return row.post_count if row and row.post_count else 0
+
+
+@metrics.timed("cassandra")
+def cassandra_count_posts_by_users(user_ids) -> dict[str, int]:
+    """Counters for many authors with concurrent single-partition reads; unknown authors count 0."""
+    ids = list(set(user_ids))
+    if not ids:
+        return {}
+    s = get_cassandra_session()
+    counts = dict.fromkeys(ids, 0)
+    args = [(uid,) for uid in ids]
+    for ok, rows in execute_concurrent_with_args(s, _stmt("post_count_get"), args, concurrency=50):
+        if not ok:
+            raise rows
+        for row in rows:
+            counts[row.user_id] = row.post_count or 0
+    return counts
+
+
+@metrics.timed("cassandra")
+def _correct_post_counts(s, actual: dict, before: dict, after: dict) -> tuple[int, int]:
+    """Move each counter by (actual - stored); returns (counters adjusted, authors skipped).
+
+    Counters cannot be set, only incremented, and a create writes its post and its counter
+    separately. before and after are the counters read before and after the posts were
+    counted: an author whose counter moved in between had creates landing during the count,
+    so it is skipped (left for the next run) rather than moved by a stale delta. Only a
+    create still in flight when the count ends can leave its author one off.
+    """
+    skipped = {uid for uid in before.keys() | after.keys() if before.get(uid, 0) != after.get(uid, 0)}
+    deltas = [
+        (actual.get(uid, 0) - after.get(uid, 0), uid)
+        for uid in actual.keys() | after.keys()
+        if uid is not None and uid not in skipped and actual.get(uid, 0) != after.get(uid, 0)
+    ]
+    for ok, result in execute_concurrent_with_args(s, _stmt("post_count_add"), deltas, concurrency=50):
+        if not ok:
+            raise result
+    if deltas:
+        cassandra_bump_versions([versions.ALL_POSTS])
+    return len(deltas), len(skipped)
+
+
+def cassandra_recount_user_post_counts(user_ids) -> tuple[int, int]:
+    """Repair the counters of specific authors only (via the posts.user_id index). Returns (adjusted, skipped)."""
+    ids = [uid for uid in set(user_ids) if uid]
+    if not ids:
+        return 0, 0
     s = get_cassandra_session()
-    rows = list(s.execute("SELECT id FROM posts WHERE user_id = %s ALLOW FILTERING", (user_id,)))
-    return len(rows)
+    before = cassandra_count_posts_by_users(ids)
+    actual = {}
+    for uid, (ok, rows) in zip(ids, execute_concurrent_with_args(s, _stmt("post_count_by_author"), [(u,) for u in ids])):
+        if not ok:
+            raise rows
+        actual[uid] = rows.one().count
+    return _correct_post_counts(s, actual, before, cassandra_count_posts_by_users(ids))
+
+
+@metrics.timed("cassandra")
+def cassandra_recount_post_counts() -> tuple[int, int]:
+    """Repair job: rebuild user_post_counts from a full scan of posts. Returns (counters adjusted, authors skipped).
+
+    Safe alongside live writes: authors written to during the scan are skipped (see
+    _correct_post_counts), so rerun until nothing is skipped.
+    """
+    s = get_cassandra_session()
+
+    def counters():
+        return {row.user_id: row.post_count or 0 for row in _execute(s, "post_count_scan")}
+
+    before = counters()
+    actual = {}
+    for row in _execute(s, "post_author_scan"):
+        actual[row.user_id] = actual.get(row.user_id, 0) + 1
+    return _correct_post_counts(s, actual, before, counters())
 
 
 # --- Posts ---
 
-def cassandra_create_post(user_id: str, title: str, content: str) -> dict:
+CONTENT_PREFIX_LEN = 2
+_EMPTY_PREFIX = "\x00"  # partition keys may not be empty; sorts before any real prefix
+
+
+def _day_bucket(created_at: datetime) -> str:
+    return created_at.strftime("%Y-%m-%d")
+
+
+def _content_bucket(sort_key: str) -> str:
+    return sort_key[:CONTENT_PREFIX_LEN] or _EMPTY_PREFIX
+
+
+def _post_rows(pid: str, user_id: str, title: str, content: str, created_at: datetime) -> list[tuple]:
+    """(statement name, params) pairs behind cassandra_post_writes."""
+    day = _day_bucket(created_at)
+    sort_key = content_sort_key(content)
+    prefix = _content_bucket(sort_key)
+    excerpt, length = (content or "")[:FEED_EXCERPT_MAX_LEN], len(content or "")
+    return [
+        ("post_insert", (pid, user_id, title, content, created_at)),
+        ("post_by_day_insert", (day, created_at, pid, user_id, title, content)),
+        ("post_by_content_insert", (prefix, sort_key, pid, user_id, title, content, created_at)),
+        ("post_summary_by_day_insert", (day, created_at, pid, user_id, title, excerpt, length)),
+        ("post_summary_by_content_insert", (prefix, sort_key, pid, user_id, title, excerpt, length, created_at)),
+        ("feed_bucket_insert", ("day", day)),
+        ("feed_bucket_insert", ("content", prefix)),
+    ]
+
+
+def cassandra_post_writes(pid: str, user_id: str, title: str, content: str, created_at: datetime) -> list[tuple]:
+    """(statement, params) pairs storing a post in posts and its feed and summary tables.
+
+    All idempotent upserts (no counter update), so bulk loaders can run them concurrently and retry freely.
+    """
+    return [(_stmt(name), params) for name, params in _post_rows(pid, user_id, title, content, created_at)]
+
+
+# The only rows of a new post written atomically: the post and its date-feed entry. The content and
+# summary feed rows and the feed buckets are idempotent upserts that can be re-derived
+# (cassandra_backfill_feed_tables, verify_migration.py), so they are sent next to the batch.
+_POST_BATCH_STATEMENTS = ("post_insert", "post_by_day_insert")
+
+
+@metrics.timed("cassandra")
+def cassandra_create_post(
+    user_id: str, title: str, content: str, doc_id: Optional[str] = None, created_at: Optional[datetime] = None
+) -> dict:
+    """Insert a post into posts and the feed tables, then move the author's counter and the change versions.
+
+    posts and posts_by_day share a two-partition logged batch; the other feed rows run concurrently
+    with it. The counter update and the version bumps go out together once every row is stored,
+    so a conditional GET never sees the new version before the post.
+
+    doc_id and created_at default to a new uuid and now; dual-write passes the values shared
+    with MongoDB and the migration passes the originals.
+    """
     s = get_cassandra_session()
-    pid = str(uuid4())
-    s.execute(
-        "INSERT INTO posts (id, user_id, title, content, created_at) VALUES (%s, %s, %s, %s, %s)",
-        (pid, user_id, title, content, datetime.utcnow()),
+    pid = doc_id or str(uuid4())
+    created_at = created_at or datetime.utcnow()
+    batch = BatchStatement()
+    writes = [(batch, None)]
+    for name, params in _post_rows(pid, user_id, title, content, created_at):
+        if name in _POST_BATCH_STATEMENTS:
+            batch.add(_stmt(name), params)
+        else:
+            writes.append((_stmt(name), params))
+    execute_concurrent(s, writes, concurrency=BULK_CONCURRENCY, raise_on_first_error=True)
+    follow_up = [(_stmt("post_count_add"), (1, user_id))]
+    follow_up += cassandra_version_writes([versions.FEED, versions.ALL_POSTS, versions.post_key(pid)])
+    execute_concurrent(s, follow_up, concurrency=BULK_CONCURRENCY, raise_on_first_error=True)
+    return {"id": pid, "user_id": user_id, "title": title, "content": content, "created_at": created_at}
+
+
+@metrics.timed("cassandra")
+def cassandra_create_posts(posts: list[dict]) -> tuple[list[Optional[str]], Optional[str]]:
+    """Insert many posts ({id, user_id, title, content, created_at}) into posts and the feed tables.
+
+    The idempotent row writes run concurrently (feed bucket rows deduplicated across the
+    request); author counters are then moved once per author by the number of posts stored,
+    and change versions bumped. Returns (per-item insert error or None, follow-up error or
+    None), like mongo_create_posts.
+    """
+    s = get_cassandra_session()
+    errors = _execute_writes(s, [
+        cassandra_post_writes(p["id"], p["user_id"], p["title"], p["content"], p["created_at"]) for p in posts
+    ])
+    per_author = {}
+    for i, p in enumerate(posts):
+        if errors[i] is None:
+            per_author.setdefault(p["user_id"], []).append(i)
+    deltas = [(len(items), uid) for uid, items in per_author.items()]
+    results = execute_concurrent_with_args(
+        s, _stmt("post_count_add"), deltas, concurrency=BULK_CONCURRENCY, raise_on_first_error=False
     )
-    return {"id": pid, "user_id": user_id, "title": title, "content": content}
+    failed = [(uid, result) for (_, uid), (ok, result) in zip(deltas, results) if not ok]
+    notes = []
+    if failed:
+        notes.append(f"post_count not updated for {len(failed)} authors: {failed[0][1]}")
+    stored = [versions.post_key(p["id"]) for p, err in zip(posts, errors) if err is None]
+    notes += _bump_stored_versions(stored, [versions.FEED, versions.ALL_POSTS])
+    return errors, "; ".join(notes) or None
+
 
+@metrics.timed("cassandra")
+def cassandra_backfill_feed_tables() -> int:
+    """Rebuild the feed and summary tables from posts (for data written before they existed, or after
+    FEED_EXCERPT_MAX_LEN changed). Returns posts processed.
 
+    The rows are idempotent upserts, so they go out concurrently, BULK_MAX_ITEMS posts at a time,
+    with each shared feed bucket row sent once per chunk.
+    """
+    s = get_cassandra_session()
+    n = 0
+    chunk = []
+    for r in _execute(s, "post_scan"):
+        if r.created_at is None:
+            continue
+        chunk.append(cassandra_post_writes(r.id, r.user_id, r.title, r.content, r.created_at))
+        if len(chunk) >= BULK_MAX_ITEMS:
+            n += _backfill_chunk(s, chunk)
+            chunk = []
+    n += _backfill_chunk(s, chunk)
+    cassandra_bump_versions([versions.FEED])
+    return n
+
+
+def _backfill_chunk(s, writes_per_post: list[list[tuple]]) -> int:
+    errors = [e for e in _execute_writes(s, writes_per_post) if e is not None]
+    if errors:
+        raise RuntimeError(f"feed table backfill failed for {len(errors)} posts: {errors[0]}")
+    return len(writes_per_post)
+
+
+@metrics.timed("cassandra")
 def cassandra_get_post(post_id: str) -> Optional[dict]:
     s = get_cassandra_session()
-    row = s.execute(
-        "SELECT id, user_id, title, content, created_at FROM posts WHERE id = %s",
-        (post_id,),
-    ).one()
+    row = _execute(s, "post_get", (post_id,)).one()
     if not row:
         return None
     return {
@@ -128,63 +860,303 @@ def cassandra_get_post(post_id: str) -> Optional[dict]:
     }
 
 
-def cassandra_list_posts_sort_by_date(limit: int = 50) -> list[dict]:
+def _post_row(r) -> dict:
+    return {"id": r.id, "user_id": r.user_id, "title": r.title, "content": r.content, "created_at": r.created_at}
+
+
+def _summary_row(r, excerpt_len: int) -> dict:
+    return {
+        "id": r.id,
+        "user_id": r.user_id,
+        "title": r.title,
+        "excerpt": (r.excerpt or "")[:excerpt_len],
+        "content_length": r.content_length or 0,
+        "created_at": r.created_at,
+    }
+
+
+def _feed_table(table: str, excerpt_len: Optional[int]):
+    """(table, row reader) for a feed read: posts_by_* rows, or their post_summaries_* twin with excerpt_len."""
+    if excerpt_len is None:
+        return table, _post_row
+    return "post_summaries_" + table[len("posts_"):], lambda r: _summary_row(r, excerpt_len)
+
+
+def _walk_feed(s, limit: int, first, buckets, page_stmt: str, row=_post_row) -> list[dict]:
+    """Collect up to limit posts: the (stmt, params) `first` partition slice, then each bucket in order."""
+    posts = []
+    if first is not None:
+        name, params = first
+        posts.extend(row(r) for r in _execute(s, name, params + (limit,)))
+    for b in buckets:
+        if len(posts) >= limit:
+            break
+        posts.extend(row(r) for r in _execute(s, page_stmt, (b.bucket, limit - len(posts))))
+    return posts
+
+
+@metrics.timed("cassandra")
+def cassandra_list_posts_sort_by_date(
+    limit: int = 50, after: Optional[tuple] = None, excerpt_len: Optional[int] = None
+) -> list[dict]:
+    """Newest posts first: walk day partitions backwards until limit rows are collected.
+
+    `after` = (created_at, id) of the last post already seen: the walk resumes inside that
+    post's day partition and continues with older days (clustering-key continuation).
+    With excerpt_len the walk reads post_summaries_by_day (excerpt and content_length, no content).
+    """
+    s = get_cassandra_session()
+    table, row = _feed_table("posts_by_day", excerpt_len)
+    if after is None:
+        return _walk_feed(s, limit, None, _execute(s, "feed_buckets_desc", ("day",)), f"{table}_page", row)
+    created_at, last_id = after
+    day = _day_bucket(created_at)
+    first = (f"{table}_after", (day, created_at, last_id))
+    return _walk_feed(s, limit, first, _execute(s, "feed_buckets_before", ("day", day)), f"{table}_page", row)
+
+
+@metrics.timed("cassandra")
+def cassandra_list_posts_sort_by_content(
+    limit: int = 50, after: Optional[tuple] = None, excerpt_len: Optional[int] = None
+) -> list[dict]:
+    """Content A-Z (case-insensitive): walk prefix partitions in order until limit rows are collected.
+
+    `after` = (content, id) of the last post already seen. With excerpt_len the walk reads
+    post_summaries_by_content.
+    """
     s = get_cassandra_session()
-    rows = s.execute(
-        "SELECT id, user_id, title, content, created_at FROM posts LIMIT %s",
-        (limit,),
+    table, row = _feed_table("posts_by_content", excerpt_len)
+    if after is None:
+        return _walk_feed(s, limit, None, _execute(s, "feed_buckets_asc", ("content",)), f"{table}_page", row)
+    sort_key = content_sort_key(after[0])
+    prefix = _content_bucket(sort_key)
+    first = (f"{table}_after", (prefix, sort_key, after[1]))
+    return _walk_feed(
+        s, limit, first, _execute(s, "feed_buckets_after", ("content", prefix)), f"{table}_page", row
     )
-    posts = list(rows)
-    posts.sort(key=lambda r: r.created_at or datetime.min, reverse=True)
+
+
+# --- Comments ---
+
+def _comment_rows(cid: str, post_id: str, user_id: str, content: str, created_at: datetime) -> list[tuple]:
+    """(statement name, params) pairs behind cassandra_comment_writes."""
     return [
-        {"id": r.id, "user_id": r.user_id, "title": r.title, "content": r.content, "created_at": r.created_at}
-        for r in posts[:limit]
+        ("comment_insert", (cid, post_id, user_id, content, created_at)),
+        ("comment_by_post_insert", (post_id, created_at, cid, user_id, content)),
     ]
 
 
-def cassandra_list_posts_sort_by_content(limit: int = 50) -> list[dict]:
+def cassandra_comment_writes(cid: str, post_id: str, user_id: str, content: str, created_at: datetime) -> list[tuple]:
+    """(statement, params) pairs storing a comment in comments and comments_by_post (idempotent upserts)."""
+    return [(_stmt(name), params) for name, params in _comment_rows(cid, post_id, user_id, content, created_at)]
+
+
+def _comment_batch(cid: str, post_id: str, user_id: str, content: str, created_at: datetime) -> BatchStatement:
+    """Logged batch writing a comment to comments and comments_by_post."""
+    batch = BatchStatement()
+    for stmt, params in cassandra_comment_writes(cid, post_id, user_id, content, created_at):
+        batch.add(stmt, params)
+    return batch
+
+
+@metrics.timed("cassandra")
+def cassandra_create_comment(
+    post_id: str, user_id: str, content: str, doc_id: Optional[str] = None, created_at: Optional[datetime] = None
+) -> dict:
     s = get_cassandra_session()
-    rows = list(s.execute("SELECT id, user_id, title, content, created_at FROM posts"))
-    rows.sort(key=lambda r: (r.content or "").lower())
-    return [
-        {"id": r.id, "user_id": r.user_id, "title": r.title, "content": r.content, "created_at": r.created_at}
-        for r in rows[:limit]
-    ]
+    cid = doc_id or str(uuid4())
+    created_at = created_at or datetime.utcnow()
+    batch = _comment_batch(cid, post_id, user_id, content, created_at)
+    # /api/feed?comments=1 embeds comments, so the feed version moves too.
+    for stmt, params in cassandra_version_writes([versions.FEED, versions.post_key(post_id)]):
+        batch.add(stmt, params)
+    s.execute(batch)
+    return {"id": cid, "post_id": post_id, "user_id": user_id, "content": content, "created_at": created_at}
 
 
-# --- Comments ---
+@metrics.timed("cassandra")
+def cassandra_create_comments(comments: list[dict]) -> tuple[list[Optional[str]], Optional[str]]:
+    """Insert many comments ({id, post_id, user_id, content, created_at}) with concurrent idempotent inserts.
 
-def cassandra_create_comment(post_id: str, user_id: str, content: str) -> dict:
+    Returns (per-item insert error or None, version update error or None).
+    """
     s = get_cassandra_session()
-    cid = str(uuid4())
-    s.execute(
-        "INSERT INTO comments (id, post_id, user_id, content, created_at) VALUES (%s, %s, %s, %s, %s)",
-        (cid, post_id, user_id, content, datetime.utcnow()),
-    )
-    return {"id": cid, "post_id": post_id, "user_id": user_id, "content": content}
+    errors = _execute_writes(s, [
+        cassandra_comment_writes(c["id"], c["post_id"], c["user_id"], c["content"], c["created_at"])
+        for c in comments
+    ])
+    stored = [versions.post_key(c["post_id"]) for c, err in zip(comments, errors) if err is None]
+    return errors, "; ".join(_bump_stored_versions(stored, [versions.FEED])) or None
+
+
+@metrics.timed("cassandra")
+def cassandra_backfill_comments_by_post() -> int:
+    """Rebuild comments_by_post from comments (for data written before it existed). Returns comments processed."""
+    s = get_cassandra_session()
+    n = 0
+    for r in _execute(s, "comment_scan"):
+        if r.created_at is None or not r.post_id:
+            continue
+        s.execute(_comment_batch(r.id, r.post_id, r.user_id, r.content, r.created_at))
+        n += 1
+    cassandra_bump_versions([versions.FEED, versions.ALL_POSTS])
+    return n
 
 
+def _comment_row(r, post_id: str) -> dict:
+    return {"id": r.id, "post_id": post_id, "user_id": r.user_id, "content": r.content, "created_at": r.created_at}
+
+
+@metrics.timed("cassandra")
 def cassandra_get_comments_for_post(post_id: str) -> list[dict]:
+    """All comments of a post, oldest first, from its comments_by_post partition."""
     s = get_cassandra_session()
-    rows = list(s.execute(
-        "SELECT id, post_id, user_id, content, created_at FROM comments WHERE post_id = %s",
-        (post_id,),
-    ))
-    rows.sort(key=lambda r: r.created_at or datetime.min)
+    rows = _execute(s, "comments_by_post", (post_id,))
+    return [_comment_row(r, post_id) for r in rows]
+
+
+@metrics.timed("cassandra")
+def cassandra_get_comments_for_posts(post_ids) -> dict[str, list[dict]]:
+    """Comments of many posts with concurrent single-partition reads, {post_id: [comment]} oldest first."""
+    ids = list(post_ids)
+    s = get_cassandra_session()
+    out = {}
+    results = execute_concurrent_with_args(s, _stmt("comments_by_post"), [(pid,) for pid in ids], concurrency=50)
+    for pid, (ok, rows) in zip(ids, results):
+        if not ok:
+            raise rows
+        out[pid] = [_comment_row(r, pid) for r in rows]
+    return out
+
+
+@metrics.timed("cassandra")
+def cassandra_get_comments_page(post_id: str, limit: int, after: Optional[tuple] = None) -> list[dict]:
+    """Up to limit comments, oldest first, strictly after the (created_at, id) clustering position `after`."""
+    s = get_cassandra_session()
+    if after is None:
+        rows = _execute(s, "comments_by_post_page", (post_id, limit))
+    else:
+        rows = _execute(s, "comments_by_post_after", (post_id, after[0], after[1], limit))
+    return [_comment_row(r, post_id) for r in rows]
+
+
+# --- Consistency checks / repair ---
+
+_TOKEN_RANGE_STATEMENTS = {"users": "user_token_range", "posts": "post_token_range", "comments": "comment_token_range"}
+
+# Query tables of each base table: table -> (base table, insert statement, delete statement).
+# Every query-table row carries the entity id; the delete statement's parameters are its primary key.
+QUERY_TABLES = {
+    "users_by_prefix": ("users", "user_by_prefix_insert", "user_by_prefix_delete"),
+    "posts_by_day": ("posts", "post_by_day_insert", "post_by_day_delete"),
+    "posts_by_content": ("posts", "post_by_content_insert", "post_by_content_delete"),
+    "post_summaries_by_day": ("posts", "post_summary_by_day_insert", "post_summary_by_day_delete"),
+    "post_summaries_by_content": ("posts", "post_summary_by_content_insert", "post_summary_by_content_delete"),
+    "comments_by_post": ("comments", "comment_by_post_insert", "comment_by_post_delete"),
+}
+_ROW_BUILDERS = {"users": _user_rows, "posts": _post_rows, "comments": _comment_rows}
+
+
+def _insert_columns(name: str) -> list[str]:
+    return [c.strip() for c in re.search(r"\(([^)]*)\) VALUES", STATEMENTS[name][0]).group(1).split(",")]
+
+
+def _key_columns(name: str) -> list[str]:
+    return re.findall(r"(\w+) = \?", STATEMENTS[name][0])
+
+
+def cassandra_scan_token_range(table: str, lo: int, hi: int):
+    """Rows of a base or query table whose partition token is in (lo, hi], as dicts (paged, lazy)."""
+    s = get_cassandra_session()
+    for r in _execute(s, _TOKEN_RANGE_STATEMENTS.get(table, f"{table}_token_range"), (lo, hi)):
+        yield r._asdict()
+
+
+def cassandra_query_rows(collection: str, *args) -> list[tuple[str, dict]]:
+    """(query table, row) pairs the write path stores for one entity; args as for cassandra_<entity>_writes."""
+    tables = {insert: table for table, (base, insert, _) in QUERY_TABLES.items() if base == collection}
     return [
-        {"id": r.id, "post_id": r.post_id, "user_id": r.user_id, "content": r.content, "created_at": r.created_at}
-        for r in rows
+        (tables[name], dict(zip(_insert_columns(name), params)))
+        for name, params in _ROW_BUILDERS[collection](*args)
+        if name in tables
     ]
 
 
-def cassandra_feed_posts(sort_by: str = "date", limit: int = 50) -> list[dict]:
+def cassandra_feed_buckets(collection: str, *args) -> set:
+    """(feed, bucket) pairs the write path registers for one entity; args as for cassandra_query_rows."""
+    return {params for name, params in _ROW_BUILDERS[collection](*args) if name == "feed_bucket_insert"}
+
+
+def cassandra_scan_feed_buckets() -> set:
+    """Every (feed, bucket) pair in feed_buckets."""
+    return {(r.feed, r.bucket) for r in _execute(get_cassandra_session(), "feed_bucket_scan")}
+
+
+def cassandra_query_row_key(table: str, row: dict) -> dict:
+    """Primary-key columns of a query-table row."""
+    return {c: row[c] for c in _key_columns(QUERY_TABLES[table][2])}
+
+
+def cassandra_query_row_delete(table: str, key: dict) -> tuple:
+    """(statement, params) removing one query-table row by its primary key."""
+    delete = QUERY_TABLES[table][2]
+    return _stmt(delete), tuple(key[c] for c in _key_columns(delete))
+
+
+def cassandra_delete_writes(collection: str, doc_id: str) -> list[tuple]:
+    """(statement, params) pairs removing one entity and its query-table rows; [] if it does not exist.
+
+    The base row is read first because the denormalised tables are keyed by its old values.
+    """
+    s = get_cassandra_session()
+    if collection == "users":
+        r = _execute(s, "user_get", (doc_id,)).one()
+        if r is None:
+            return []
+        writes = [(_stmt("user_delete"), (doc_id,))]
+        for field, value in zip(_USER_LOOKUP_FIELDS, (r.name, r.email)):
+            term = (value or "").lower()
+            writes.append((_stmt("user_by_prefix_delete"), (field, _user_bucket(term), term, doc_id)))
+        return writes
+    if collection == "posts":
+        r = _execute(s, "post_get", (doc_id,)).one()
+        if r is None:
+            return []
+        writes = [(_stmt("post_delete"), (doc_id,))]
+        if r.created_at is not None:
+            sort_key = content_sort_key(r.content)
+            writes += [
+                (_stmt("post_by_day_delete"), (_day_bucket(r.created_at), r.created_at, doc_id)),
+                (_stmt("post_by_content_delete"), (_content_bucket(sort_key), sort_key, doc_id)),
+                (_stmt("post_summary_by_day_delete"), (_day_bucket(r.created_at), r.created_at, doc_id)),
+                (_stmt("post_summary_by_content_delete"), (_content_bucket(sort_key), sort_key, doc_id)),
+            ]
+        return writes
+    if collection == "comments":
+        r = _execute(s, "comment_get", (doc_id,)).one()
+        if r is None:
+            return []
+        writes = [(_stmt("comment_delete"), (doc_id,))]
+        if r.created_at is not None and r.post_id:
+            writes.append((_stmt("comment_by_post_delete"), (r.post_id, r.created_at, doc_id)))
+        return writes
+    raise ValueError(f"unknown collection {collection!r}")
+
+
+@metrics.timed("cassandra")
+def cassandra_feed_posts(
+    sort_by: str = "date", limit: int = 50, after: Optional[tuple] = None, excerpt_len: Optional[int] = None
+) -> list[dict]:
     if sort_by == "content":
-        posts = cassandra_list_posts_sort_by_content(limit=limit)
+        posts = cassandra_list_posts_sort_by_content(limit=limit, after=after, excerpt_len=excerpt_len)
     else:
-        posts = cassandra_list_posts_sort_by_date(limit=limit)
+        posts = cassandra_list_posts_sort_by_date(limit=limit, after=after, excerpt_len=excerpt_len)
+    author_ids = {p["user_id"] for p in posts}
+    authors = cassandra_get_users(author_ids)
+    counts = cassandra_count_posts_by_users(author_ids)
     for p in posts:
-        p["author_post_count"] = cassandra_count_posts_by_user(p["user_id"])
-        author = cassandra_get_user(p["user_id"])
+        p["author_post_count"] = counts.get(p["user_id"], 0)
+        author = authors.get(p["user_id"])
         p["author_name"] = author["name"] if author else "Unknown"
         p["user_name"] = p["author_name"]
     return posts
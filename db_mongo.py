@@ -5,28 +5,214 @@ from typing import Any, Optional
 
 from pymongo import MongoClient, ASCENDING, DESCENDING
 
-from config import MONGODB_DB, MONGODB_URI
+import connections
+import metrics
+import versions
+from config import MONGODB_AUTO_INDEX, MONGODB_DB
+from cursors import content_sort_key
 
 
 def get_mongo_client() -> MongoClient:
-    return MongoClient(MONGODB_URI)
+    """Shared pooled client for this process (see connections.py)."""
+    return connections.get_mongo_client()
 
 
 def get_db():
     return get_mongo_client()[MONGODB_DB]
 
 
+# Every index the request paths rely on: collection -> [(keys, options)]. mongo_ensure_indexes
+# creates them; mongo_query_shapes lists the queries they serve (checked by ensure_indexes.py).
+MONGO_INDEXES = {
+    "users": [
+        ([("name_lower", ASCENDING), ("_id", ASCENDING)], {"name": "user_name_prefix"}),
+        ([("email_lower", ASCENDING), ("_id", ASCENDING)], {"name": "user_email_prefix"}),
+    ],
+    "posts": [
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "date_sort"}),
+        ([("content_sort_key", ASCENDING), ("_id", ASCENDING)], {"name": "content_sort_key"}),
+    ],
+    "comments": [
+        ([("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], {"name": "post_comments"}),
+    ],
+}
+
+
+@connections.on_mongo_client
+def _auto_ensure_indexes(client):
+    if MONGODB_AUTO_INDEX:
+        mongo_ensure_indexes(client)
+
+
+def mongo_ensure_indexes(client=None) -> list[str]:
+    """Create the MONGO_INDEXES (idempotent: existing identical indexes are left alone). Returns their names.
+
+    Collections queried by mongo_query_shapes() that do not exist yet are created first, so
+    their plans can be checked before the first write. Raises OperationFailure if an index
+    of the same name exists with a different definition.
+    """
+    from pymongo import IndexModel
+    from pymongo.errors import CollectionInvalid
+    db = (client or get_mongo_client())[MONGODB_DB]
+    existing = set(db.list_collection_names())
+    for collection in sorted({shape[1] for shape in mongo_query_shapes()} - existing):
+        try:
+            db.create_collection(collection)
+        except CollectionInvalid:
+            pass  # created by another process meanwhile
+    names = []
+    for collection, indexes in MONGO_INDEXES.items():
+        names += db[collection].create_indexes([IndexModel(keys, **options) for keys, options in indexes])
+    return names
+
+
+def mongo_query_shapes() -> list[tuple]:
+    """(name, collection, filter, sort) of every request-path query, with sample values.
+
+    Built from the same query builders the reads use, so the plan check in ensure_indexes.py
+    explains what production actually runs. Full scans by design (list_users, repair and migration
+    jobs) are not listed.
+    """
+    from bson import ObjectId
+    oid, other = ObjectId(), ObjectId()
+    at = datetime(2024, 1, 1)
+    shapes = [
+        ("change_versions", "change_versions", {"_id": {"$in": [versions.FEED, versions.ALL_POSTS]}}, None),
+        ("user_by_id", "users", {"_id": oid}, None),
+        ("users_by_ids", "users", {"_id": {"$in": [oid, other]}}, None),
+        ("users_page", "users", {}, USERS_PAGE_SORT),
+        ("users_page_after", "users", _keyset("name_lower", "alice", str(oid)), USERS_PAGE_SORT),
+        ("post_by_id", "posts", {"_id": oid}, None),
+        ("comments_for_post", "comments", {"post_id": str(oid)}, [("created_at", ASCENDING)]),
+        ("comments_for_posts", "comments", {"post_id": {"$in": [str(oid), str(other)]}},
+         [("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        ("comments_page", "comments", comments_page_query(str(oid)), COMMENTS_PAGE_SORT),
+        ("comments_page_after", "comments", comments_page_query(str(oid), (at, str(other))), COMMENTS_PAGE_SORT),
+    ]
+    for field in ("name_lower", "email_lower"):
+        shapes.append((f"users_{field}_prefix", "users", {field: _prefix_range("al")},
+                       [(field, ASCENDING), ("_id", ASCENDING)]))
+    for sort_by, after in (("date", (at, str(oid))), ("content", ("hello", str(oid)))):
+        for suffix, position in (("", None), ("_after", after)):
+            query, sort = feed_query(sort_by, position)
+            shapes.append((f"feed_{sort_by}{suffix}", "posts", query, sort))
+    return shapes
+
+
+# --- Change versions (conditional GET, see versions.py) ---
+
+@metrics.timed("mongodb")
+def mongo_bump_versions(keys) -> None:
+    """Give each key a new version: one unordered bulk upsert into change_versions."""
+    from pymongo import UpdateOne
+    token, at = versions.new_version()
+    ops = [UpdateOne({"_id": k}, {"$set": {"v": token, "at": at}}, upsert=True) for k in dict.fromkeys(keys)]
+    if ops:
+        get_db().change_versions.bulk_write(ops, ordered=False)
+
+
+@metrics.timed("mongodb")
+def mongo_get_versions(keys) -> dict[str, tuple]:
+    """{key: (token, changed_at)} for the keys that have a version (one _id lookup)."""
+    docs = get_db().change_versions.find({"_id": {"$in": list(keys)}})
+    return {doc["_id"]: (doc["v"], doc["at"]) for doc in docs}
+
+
+def _bump_stored_versions(keys: list[str], shared: list[str]) -> list[str]:
+    """Bump the versions of stored bulk items (plus shared keys if any were stored); [] or [error note]."""
+    if not keys:
+        return []
+    try:
+        mongo_bump_versions(shared + keys)
+    except Exception as e:
+        return [f"change versions not updated: {e}"]
+    return []
+
+
 # --- Users (authors / commenters) ---
 
-def mongo_create_user(name: str, email: str) -> dict:
+# Server error code of an insert whose _id already exists.
+DUPLICATE_KEY = 11000
+
+
+def _insert_one(collection, doc: dict, existing_ok: bool) -> bool:
+    """Insert doc; with existing_ok a duplicate _id (an earlier attempt of a retried write) is not an error.
+
+    Returns whether the document was inserted now.
+    """
+    from pymongo.errors import DuplicateKeyError
+    try:
+        collection.insert_one(doc)
+    except DuplicateKeyError:
+        if not existing_ok:
+            raise
+        return False
+    return True
+
+
+def _with_id(doc: dict, doc_id: Optional[str]) -> dict:
+    # Dual-write passes an id shared with Cassandra; otherwise MongoDB assigns one.
+    if doc_id is not None:
+        from bson import ObjectId
+        doc["_id"] = ObjectId(doc_id)
+    return doc
+
+
+def _lookup_fields(name: str, email: str) -> dict:
+    """Lowercased copies of name and email: the keys of the user directory and prefix lookup indexes."""
+    return {"name_lower": (name or "").lower(), "email_lower": (email or "").lower()}
+
+
+@metrics.timed("mongodb")
+def mongo_create_user(
+    name: str, email: str, doc_id: Optional[str] = None, created_at: Optional[datetime] = None, existing_ok: bool = False
+) -> dict:
     db = get_db()
-    doc = {"name": name, "email": email, "created_at": datetime.utcnow()}
-    r = db.users.insert_one(doc)
-    doc["_id"] = r.inserted_id
-    doc["id"] = str(r.inserted_id)
+    doc = _with_id({
+        "name": name,
+        "email": email,
+        **_lookup_fields(name, email),
+        "post_count": 0,
+        "created_at": created_at or datetime.utcnow(),
+    }, doc_id)
+    _insert_one(db.users, doc, existing_ok)
+    doc["id"] = str(doc["_id"])
     return doc
 
 
+def _insert_many(collection, docs: list[dict], existing_ok: bool = False) -> list[Optional[str]]:
+    """Unordered insert_many; returns one error message (or None) per doc, in input order.
+
+    Unordered lets the server keep going past a failed document (e.g. a duplicate _id), so one
+    bad item does not abort the rest of the request. With existing_ok a duplicate _id counts as
+    stored (a retried write whose earlier attempt landed).
+    """
+    from pymongo.errors import BulkWriteError
+    errors = [None] * len(docs)
+    if not docs:
+        return errors
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            if not (existing_ok and err.get("code") == DUPLICATE_KEY):
+                errors[err["index"]] = err.get("errmsg", "write error")
+    return errors
+
+
+@metrics.timed("mongodb")
+def mongo_create_users(users: list[dict], existing_ok: bool = False) -> tuple[list[Optional[str]], Optional[str]]:
+    """Insert many users ({id, name, email, created_at}) in one round trip; (per-item error or None, None)."""
+    from bson import ObjectId
+    docs = [
+        {"_id": ObjectId(u["id"]), "name": u["name"], "email": u["email"], **_lookup_fields(u["name"], u["email"]),
+         "post_count": 0, "created_at": u["created_at"]}
+        for u in users
+    ]
+    return _insert_many(get_db().users, docs, existing_ok), None
+
+
+@metrics.timed("mongodb")
 def mongo_list_users() -> list[dict]:
     users = []
     for doc in get_db().users.find():
@@ -35,6 +221,67 @@ def mongo_list_users() -> list[dict]:
     return users
 
 
+USERS_PAGE_SORT = [("name_lower", ASCENDING), ("_id", ASCENDING)]
+
+
+@metrics.timed("mongodb")
+def mongo_list_users_page(limit: int, after: Optional[tuple] = None) -> list[dict]:
+    """Users by lowercased name, then id; `after` = (name_lower, id) of the last user already seen."""
+    query: dict[str, Any] = {}
+    if after is not None:
+        query = _keyset("name_lower", after[0], after[1])
+    users = []
+    for doc in get_db().users.find(query).sort(USERS_PAGE_SORT).limit(limit):
+        doc["id"] = str(doc["_id"])
+        users.append(doc)
+    return users
+
+
+def _prefix_range(prefix: str) -> dict:
+    # Every string starting with prefix sorts in [prefix, prefix + U+10FFFF) in code point order.
+    return {"$gte": prefix, "$lt": prefix + "\U0010ffff"}
+
+
+@metrics.timed("mongodb")
+def mongo_find_users_by_prefix(prefix: str, limit: int) -> list[dict]:
+    """Up to limit users whose lowercased name or email starts with the lowercase prefix.
+
+    One index range read per field; ordered by the matching value (the smaller one when both
+    match), then id.
+    """
+    db = get_db()
+    matches = []
+    for field in ("name_lower", "email_lower"):
+        query = {field: _prefix_range(prefix)}
+        for doc in db.users.find(query).sort([(field, ASCENDING), ("_id", ASCENDING)]).limit(limit):
+            doc["id"] = str(doc["_id"])
+            matches.append((doc[field], doc["id"], doc))
+    users, seen = [], set()
+    for _, uid, doc in sorted(matches, key=lambda m: m[:2]):
+        if uid not in seen:
+            seen.add(uid)
+            users.append(doc)
+    return users[:limit]
+
+
+@metrics.timed("mongodb")
+def mongo_backfill_user_lookup() -> int:
+    """Set name_lower / email_lower on users created before they existed. Returns users updated."""
+    from pymongo import UpdateOne
+    db = get_db()
+    ops, n = [], 0
+    for doc in db.users.find({"name_lower": {"$exists": False}}, {"name": 1, "email": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": _lookup_fields(doc.get("name"), doc.get("email"))}))
+        if len(ops) >= 1000:
+            db.users.bulk_write(ops, ordered=False)
+            n, ops = n + len(ops), []
+    if ops:
+        db.users.bulk_write(ops, ordered=False)
+        n += len(ops)
+    return n
+
+
+@metrics.timed("mongodb")
 def mongo_get_user(user_id: str) -> Optional[dict]:
     from bson import ObjectId
     try:
@@ -47,30 +294,164 @@ def mongo_get_user(user_id: str) -> Optional[dict]:
     return doc
 
 
+@metrics.timed("mongodb")
+def mongo_get_users(user_ids) -> dict[str, dict]:
+    """Resolve many users with one $in query; returns {id: user} for the ids that exist."""
+    from bson import ObjectId
+    oids = []
+    for uid in set(user_ids):
+        try:
+            oids.append(ObjectId(uid))
+        except Exception:
+            continue
+    if not oids:
+        return {}
+    users = {}
+    for doc in get_db().users.find({"_id": {"$in": oids}}):
+        doc["id"] = str(doc["_id"])
+        users[doc["id"]] = doc
+    return users
+
+
+def _post_count(user: Optional[dict]) -> int:
+    # Only correct once recount_post_counts.py has seeded the authors that predate the counters.
+    return (user or {}).get("post_count") or 0
+
+
+@metrics.timed("mongodb")
 def mongo_count_posts_by_user(user_id: str) -> int:
-    return get_db().posts.count_documents({"user_id": user_id})
+    """Read the post_count field maintained on the user document by mongo_create_post."""
+    from bson import ObjectId
+    try:
+        user = get_db().users.find_one({"_id": ObjectId(user_id)}, {"post_count": 1})
+    except Exception:
+        user = None
+    return _post_count(user)
+
+
+@metrics.timed("mongodb")
+def mongo_recount_post_counts() -> tuple[int, int]:
+    """Repair job: recompute users.post_count from posts. Returns (users updated, users skipped).
+
+    Safe alongside live writes: the counters are read before the posts are counted, and each
+    correction only applies while the counter still holds the value read, so an $inc landing
+    during the count is never overwritten; that user is skipped and left for the next run.
+    Only a create still in flight when the count ends can leave its author one off.
+    """
+    from pymongo import UpdateOne
+    db = get_db()
+    stored = {user["_id"]: user.get("post_count") for user in db.users.find({}, {"post_count": 1})}
+    actual = {
+        row["_id"]: row["n"]
+        for row in db.posts.aggregate([{"$group": {"_id": "$user_id", "n": {"$sum": 1}}}])
+    }
+    ops = [
+        UpdateOne({"_id": uid, "post_count": count}, {"$set": {"post_count": actual.get(str(uid), 0)}})
+        for uid, count in stored.items()
+        if count != actual.get(str(uid), 0)
+    ]
+    if not ops:
+        return 0, 0
+    updated = db.users.bulk_write(ops, ordered=False).modified_count
+    mongo_bump_versions([versions.ALL_POSTS])
+    return updated, len(ops) - updated
 
 
 # --- Posts ---
 
-def mongo_create_post(user_id: str, title: str, content: str) -> dict:
+@metrics.timed("mongodb")
+def mongo_backfill_content_sort_key() -> int:
+    """Set content_sort_key on posts created before it existed. Returns posts updated."""
+    from pymongo import UpdateOne
     db = get_db()
-    doc = {
+    ops, n = [], 0
+    for doc in db.posts.find({"content_sort_key": {"$exists": False}}, {"content": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"content_sort_key": content_sort_key(doc.get("content"))}}))
+        if len(ops) >= 1000:
+            db.posts.bulk_write(ops, ordered=False)
+            n, ops = n + len(ops), []
+    if ops:
+        db.posts.bulk_write(ops, ordered=False)
+        n += len(ops)
+    if n:
+        mongo_bump_versions([versions.FEED])
+    return n
+
+
+@metrics.timed("mongodb")
+def mongo_create_post(
+    user_id: str,
+    title: str,
+    content: str,
+    doc_id: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+    existing_ok: bool = False,
+) -> dict:
+    """Insert a post, then bump its author's post_count and the change versions.
+
+    With existing_ok a post already stored under doc_id (a retry whose insert landed but whose
+    counter or version update may not have) runs the counter and version updates again, as a
+    retried Cassandra create does; recount_post_counts.py repairs a counter moved twice.
+    """
+    db = get_db()
+    doc = _with_id({
         "user_id": user_id,
         "title": title,
         "content": content,
-        "created_at": datetime.utcnow(),
-    }
-    r = db.posts.insert_one(doc)
-    doc["_id"] = r.inserted_id
-    doc["id"] = str(r.inserted_id)
+        "content_sort_key": content_sort_key(content),
+        "created_at": created_at or datetime.utcnow(),
+    }, doc_id)
+    _insert_one(db.posts, doc, existing_ok)
+    doc["id"] = str(doc["_id"])
+    from bson import ObjectId
+    if ObjectId.is_valid(user_id):
+        db.users.update_one({"_id": ObjectId(user_id)}, {"$inc": {"post_count": 1}})
+    mongo_bump_versions([versions.FEED, versions.ALL_POSTS, versions.post_key(doc["id"])])
     return doc
 
 
+@metrics.timed("mongodb")
+def mongo_create_posts(posts: list[dict], existing_ok: bool = False) -> tuple[list[Optional[str]], Optional[str]]:
+    """Insert many posts ({id, user_id, title, content, created_at}) and bump their authors' post_count.
+
+    One insert_many plus one bulk_write of $inc updates (one per author, not per post) and one
+    of change versions. Returns (per-item insert error or None, follow-up error or None): a
+    failed counter or version update does not fail the posts, which are stored;
+    recount_post_counts.py repairs the counters. With existing_ok, posts already stored count
+    as stored and get the follow-up updates again, as in mongo_create_post.
+    """
+    from bson import ObjectId
+    from pymongo import UpdateOne
+    db = get_db()
+    docs = [
+        {"_id": ObjectId(p["id"]), "user_id": p["user_id"], "title": p["title"], "content": p["content"],
+         "content_sort_key": content_sort_key(p["content"]), "created_at": p["created_at"]}
+        for p in posts
+    ]
+    errors = _insert_many(db.posts, docs, existing_ok)
+    per_author = {}
+    for i, p in enumerate(posts):
+        if errors[i] is None and ObjectId.is_valid(p["user_id"]):
+            per_author.setdefault(p["user_id"], []).append(i)
+    notes = []
+    if per_author:
+        try:
+            db.users.bulk_write(
+                [UpdateOne({"_id": ObjectId(uid)}, {"$inc": {"post_count": len(items)}}) for uid, items in per_author.items()],
+                ordered=False,
+            )
+        except Exception as e:
+            notes.append(f"post_count not updated for {len(per_author)} authors: {e}")
+    stored = [versions.post_key(p["id"]) for p, err in zip(posts, errors) if err is None]
+    notes += _bump_stored_versions(stored, [versions.FEED, versions.ALL_POSTS])
+    return errors, "; ".join(notes) or None
+
+
+@metrics.timed("mongodb")
 def mongo_get_post(post_id: str) -> Optional[dict]:
     from bson import ObjectId
     try:
-        doc = get_db().posts.find_one({"_id": ObjectId(post_id)})
+        doc = get_db().posts.find_one({"_id": ObjectId(post_id)}, POST_PROJECTION)
     except Exception:
         return None
     if not doc:
@@ -79,9 +460,71 @@ def mongo_get_post(post_id: str) -> Optional[dict]:
     return doc
 
 
-def mongo_list_posts_sort_by_date(limit: int = 50) -> list[dict]:
-    db = get_db()
-    cursor = db.posts.find().sort("created_at", DESCENDING).limit(limit)
+def _keyset_oid(last_id: str):
+    from bson import ObjectId
+    if not ObjectId.is_valid(last_id):
+        raise ValueError("invalid cursor")
+    return ObjectId(last_id)
+
+
+def _keyset(field: str, value, last_id: str, descending: bool = False) -> dict:
+    """Filter for rows strictly after (value, last_id) in (field, _id) order.
+
+    The plain range on field next to the $or gives the planner bounds on the sort index, so it
+    walks that index instead of planning each $or branch separately and sorting in memory.
+    """
+    oid = _keyset_oid(last_id)
+    bound, beyond = ("$lte", "$lt") if descending else ("$gte", "$gt")
+    return {field: {bound: value}, "$or": [{field: {beyond: value}}, {field: value, "_id": {beyond: oid}}]}
+
+
+def feed_query(sort_by: str, after: Optional[tuple] = None) -> tuple[dict, list]:
+    """(filter, sort) of one feed page; shared with the async driver in db_async.py.
+
+    date: newest first, `after` = (created_at, id). content: by content_sort_key then id (the
+    same order as Cassandra's posts_by_content), `after` = (content, id). Both are keyset
+    positions of the last post already seen.
+    """
+    query: dict[str, Any] = {}
+    if sort_by == "content":
+        if after is not None:
+            query.update(_keyset("content_sort_key", content_sort_key(after[0]), after[1]))
+        return query, [("content_sort_key", ASCENDING), ("_id", ASCENDING)]
+    if after is not None:
+        query.update(_keyset("created_at", after[0], after[1], descending=True))
+    return query, [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+# Full post reads leave out the internal sort key, so posts look the same from either store.
+POST_PROJECTION = {"content_sort_key": 0}
+
+
+def summary_projection(excerpt_len: int) -> dict:
+    """Projection returning a post without its body: the first excerpt_len characters and its length.
+
+    Computed server side (MongoDB 4.4+), so long bodies never leave the database on feed reads.
+    """
+    content = {"$ifNull": ["$content", ""]}
+    return {
+        "user_id": 1,
+        "title": 1,
+        "created_at": 1,
+        "excerpt": {"$substrCP": [content, 0, excerpt_len]},
+        "content_length": {"$strLenCP": content},
+    }
+
+
+@metrics.timed("mongodb")
+def mongo_list_posts_sort_by_date(
+    limit: int = 50, after: Optional[tuple] = None, excerpt_len: Optional[int] = None
+) -> list[dict]:
+    """Newest first; `after` = (created_at, id) of the last post already seen (keyset pagination).
+
+    With excerpt_len, posts carry excerpt and content_length instead of content (summary_projection).
+    """
+    query, sort = feed_query("date", after)
+    projection = summary_projection(excerpt_len) if excerpt_len is not None else POST_PROJECTION
+    cursor = get_db().posts.find(query, projection).sort(sort).limit(limit)
     posts = []
     for doc in cursor:
         doc["id"] = str(doc["_id"])
@@ -89,9 +532,14 @@ def mongo_list_posts_sort_by_date(limit: int = 50) -> list[dict]:
     return posts
 
 
-def mongo_list_posts_sort_by_content(limit: int = 50) -> list[dict]:
-    db = get_db()
-    cursor = db.posts.find().sort("content", ASCENDING).limit(limit)
+@metrics.timed("mongodb")
+def mongo_list_posts_sort_by_content(
+    limit: int = 50, after: Optional[tuple] = None, excerpt_len: Optional[int] = None
+) -> list[dict]:
+    """Content A-Z by content_sort_key; `after` = (content, id) of the last post already seen."""
+    query, sort = feed_query("content", after)
+    projection = summary_projection(excerpt_len) if excerpt_len is not None else POST_PROJECTION
+    cursor = get_db().posts.find(query, projection).sort(sort).limit(limit)
     posts = []
     for doc in cursor:
         doc["id"] = str(doc["_id"])
@@ -101,20 +549,48 @@ def mongo_list_posts_sort_by_content(limit: int = 50) -> list[dict]:
 
 # --- Comments ---
 
-def mongo_create_comment(post_id: str, user_id: str, content: str) -> dict:
+@metrics.timed("mongodb")
+def mongo_create_comment(
+    post_id: str,
+    user_id: str,
+    content: str,
+    doc_id: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+    existing_ok: bool = False,
+) -> dict:
+    """Insert a comment and bump the change versions (again, with existing_ok, if it was already stored)."""
     db = get_db()
-    doc = {
+    doc = _with_id({
         "post_id": post_id,
         "user_id": user_id,
         "content": content,
-        "created_at": datetime.utcnow(),
-    }
-    r = db.comments.insert_one(doc)
-    doc["_id"] = r.inserted_id
-    doc["id"] = str(r.inserted_id)
+        "created_at": created_at or datetime.utcnow(),
+    }, doc_id)
+    _insert_one(db.comments, doc, existing_ok)
+    doc["id"] = str(doc["_id"])
+    mongo_bump_versions([versions.FEED, versions.post_key(post_id)])  # /api/feed?comments=1 embeds comments
     return doc
 
 
+@metrics.timed("mongodb")
+def mongo_create_comments(comments: list[dict], existing_ok: bool = False) -> tuple[list[Optional[str]], Optional[str]]:
+    """Insert many comments ({id, post_id, user_id, content, created_at}) in one round trip, then bump versions.
+
+    Returns (per-item insert error or None, version update error or None); existing_ok as in
+    mongo_create_posts.
+    """
+    from bson import ObjectId
+    docs = [
+        {"_id": ObjectId(c["id"]), "post_id": c["post_id"], "user_id": c["user_id"], "content": c["content"],
+         "created_at": c["created_at"]}
+        for c in comments
+    ]
+    errors = _insert_many(get_db().comments, docs, existing_ok)
+    stored = [versions.post_key(c["post_id"]) for c, err in zip(comments, errors) if err is None]
+    return errors, "; ".join(_bump_stored_versions(stored, [versions.FEED])) or None
+
+
+@metrics.timed("mongodb")
 def mongo_get_comments_for_post(post_id: str) -> list[dict]:
     cursor = get_db().comments.find({"post_id": post_id}).sort("created_at", ASCENDING)
     comments = []
@@ -124,16 +600,56 @@ def mongo_get_comments_for_post(post_id: str) -> list[dict]:
     return comments
 
 
+@metrics.timed("mongodb")
+def mongo_get_comments_for_posts(post_ids) -> dict[str, list[dict]]:
+    """Comments of many posts with one $in query, grouped {post_id: [comment]} oldest first."""
+    ids = list(post_ids)
+    out = {pid: [] for pid in ids}
+    cursor = get_db().comments.find({"post_id": {"$in": ids}}).sort(
+        [("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]
+    )
+    for doc in cursor:
+        doc["id"] = str(doc["_id"])
+        out[doc["post_id"]].append(doc)
+    return out
+
+
+COMMENTS_PAGE_SORT = [("created_at", ASCENDING), ("_id", ASCENDING)]
+
+
+def comments_page_query(post_id: str, after: Optional[tuple] = None) -> dict:
+    """Filter for a post's comments strictly after the (created_at, id) position `after` (sort: COMMENTS_PAGE_SORT)."""
+    query: dict[str, Any] = {"post_id": post_id}
+    if after is not None:
+        query.update(_keyset("created_at", after[0], after[1]))
+    return query
+
+
+@metrics.timed("mongodb")
+def mongo_get_comments_page(post_id: str, limit: int, after: Optional[tuple] = None) -> list[dict]:
+    """Up to limit comments, oldest first, strictly after the (created_at, id) position `after`."""
+    cursor = get_db().comments.find(comments_page_query(post_id, after)).sort(COMMENTS_PAGE_SORT).limit(limit)
+    comments = []
+    for doc in cursor:
+        doc["id"] = str(doc["_id"])
+        comments.append(doc)
+    return comments
+
+
 # --- Main feed helpers ---
 
-def mongo_feed_posts(sort_by: str = "date", limit: int = 50) -> list[dict]:
+@metrics.timed("mongodb")
+def mongo_feed_posts(
+    sort_by: str = "date", limit: int = 50, after: Optional[tuple] = None, excerpt_len: Optional[int] = None
+) -> list[dict]:
     if sort_by == "content":
-        posts = mongo_list_posts_sort_by_content(limit=limit)
+        posts = mongo_list_posts_sort_by_content(limit=limit, after=after, excerpt_len=excerpt_len)
     else:
-        posts = mongo_list_posts_sort_by_date(limit=limit)
+        posts = mongo_list_posts_sort_by_date(limit=limit, after=after, excerpt_len=excerpt_len)
+    authors = mongo_get_users(p["user_id"] for p in posts)
     for p in posts:
-        p["author_post_count"] = mongo_count_posts_by_user(p["user_id"])
-        author = mongo_get_user(p["user_id"])
+        author = authors.get(p["user_id"])
+        p["author_post_count"] = _post_count(author)
         p["author_name"] = author["name"] if author else "Unknown"
         p["user_name"] = p["author_name"]
     return posts
@@ -0,0 +1,92 @@
+"""
+Deploy step: create the declared MongoDB indexes and verify every query shape uses them.
+Run it before starting the app servers, which do not build indexes on connect unless
+MONGODB_AUTO_INDEX=true.
+
+Creates db_mongo.MONGO_INDEXES (idempotent: existing identical indexes are left alone), then
+runs explain() on each query in db_mongo.mongo_query_shapes() and fails if a collection it
+queries does not exist or a winning plan contains a COLLSCAN (collection scan), a SORT stage
+(in-memory sort), an EOF stage (nothing to plan against) or no index at all. A query or index
+change that loses its index is caught here instead of in production latency.
+Usage:
+  python ensure_indexes.py                # create indexes, then check the plans
+  python ensure_indexes.py --check-only   # check the plans without creating anything
+  python ensure_indexes.py --no-check     # create indexes only
+
+Exits with status 1 if any plan fails the check.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import db_mongo
+
+# Winning-plan stages that mean a query is not served by an index.
+FORBIDDEN_STAGES = {"COLLSCAN": "collection scan", "SORT": "in-memory sort", "EOF": "empty plan (EOF)"}
+# _id point lookups use these stages, which name no index.
+ID_LOOKUP_STAGES = {"IDHACK", "EXPRESS_IXSCAN", "EXPRESS_CLUSTERED_IXSCAN"}
+
+
+def _stages(node, out: list):
+    """Collect (stage, indexName) of every plan node under node (classic and SBE explain layouts)."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            out.append((node["stage"], node.get("indexName")))
+        for value in node.values():
+            _stages(value, out)
+    elif isinstance(node, list):
+        for value in node:
+            _stages(value, out)
+    return out
+
+
+def plan_problems(explain: dict) -> tuple[list[str], list[str]]:
+    """(problems, indexes used) of one explain() result's winning plan."""
+    stages = _stages(explain.get("queryPlanner", {}).get("winningPlan", {}), [])
+    problems = sorted({FORBIDDEN_STAGES[stage] for stage, _ in stages if stage in FORBIDDEN_STAGES})
+    indexes = sorted({index for _, index in stages if index})
+    if not indexes and not problems and not any(stage in ID_LOOKUP_STAGES for stage, _ in stages):
+        problems.append("no index used")
+    return problems, indexes
+
+
+def check_plans() -> int:
+    """Explain every query shape; print one line each and return the number that failed."""
+    db = db_mongo.get_db()
+    existing = set(db.list_collection_names())
+    failed = 0
+    for name, collection, query, sort in db_mongo.mongo_query_shapes():
+        if collection not in existing:
+            # explain() on a missing collection returns an EOF plan that would look fine.
+            failed += 1
+            print(f"FAIL {name}: collection {collection} does not exist")
+            continue
+        cursor = db[collection].find(query).limit(50)
+        if sort:
+            cursor = cursor.sort(sort)
+        problems, indexes = plan_problems(cursor.explain())
+        if problems:
+            failed += 1
+            print(f"FAIL {name}: {', '.join(problems)}")
+        else:
+            print(f"ok   {name}: {', '.join(indexes) or 'no index'}")
+    return failed
+
+
+def main(argv) -> int:
+    if "--check-only" not in argv:
+        print(f"Indexes in place: {', '.join(db_mongo.mongo_ensure_indexes())}")
+    if "--no-check" in argv:
+        return 0
+    failed = check_plans()
+    if failed:
+        print(f"{failed} query shapes are not fully served by an index")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,316 @@
+"""In-process operation metrics, rendered in the Prometheus text format by app.py's /metrics.
+
+Every routed db.py function and every MongoDB/Cassandra backend call is wrapped with
+@timed(backend). Each call records its latency into a fixed-bucket histogram and, where the
+result is a list or map, the number of rows it returned; exceptions are counted by type and
+re-raised. Series are labelled by op, backend and the READ_SOURCE mode at call time.
+
+Recording is a couple of perf_counter() calls, a bisect and one short lock, so it stays on
+in production. Values are kept per process, and a scrape reaches whichever worker answers it,
+so with several workers set METRICS_DIR: each worker then writes its counters to a file there
+every METRICS_FLUSH_INTERVAL seconds (and at exit) and render() sums the files of all
+workers. A worker's file is named by its pid and process start time, so a reused pid starts
+a new file; render() folds the files of exited workers into one file of exited totals and
+removes them, so counters never go backwards and the directory does not grow. Collector
+families (caches, queues) describe the answering worker and carry a worker="<pid>" label.
+"""
+
+import atexit
+import fcntl
+import functools
+import glob
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import config
+
+# Upper bounds in seconds; the implicit +Inf bucket catches the rest.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_latency = {}  # (op, backend, mode) -> [bucket counts..., +Inf count]
+_latency_sum = {}  # (op, backend, mode) -> total seconds
+_errors = {}  # (op, backend, mode, error) -> count
+_rows = {}  # (op, backend, mode) -> rows returned
+
+# Callables returning [(name, type, help, [(labels dict, value), ...]), ...], sampled at render time.
+_collectors = []
+
+_PREFIXES = ("mongo_", "cassandra_")
+
+log = logging.getLogger(__name__)
+_flusher_pid = None
+
+
+def _rows_in(result):
+    """Rows in a read result: list length, 1 per entity, summed lists for per-key maps, None otherwise."""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        page = result[0]
+        if page and not isinstance(page[0], dict):
+            return None  # a bulk write's (per-item errors, note), not rows
+        return len(page)  # (page, next_cursor)
+    if isinstance(result, dict):
+        if "id" in result:
+            return 1
+        return sum(len(v) if isinstance(v, list) else 1 for v in result.values())
+    return None
+
+
+def observe(op: str, backend: str, seconds: float, rows=None, error: str | None = None):
+    if config.METRICS_DIR and _flusher_pid != os.getpid():
+        _start_flusher()
+    key = (op, backend, config.READ_SOURCE)
+    i = bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        counts = _latency.get(key)
+        if counts is None:
+            counts = _latency[key] = [0] * (len(LATENCY_BUCKETS) + 1)
+            _latency_sum[key] = 0.0
+        counts[i] += 1
+        _latency_sum[key] += seconds
+        if error is not None:
+            ekey = key + (error,)
+            _errors[ekey] = _errors.get(ekey, 0) + 1
+        elif rows is not None:
+            _rows[key] = _rows.get(key, 0) + rows
+
+
+def timed(backend: str, op: str | None = None):
+    """Decorator recording latency, errors and rows for fn (plain or async); op defaults to its name minus the backend prefix."""
+    def decorate(fn):
+        name = op or fn.__name__
+        for prefix in _PREFIXES:
+            if op is None and name.startswith(prefix):
+                name = name[len(prefix):]
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as e:
+                    observe(name, backend, time.perf_counter() - start, error=type(e).__name__)
+                    raise
+                observe(name, backend, time.perf_counter() - start, rows=_rows_in(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                observe(name, backend, time.perf_counter() - start, error=type(e).__name__)
+                raise
+            observe(name, backend, time.perf_counter() - start, rows=_rows_in(result))
+            return result
+        return wrapper
+    return decorate
+
+
+def collector(fn):
+    """Register fn() to contribute extra metric families (cache, queue gauges) to every render."""
+    _collectors.append(fn)
+    return fn
+
+
+def reset():
+    with _lock:
+        _latency.clear()
+        _latency_sum.clear()
+        _errors.clear()
+        _rows.clear()
+
+
+# --- Sharing across worker processes (METRICS_DIR) ---
+
+def _snapshot() -> dict:
+    with _lock:
+        return {
+            "latency": {k: list(v) for k, v in _latency.items()},
+            "latency_sum": dict(_latency_sum),
+            "errors": dict(_errors),
+            "rows": dict(_rows),
+        }
+
+
+# Totals of workers that have exited, folded in by render().
+_EXITED_FILE = "exited.json"
+_own_file = None  # (pid, file name) of this process's counters file
+
+
+def _process_start(pid: int) -> str | None:
+    """Start time of a running process (clock ticks after boot, /proc/<pid>/stat field 22); None once it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _file_name() -> str:
+    global _own_file
+    pid = os.getpid()
+    if _own_file is None or _own_file[0] != pid:
+        _own_file = (pid, f"{pid}-{_process_start(pid)}.json")
+    return _own_file[1]
+
+
+def _empty() -> dict:
+    return {"latency": {}, "latency_sum": {}, "errors": {}, "rows": {}}
+
+
+def _write(path: str, snap: dict):
+    """Write a snapshot atomically, so readers never see half a file."""
+    with open(path + ".tmp", "w") as f:
+        json.dump({name: [[list(k), v] for k, v in values.items()] for name, values in snap.items()}, f)
+    os.replace(path + ".tmp", path)
+
+
+def _read(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {name: {tuple(k): v for k, v in values} for name, values in data.items()}
+
+
+def _add(out: dict, snap: dict):
+    for name, values in snap.items():
+        merged = out[name]
+        for key, value in values.items():
+            if name == "latency":
+                merged[key] = [a + b for a, b in zip(merged.get(key, [0] * len(value)), value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+
+def _flush():
+    """Write this process's counters to its file in METRICS_DIR."""
+    _write(os.path.join(config.METRICS_DIR, _file_name()), _snapshot())
+
+
+def _flusher():
+    while True:
+        time.sleep(config.METRICS_FLUSH_INTERVAL)
+        try:
+            _flush()
+        except OSError as e:
+            log.warning("metrics: flush to %s failed: %s", config.METRICS_DIR, e)
+
+
+def _start_flusher():
+    """Start this process's flush thread (lazily, and again after fork)."""
+    global _flusher_pid
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flusher, name="metrics-flush", daemon=True).start()
+
+
+@atexit.register
+def _flush_at_exit():
+    if config.METRICS_DIR and _flusher_pid == os.getpid():
+        try:
+            _flush()
+        except OSError:
+            pass
+
+
+def _merged() -> dict:
+    """Counters summed over METRICS_DIR: live workers' files (this process's current values included) and exited totals.
+
+    Files of workers that are gone, or whose pid now belongs to another process, are added to
+    the exited totals and removed, under a lock shared by every worker's render().
+    """
+    try:
+        _flush()
+    except OSError as e:
+        log.warning("metrics: flush to %s failed: %s", config.METRICS_DIR, e)
+    out = _empty()
+    with open(os.path.join(config.METRICS_DIR, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited_path = os.path.join(config.METRICS_DIR, _EXITED_FILE)
+        exited = _read(exited_path) or _empty()
+        gone = []
+        for path in glob.glob(os.path.join(glob.escape(config.METRICS_DIR), "*-*.json")):
+            snap = _read(path)
+            if snap is None:
+                continue
+            pid, _, start = os.path.basename(path)[:-len(".json")].partition("-")
+            if pid.isdigit() and _process_start(int(pid)) == start:
+                _add(out, snap)
+            else:
+                _add(exited, snap)
+                gone.append(path)
+        if gone:
+            _write(exited_path, exited)
+            for path in gone:
+                os.remove(path)
+    _add(out, exited)
+    return out
+
+
+# --- Prometheus text format ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _family(lines: list, name: str, kind: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+def render() -> str:
+    snap = _merged() if config.METRICS_DIR else _snapshot()
+    latency, latency_sum, errors, rows = snap["latency"], snap["latency_sum"], snap["errors"], snap["rows"]
+
+    lines = []
+    hist = []
+    for key in sorted(latency):
+        op, backend, mode = key
+        base = {"op": op, "backend": backend, "mode": mode}
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), latency[key]):
+            cumulative += n
+            hist.append(("db_op_duration_seconds_bucket", {**base, "le": bound}, cumulative))
+        hist.append(("db_op_duration_seconds_sum", base, latency_sum[key]))
+        hist.append(("db_op_duration_seconds_count", base, cumulative))
+    lines.append("# HELP db_op_duration_seconds Latency of db.py operations and backend calls.")
+    lines.append("# TYPE db_op_duration_seconds histogram")
+    lines.extend(f"{name}{_labels(labels)} {value}" for name, labels, value in hist)
+
+    _family(lines, "db_op_errors_total", "counter", "Operations that raised, by exception type.", [
+        ({"op": op, "backend": backend, "mode": mode, "error": error}, n)
+        for (op, backend, mode, error), n in sorted(errors.items())
+    ])
+    _family(lines, "db_op_rows_total", "counter", "Rows (entities) returned by each operation.", [
+        ({"op": op, "backend": backend, "mode": mode}, n) for (op, backend, mode), n in sorted(rows.items())
+    ])
+    worker = {"worker": str(os.getpid())} if config.METRICS_DIR else {}
+    for fn in _collectors:
+        for name, kind, help_text, samples in fn():
+            _family(lines, name, kind, help_text, [({**labels, **worker}, value) for labels, value in samples])
+    return "\n".join(lines) + "\n"
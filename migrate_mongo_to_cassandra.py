@@ -3,63 +3,392 @@ Migration script: copy existing data from MongoDB to Cassandra.
 
 Run after Cassandra is set up and schema is created.
 Usage:
-  python migrate_mongo_to_cassandra.py
+  python migrate_mongo_to_cassandra.py                      # copy (or resume copying) users, posts, comments
+  python migrate_mongo_to_cassandra.py --restart            # ignore the checkpoint file and copy everything again
+  python migrate_mongo_to_cassandra.py --only posts,comments --batch-size 2000 --concurrency 256
+  python migrate_mongo_to_cassandra.py --incremental        # copy only documents newer than the stored watermark
+  python migrate_mongo_to_cassandra.py --follow --interval 5  # keep catching up until interrupted
+  python migrate_mongo_to_cassandra.py --repair repairs.jsonl  # replay a verify_migration.py repair list
+  python migrate_mongo_to_cassandra.py --backfill-feeds     # only rebuild feed tables from Cassandra posts
+  python migrate_mongo_to_cassandra.py --backfill-comments  # only rebuild comments_by_post from Cassandra comments
+
+Each collection is read in _id order in batches and written to Cassandra with up to
+--concurrency idempotent inserts in flight, while the next batch is read from MongoDB.
+Cassandra ids are the MongoDB ids (the same ids dual-write uses), so a rerun overwrites rows
+instead of duplicating them. After every batch the last copied _id is saved to the
+checkpoint file; an interrupted run resumes from there. Author post counters are rebuilt
+from the copied posts at the end.
+
+--incremental treats each collection's checkpoint as a watermark: it copies only documents
+whose _id is newer, re-reading a short overlap window (--overlap seconds) because ObjectIds
+are generated by clients and can land slightly out of order. Only the counters of authors
+with newly copied posts are recounted, so each run costs the size of the delta. --follow
+repeats incremental runs, which keeps Cassandra seconds behind until the switch to
+double_write.
 
 Requires: MongoDB running (with existing data), Cassandra running.
 """
 
+import argparse
+import json
+import os
+import queue
 import sys
+import threading
+import time
+from datetime import timedelta
 from pathlib import Path
 
 # Add project root
 ROOT = Path(__file__).resolve().parent
 sys.path.insert(0, str(ROOT))
 
+from cassandra.concurrent import execute_concurrent
+
 import db_mongo
 import db_cassandra
-from config import MONGODB_DB, MONGODB_URI
+import versions
+from config import (
+    MIGRATION_BATCH_SIZE,
+    MIGRATION_CHECKPOINT_FILE,
+    MIGRATION_CONCURRENCY,
+    MIGRATION_WATERMARK_OVERLAP,
+)
+from cursors import ms_to_dt
+
+COLLECTIONS = ("users", "posts", "comments")
+PROGRESS_INTERVAL = 5.0  # seconds between throughput/ETA lines
+
+
+def _created_at(doc):
+    # Documents without created_at fall back to the ObjectId timestamp, so reruns stay deterministic.
+    return doc.get("created_at") or doc["_id"].generation_time.replace(tzinfo=None)
+
+
+def cassandra_writes_for(collection: str, doc: dict) -> list[tuple]:
+    """(statement, params) pairs that store one MongoDB document in Cassandra under the same id."""
+    doc_id = str(doc["_id"])
+    if collection == "users":
+        return db_cassandra.cassandra_user_writes(doc_id, doc.get("name", ""), doc.get("email", ""), _created_at(doc))
+    if collection == "posts":
+        return db_cassandra.cassandra_post_writes(
+            doc_id, str(doc.get("user_id", "")), doc.get("title", ""), doc.get("content", ""), _created_at(doc)
+        )
+    if collection == "comments":
+        return db_cassandra.cassandra_comment_writes(
+            doc_id, str(doc.get("post_id", "")), str(doc.get("user_id", "")), doc.get("content", ""), _created_at(doc)
+        )
+    raise ValueError(f"unknown collection {collection!r}")
+
+
+def write_docs(collection: str, docs: list, concurrency: int = MIGRATION_CONCURRENCY):
+    """Write documents to Cassandra with up to `concurrency` inserts in flight; raises on the first failure.
+
+    The feed and post page versions are bumped with every batch, so pages served from Cassandra
+    are not answered with a stale 304 after a copy or repair.
+    """
+    statements = [w for doc in docs for w in cassandra_writes_for(collection, doc)]
+    if statements:
+        statements += db_cassandra.cassandra_version_writes([versions.FEED, versions.ALL_POSTS])
+        execute_concurrent(
+            db_cassandra.get_cassandra_session(), statements, concurrency=concurrency, raise_on_first_error=True
+        )
+
+
+class Checkpoint:
+    """Per-collection progress persisted as JSON: last copied _id, documents copied, done flag."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def get(self, collection: str) -> dict:
+        return self.state.setdefault(collection, {"last_id": None, "copied": 0, "done": False})
+
+    def advance(self, collection: str, last_id: str, n: int):
+        with self._lock:
+            st = self.get(collection)
+            st["last_id"] = last_id
+            st["copied"] += n
+            self._save()
+
+    def finish(self, collection: str):
+        with self._lock:
+            self.get(collection)["done"] = True
+            self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)  # atomic: a crash never leaves a half-written checkpoint
+
+
+class Progress:
+    """Throughput and ETA readout for one collection."""
+
+    def __init__(self, collection: str, total: int, already: int = 0):
+        self.collection = collection
+        self.total = total
+        self.done = already
+        self._start = time.monotonic()
+        self._start_done = already
+        self._last_report = 0.0
+
+    def add(self, n: int):
+        self.done += n
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            print(self.line(), flush=True)
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        rate = (self.done - self._start_done) / elapsed
+        pct = f" ({100.0 * self.done / self.total:.1f}%)" if self.total else ""
+        eta = ""
+        if rate > 0 and self.total > self.done:
+            eta = f", ETA {_fmt_duration((self.total - self.done) / rate)}"
+        return f"{self.collection}: {self.done}/{self.total}{pct}, {rate:,.0f} docs/s{eta}"
+
+
+def _fmt_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h{m:02d}m{s:02d}s" if h else f"{m}m{s:02d}s"
 
 
-def main():
-    # Init Cassandra schema (creates keyspace + tables, sets session for db_cassandra)
+def _batches(cursor, size: int):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _watermark_query(last_id, overlap: float) -> dict:
+    """_id range newer than the watermark, reaching back `overlap` seconds to catch late inserts."""
+    from bson import ObjectId
+
+    if not last_id:
+        return {}
+    oid = ObjectId(last_id)
+    if overlap > 0:
+        oid = ObjectId.from_datetime(oid.generation_time - timedelta(seconds=overlap))
+    return {"_id": {"$gt": oid}}
+
+
+def copy_collection(
+    collection: str,
+    checkpoint: Checkpoint,
+    batch_size: int,
+    concurrency: int,
+    incremental: bool = False,
+    overlap: float = 0.0,
+    touched_authors: set | None = None,
+) -> int:
+    """Copy one collection from its checkpoint onward; returns documents copied in this run.
+
+    With incremental=True a finished collection is not skipped: its checkpoint is used as the
+    watermark. Authors of copied posts are added to touched_authors when it is given.
+    """
+    from bson import ObjectId
+
+    st = checkpoint.get(collection)
+    coll = db_mongo.get_db()[collection]
+    if incremental:
+        query = _watermark_query(st["last_id"], overlap)
+        progress = Progress(collection, coll.count_documents(query))
+    else:
+        if st["done"]:
+            print(f"{collection}: already copied ({st['copied']} docs), skipping")
+            return 0
+        query = {"_id": {"$gt": ObjectId(st["last_id"])}} if st["last_id"] else {}
+        progress = Progress(collection, coll.estimated_document_count(), already=st["copied"])
+    cursor = coll.find(query).sort("_id", 1).batch_size(batch_size)
+
+    # Two-stage pipeline: this thread reads the next batch from MongoDB while the writer
+    # thread has the previous one in flight against Cassandra.
+    pending = queue.Queue(maxsize=2)
+    errors = []
+    copied = 0
+
+    def writer():
+        nonlocal copied
+        while True:
+            batch = pending.get()
+            if batch is None:
+                return
+            if errors:
+                continue  # drain after a failure; the checkpoint stays at the last good batch
+            try:
+                write_docs(collection, batch, concurrency)
+                if touched_authors is not None and collection == "posts":
+                    touched_authors.update(str(doc.get("user_id", "")) for doc in batch)
+                # The overlap window can re-read documents below the watermark; never move it backwards.
+                last_id = max(str(batch[-1]["_id"]), st["last_id"] or "")
+                checkpoint.advance(collection, last_id, len(batch))
+                copied += len(batch)
+                progress.add(len(batch))
+            except Exception as e:
+                errors.append(e)
+
+    t = threading.Thread(target=writer, name=f"migrate-{collection}", daemon=True)
+    t.start()
+    try:
+        for batch in _batches(cursor, batch_size):
+            if errors:
+                break
+            pending.put(batch)
+    finally:
+        pending.put(None)
+        t.join()
+    if errors:
+        raise errors[0]
+    checkpoint.finish(collection)
+    print(progress.line())
+    return copied
+
+
+def catch_up(checkpoint: Checkpoint, only, batch_size: int, concurrency: int, overlap: float) -> int:
+    """One incremental pass over the collections; returns documents copied."""
+    touched = set()
+    total = 0
+    for collection in COLLECTIONS:
+        if collection in only:
+            total += copy_collection(
+                collection, checkpoint, batch_size, concurrency,
+                incremental=True, overlap=overlap, touched_authors=touched,
+            )
+    touched.discard("")
+    if touched:
+        n, skipped = db_cassandra.cassandra_recount_user_post_counts(touched)
+        print(f"Adjusted {n} of {len(touched)} touched author post counters ({skipped} skipped, written meanwhile)")
+    return total
+
+
+def replay_repairs(path: str, batch_size: int, concurrency: int) -> int:
+    """Apply a verify_migration.py repair list; returns entries applied.
+
+    Every listed id is first removed from Cassandra (with its query-table rows, which are keyed
+    by the old values, and any stale query-table rows the entry lists) and then re-copied from
+    MongoDB if it still exists there. Authors of affected posts get their counters recounted.
+    """
+    from bson import ObjectId
+
+    by_collection = {c: [] for c in COLLECTIONS}
+    stale = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                by_collection[entry["collection"]].append(entry["id"])
+                stale[(entry["collection"], entry["id"])] = [
+                    db_cassandra.cassandra_query_row_delete(
+                        row["table"], {c: ms_to_dt(v) if c == "created_at" else v for c, v in row["key"].items()}
+                    )
+                    for row in entry.get("stale", ())
+                ]
+
+    session = db_cassandra.get_cassandra_session()
+    authors = set()
+    applied = 0
+    for collection in COLLECTIONS:
+        ids = by_collection[collection]
+        for i in range(0, len(ids), batch_size):
+            chunk = ids[i:i + batch_size]
+            if collection == "posts":
+                for pid in chunk:
+                    old = db_cassandra.cassandra_get_post(pid)
+                    if old:
+                        authors.add(old["user_id"])
+            deletes = [w for doc_id in chunk for w in db_cassandra.cassandra_delete_writes(collection, doc_id)]
+            deletes += [w for doc_id in chunk for w in stale[(collection, doc_id)]]
+            if deletes:
+                deletes += db_cassandra.cassandra_version_writes([versions.FEED, versions.ALL_POSTS])
+                execute_concurrent(session, deletes, concurrency=concurrency, raise_on_first_error=True)
+            oids = [ObjectId(doc_id) for doc_id in chunk if ObjectId.is_valid(doc_id)]
+            docs = list(db_mongo.get_db()[collection].find({"_id": {"$in": oids}})) if oids else []
+            write_docs(collection, docs, concurrency)
+            if collection == "posts":
+                authors.update(str(doc.get("user_id", "")) for doc in docs)
+            applied += len(chunk)
+        if ids:
+            print(f"Repaired {len(ids)} {collection}")
+    authors.discard("")
+    if authors:
+        n, skipped = db_cassandra.cassandra_recount_user_post_counts(authors)
+        print(f"Adjusted {n} author post counters ({skipped} skipped, written meanwhile)")
+    return applied
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(COLLECTIONS), help="comma-separated collections to copy")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=MIGRATION_CONCURRENCY, help="Cassandra writes in flight")
+    parser.add_argument("--checkpoint", default=MIGRATION_CHECKPOINT_FILE)
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and copy from the start")
+    parser.add_argument("--incremental", action="store_true", help="copy only documents newer than the watermark")
+    parser.add_argument("--follow", action="store_true", help="repeat incremental runs until interrupted")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between --follow runs")
+    parser.add_argument("--overlap", type=float, default=MIGRATION_WATERMARK_OVERLAP,
+                        help="seconds re-read below the watermark")
+    parser.add_argument("--repair", metavar="FILE", help="replay a verify_migration.py repair list and exit")
+    parser.add_argument("--backfill-feeds", action="store_true")
+    parser.add_argument("--backfill-comments", action="store_true")
+    args = parser.parse_args(list(argv))
+
+    # Init Cassandra schema (opens the shared session, creates keyspace + tables)
     db_cassandra.cassandra_init_schema()
 
-    # Map MongoDB _id (ObjectId) -> Cassandra id (we use new UUIDs and map by order or by storing mapping)
-    user_id_map = {}  # mongo_id_str -> cassandra_id
-    post_id_map = {}
-
-    # 1. Users
-    db = db_mongo.get_db()
-    for doc in db.users.find():
-        mongo_id = str(doc["_id"])
-        name = doc.get("name", "")
-        email = doc.get("email", "")
-        cassandra_user = db_cassandra.cassandra_create_user(name, email)
-        user_id_map[mongo_id] = cassandra_user["id"]
-    print(f"Migrated {len(user_id_map)} users")
-
-    # 2. Posts
-    for doc in db.posts.find():
-        mongo_id = str(doc["_id"])
-        user_id = user_id_map.get(doc.get("user_id", ""), doc.get("user_id", ""))
-        title = doc.get("title", "")
-        content = doc.get("content", "")
-        cassandra_post = db_cassandra.cassandra_create_post(user_id, title, content)
-        post_id_map[mongo_id] = cassandra_post["id"]
-    print(f"Migrated {len(post_id_map)} posts")
-
-    # 3. Comments (post_id and user_id mapped to Cassandra ids)
-    count = 0
-    for doc in db.comments.find():
-        post_id = post_id_map.get(str(doc.get("post_id", "")), str(doc.get("post_id", "")))
-        user_id = user_id_map.get(str(doc.get("user_id", "")), str(doc.get("user_id", "")))
-        content = doc.get("content", "")
-        db_cassandra.cassandra_create_comment(post_id, user_id, content)
-        count += 1
-    print(f"Migrated {count} comments")
+    if args.backfill_feeds or args.backfill_comments:
+        if args.backfill_feeds:
+            print(f"Backfilled feed tables for {db_cassandra.cassandra_backfill_feed_tables()} posts")
+        if args.backfill_comments:
+            print(f"Backfilled comments_by_post for {db_cassandra.cassandra_backfill_comments_by_post()} comments")
+        return
+
+    if args.repair:
+        print(f"Applied {replay_repairs(args.repair, args.batch_size, args.concurrency)} repairs")
+        return
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(args.checkpoint)
+    only = [c.strip() for c in args.only.split(",") if c.strip()]
+
+    if args.incremental or args.follow:
+        while True:
+            n = catch_up(checkpoint, only, args.batch_size, args.concurrency, args.overlap)
+            print(f"Caught up: {n} documents copied")
+            if not args.follow:
+                return
+            try:
+                time.sleep(args.interval)
+            except KeyboardInterrupt:
+                return
+
+    for collection in COLLECTIONS:
+        if collection in only:
+            n = copy_collection(collection, checkpoint, args.batch_size, args.concurrency)
+            print(f"Migrated {n} {collection}")
+
+    if "posts" in only:
+        # Inserts above are idempotent; counters are not, so they are rebuilt rather than incremented.
+        n, skipped = db_cassandra.cassandra_recount_post_counts()
+        print(f"Adjusted {n} author post counters ({skipped} skipped, written meanwhile)")
 
     print("Migration done. Set READ_SOURCE=read_migration to read from Cassandra.")
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
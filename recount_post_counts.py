@@ -0,0 +1,45 @@
+"""
+Repair job: recompute per-author post counters from the posts themselves.
+
+Counters are maintained at write time by create_post; run this after a
+migration, a partial failure, or a manual data fix to bring them back in line.
+
+Required once when upgrading a store that already holds posts: reads trust the
+counters (there is no counting fallback), and the counter of an author who posted
+before counters existed starts at zero. Deploy the counter-maintaining code first,
+then run this for every store written, so posts created in between are counted too.
+
+Safe to run while the app serves writes: a user whose counter changes during the run is
+skipped and reported, and a rerun picks it up. Rerun until no user is skipped.
+Usage:
+  python recount_post_counts.py [--mongodb] [--cassandra]
+
+With no flags, recounts whichever stores the current READ_SOURCE mode writes to.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from config import write_to_cassandra, write_to_mongodb
+
+
+def main(argv):
+    do_mongo = "--mongodb" in argv
+    do_cassandra = "--cassandra" in argv
+    if not do_mongo and not do_cassandra:
+        do_mongo, do_cassandra = write_to_mongodb(), write_to_cassandra()
+    if do_mongo:
+        import db_mongo
+        updated, skipped = db_mongo.mongo_recount_post_counts()
+        print(f"MongoDB: updated {updated} user post counts, skipped {skipped} written meanwhile")
+    if do_cassandra:
+        import db_cassandra
+        adjusted, skipped = db_cassandra.cassandra_recount_post_counts()
+        print(f"Cassandra: adjusted {adjusted} post counters, skipped {skipped} written meanwhile")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,183 @@
+"""shadow_read mode: replay a sample of MongoDB reads against Cassandra off the request path.
+
+The caller always gets the MongoDB result. For sampled reads a snapshot of that result and the
+equivalent Cassandra call are queued to background workers, which run the call, compare the
+two results field by field and record mismatches and per-backend latency. The queue is
+bounded and never blocks: when it is full the shadow read is dropped and counted.
+"""
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from config import SHADOW_QUEUE_SIZE, SHADOW_SAMPLE_RATE, SHADOW_WORKERS
+from cursors import dt_to_ms
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Fields both stores are expected to agree on; anything else (MongoDB _id, dual-write status) is ignored.
+COMPARED_FIELDS = (
+    "id", "user_id", "post_id", "name", "email", "title", "content", "created_at",
+    "author_name", "author_post_count",
+)
+
+_lock = threading.Lock()
+_queue = None
+_pid = None
+_stats = {}  # op -> counters
+_recent_mismatches = deque(maxlen=100)
+
+
+def normalize(value):
+    """Comparable form of a read result: entities reduced to COMPARED_FIELDS, datetimes to epoch ms."""
+    if isinstance(value, dict):
+        if "id" in value:
+            return {k: normalize(value.get(k)) for k in COMPARED_FIELDS if k in value}
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, datetime):
+        return dt_to_ms(value)
+    return value
+
+
+def equal(expected, actual) -> bool:
+    """Compare normalized results; entities are compared on the fields both sides returned."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if "id" in expected or "id" in actual:
+            common = expected.keys() & actual.keys()
+            return "id" in common and all(equal(expected[k], actual[k]) for k in common)
+        return expected.keys() == actual.keys() and all(equal(v, actual[k]) for k, v in expected.items())
+    if isinstance(expected, list) and isinstance(actual, list):
+        return len(expected) == len(actual) and all(equal(a, b) for a, b in zip(expected, actual))
+    return expected == actual
+
+
+def _op_stats(op: str) -> dict:
+    st = _stats.get(op)
+    if st is None:
+        st = _stats[op] = {
+            "compared": 0, "mismatches": 0, "errors": 0, "dropped": 0,
+            "mongodb_seconds": 0.0, "cassandra_seconds": 0.0,
+            "mongodb_max_seconds": 0.0, "cassandra_max_seconds": 0.0,
+        }
+    return st
+
+
+def _worker(q):
+    while True:
+        op, expected, mongo_seconds, cassandra_fn, args, kwargs = q.get()
+        start = time.perf_counter()
+        try:
+            actual = normalize(cassandra_fn(*args, **kwargs))
+            error = None
+        except Exception as e:
+            actual, error = None, e
+        cassandra_seconds = time.perf_counter() - start
+        with _lock:
+            st = _op_stats(op)
+            st["mongodb_seconds"] += mongo_seconds
+            st["mongodb_max_seconds"] = max(st["mongodb_max_seconds"], mongo_seconds)
+            st["cassandra_seconds"] += cassandra_seconds
+            st["cassandra_max_seconds"] = max(st["cassandra_max_seconds"], cassandra_seconds)
+            if error is not None:
+                st["errors"] += 1
+            else:
+                st["compared"] += 1
+                mismatch = not equal(expected, actual)
+                if mismatch:
+                    st["mismatches"] += 1
+                    _recent_mismatches.append({"op": op, "args": repr(args)[:200], "mongodb": expected, "cassandra": actual})
+        if error is not None:
+            log.warning("shadow %s failed on Cassandra: %s", op, error)
+        elif mismatch:
+            log.warning("shadow %s mismatch for %r", op, args)
+        q.task_done()
+
+
+def _get_queue():
+    """Queue served by this process's workers (started lazily, restarted after fork)."""
+    global _queue, _pid
+    if _pid == os.getpid():
+        return _queue
+    with _lock:
+        if _pid != os.getpid():
+            q = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+            for i in range(SHADOW_WORKERS):
+                threading.Thread(target=_worker, args=(q,), name=f"shadow-read-{i}", daemon=True).start()
+            _queue, _pid = q, os.getpid()
+    return _queue
+
+
+def _replay(op: str, result, mongo_seconds: float, cassandra_fn, args, kwargs):
+    # Snapshot now: callers are free to mutate the result once it is returned.
+    expected = normalize(result)
+    try:
+        _get_queue().put_nowait((op, expected, mongo_seconds, cassandra_fn, args, kwargs))
+    except queue.Full:
+        with _lock:
+            _op_stats(op)["dropped"] += 1
+
+
+def read(op: str, mongo_fn, cassandra_fn, *args, **kwargs):
+    """Serve a read from MongoDB; if sampled, replay it against Cassandra in the background."""
+    if random.random() >= SHADOW_SAMPLE_RATE:
+        return mongo_fn(*args, **kwargs)
+    start = time.perf_counter()
+    result = mongo_fn(*args, **kwargs)
+    _replay(op, result, time.perf_counter() - start, cassandra_fn, args, kwargs)
+    return result
+
+
+async def read_async(op: str, mongo_fn, cassandra_fn, *args, **kwargs):
+    """read() for an async MongoDB read (db_async); the Cassandra replay still runs on the worker threads."""
+    if random.random() >= SHADOW_SAMPLE_RATE:
+        return await mongo_fn(*args, **kwargs)
+    start = time.perf_counter()
+    result = await mongo_fn(*args, **kwargs)
+    _replay(op, result, time.perf_counter() - start, cassandra_fn, args, kwargs)
+    return result
+
+
+def stats() -> dict:
+    with _lock:
+        return {op: dict(st) for op, st in _stats.items()}
+
+
+def recent_mismatches() -> list:
+    with _lock:
+        return list(_recent_mismatches)
+
+
+def drain():
+    """Block until every queued shadow read has been replayed (benchmarks, tests)."""
+    q = _queue
+    if q is not None and _pid == os.getpid():
+        q.join()
+
+
+def queue_depth() -> int:
+    q = _queue
+    return q.qsize() if q is not None and _pid == os.getpid() else 0
+
+
+@metrics.collector
+def _shadow_metrics():
+    st = stats()
+    families = [
+        (f"shadow_read_{field}_total", "counter", help_text, [({"op": op}, s[field]) for op, s in sorted(st.items())])
+        for field, help_text in (
+            ("compared", "Shadow reads compared against Cassandra."),
+            ("mismatches", "Shadow reads whose Cassandra result differed."),
+            ("errors", "Shadow reads that failed on Cassandra."),
+            ("dropped", "Shadow reads dropped because the queue was full."),
+        )
+    ]
+    families.append(("shadow_read_queue_depth", "gauge", "Shadow reads waiting for a worker.", [({}, queue_depth())]))
+    return families
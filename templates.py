@@ -0,0 +1,153 @@
+"""Page templates for app.py and app_async.py, compiled once into a shared Jinja environment.
+
+Small pages use template.render(); stream() yields a page in chunks as it renders, so the
+feed and post pages start reaching the client before the last row is rendered.
+"""
+
+from jinja2 import Environment
+
+# Template events buffered per streamed chunk: a few KB, rather than one tiny write per tag.
+STREAM_BUFFER = 64
+
+env = Environment(autoescape=True)
+
+NAV = """
+  <h1>Blog</h1>
+  <nav>
+    <a href="/">Main feed (date)</a> |
+    <a href="/?sort=content">Main feed (content A-Z)</a> |
+    <a href="/users">Users</a> |
+    <a href="/posts/new">New post</a>
+  </nav>
+  <hr>
+"""
+
+FEED_HTML = """
+<!DOCTYPE html>
+<html>
+<head><title>Blog – Main feed</title></head>
+<body>
+""" + NAV + """
+  <h2>Main feed (sorted by {{ sort_label }})</h2>
+  {% for p in posts %}
+  <article style="border:1px solid #ccc; margin:10px 0; padding:10px;">
+    <h3>{{ p.title }}</h3>
+    <p><strong>Author:</strong> {{ p.author_name }} ({{ p.author_post_count }} posts)</p>
+    <p>{{ p.excerpt }}{% if p.content_length > p.excerpt|length %}&hellip;{% endif %}</p>
+    <p><small>Posted {{ p.created_at }}</small></p>
+    <a href="/post/{{ p.id }}">View & comment</a>
+  </article>
+  {% endfor %}
+  {% if next_url %}<p><a href="{{ next_url }}">More posts &rarr;</a></p>{% endif %}
+</body>
+</html>
+"""
+
+POST_HTML = """
+<!DOCTYPE html>
+<html>
+<head><title>Blog – Post</title></head>
+<body>
+""" + NAV + """
+  {% if post %}
+  <article style="border:1px solid #ccc; padding:15px;">
+    <h2>{{ post.title }}</h2>
+    <p><strong>Author:</strong> {{ post.author_name }} ({{ post.author_post_count }} posts)</p>
+    <p>{{ post.content }}</p>
+    <p><small>{{ post.created_at }}</small></p>
+  </article>
+  <h3>Comments</h3>
+  {% for c in comments %}
+  <p><strong>{{ c.author_name }}</strong>: {{ c.content }}</p>
+  {% endfor %}
+  <form method="post" action="/post/{{ post.id }}/comment">
+    <input type="text" name="user_id" placeholder="User ID" required>
+    <input type="text" name="content" placeholder="Comment" required>
+    <button type="submit">Add comment</button>
+  </form>
+  {% else %}
+  <p>Post not found.</p>
+  {% endif %}
+</body>
+</html>
+"""
+
+NEW_POST_HTML = """
+<!DOCTYPE html>
+<html>
+<head><title>Blog – New post</title></head>
+<body>
+""" + NAV + """
+  <h2>New post</h2>
+  <form method="get" action="/posts/new">
+    <label>Find author: <input type="search" name="q" value="{{ q }}" placeholder="name or email"></label>
+    <button type="submit">Search</button>
+  </form>
+  <form method="post" action="/posts/new">
+    <p><label>Author (user id): <input type="text" name="user_id" list="authors" autocomplete="off" required></label></p>
+    <datalist id="authors">
+      {% for u in users %}<option value="{{ u.id }}">{{ u.name }} &lt;{{ u.email }}&gt;</option>{% endfor %}
+    </datalist>
+    <p><label>Title: <input type="text" name="title" required></label></p>
+    <p><label>Content: <textarea name="content" rows="4"></textarea></label></p>
+    <button type="submit">Create post</button>
+  </form>
+  <script>
+    // Typing a name or email in the author field suggests matching users from /api/users/lookup.
+    const author = document.querySelector("input[name=user_id]");
+    const authors = document.getElementById("authors");
+    let pending;
+    author.addEventListener("input", () => {
+      clearTimeout(pending);
+      const q = author.value.trim();
+      if (q.length < 2) return;
+      pending = setTimeout(async () => {
+        const resp = await fetch("/api/users/lookup?q=" + encodeURIComponent(q));
+        if (!resp.ok) return;
+        authors.replaceChildren(...(await resp.json()).users.map(u => {
+          const option = document.createElement("option");
+          option.value = u.id;
+          option.textContent = `${u.name} <${u.email}>`;
+          return option;
+        }));
+      }, 200);
+    });
+  </script>
+</body>
+</html>
+"""
+
+USERS_HTML = """
+<!DOCTYPE html>
+<html>
+<head><title>Blog – Users</title></head>
+<body>
+""" + NAV + """
+  <h2>Users (authors / commenters)</h2>
+  <ul>
+  {% for u in users %}
+  <li>{{ u.name }} &lt;{{ u.email }}&gt; [id: {{ u.id }}]</li>
+  {% endfor %}
+  </ul>
+  {% if next_url %}<p><a href="{{ next_url }}">More users &rarr;</a></p>{% endif %}
+  <form method="post" action="/users">
+    <input type="text" name="name" placeholder="Name" required>
+    <input type="email" name="email" placeholder="Email" required>
+    <button type="submit">Add user</button>
+  </form>
+</body>
+</html>
+"""
+
+
+FEED = env.from_string(FEED_HTML)
+POST = env.from_string(POST_HTML)
+NEW_POST = env.from_string(NEW_POST_HTML)
+USERS = env.from_string(USERS_HTML)
+
+
+def stream(template, **context):
+    """Iterator over the rendered page in STREAM_BUFFER-sized chunks."""
+    chunks = template.stream(**context)
+    chunks.enable_buffering(STREAM_BUFFER)
+    return chunks
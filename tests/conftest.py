@@ -0,0 +1,33 @@
+"""Shared fixtures: both stores replaced by the benchmark's in-memory doubles (mongomock, FakeSession)."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import benchmark
+import config
+import db
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    """Fresh, empty MongoDB and Cassandra doubles; yields the FakeSession. READ_SOURCE starts as double_write."""
+    monkeypatch.setattr(config, "READ_SOURCE", "double_write")
+    benchmark.install_mongomock()
+    session = benchmark.install_fake_cassandra()
+    db.clear_caches()
+    yield session
+    db.clear_caches()
+
+
+@pytest.fixture
+def read_source(monkeypatch):
+    """Switch READ_SOURCE for the rest of the test: read_source("cassandra_only")."""
+    def switch(mode: str):
+        monkeypatch.setattr(config, "READ_SOURCE", mode)
+        db.clear_caches()
+    return switch
@@ -0,0 +1,96 @@
+import pytest
+
+import cache
+import db
+import db_cassandra
+import db_mongo
+from cache import MISSING, EntityCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hit_until_ttl_expires(clock):
+    c = EntityCache("t", maxsize=10, ttl=5, negative_ttl=1)
+    c.set("a", {"id": "a"})
+    clock[0] += 4.9
+    assert c.get("a") == {"id": "a"}
+    clock[0] += 0.1
+    assert c.get("a") is MISSING
+    assert c.stats()["size"] == 0
+
+
+def test_cached_miss_uses_negative_ttl(clock):
+    c = EntityCache("t", maxsize=10, ttl=5, negative_ttl=1)
+    c.set("gone", None)
+    assert c.get("gone") is None
+    clock[0] += 1
+    assert c.get("gone") is MISSING
+
+
+def test_zero_ttl_or_size_disables(clock):
+    c = EntityCache("t", maxsize=10, ttl=5, negative_ttl=0)
+    c.set("gone", None)
+    assert c.get("gone") is MISSING
+    off = EntityCache("t", maxsize=0, ttl=5, negative_ttl=1)
+    off.set("a", {"id": "a"})
+    assert off.get("a") is MISSING
+
+
+def test_lru_eviction(clock):
+    c = EntityCache("t", maxsize=2, ttl=5, negative_ttl=1)
+    c.set("a", {"id": "a"})
+    c.set("b", {"id": "b"})
+    c.get("a")
+    c.set("c", {"id": "c"})
+    assert c.get("b") is MISSING
+    assert c.get("a") == {"id": "a"} and c.get("c") == {"id": "c"}
+    assert c.stats()["evictions"] == 1
+
+
+def test_values_are_copied(clock):
+    c = EntityCache("t", maxsize=10, ttl=5, negative_ttl=1)
+    value = {"id": "a", "name": "x"}
+    c.set("a", value)
+    value["name"] = "changed"
+    got = c.get("a")
+    got["name"] = "mutated"
+    assert c.get("a")["name"] == "x"
+
+
+def test_invalidate(clock):
+    c = EntityCache("t", maxsize=10, ttl=5, negative_ttl=1)
+    c.set("a", {"id": "a"})
+    c.invalidate("a")
+    assert c.get("a") is MISSING
+
+
+def test_create_user_drops_a_cached_miss(stores, monkeypatch):
+    """A cached "not found" must not hide a user created under that id."""
+    monkeypatch.setattr(db, "_new_id", lambda: "65a0000000000000000000aa")
+    assert db.get_user("65a0000000000000000000aa") is None
+    db.create_user("ann", "ann@example.com")
+    assert db.get_user("65a0000000000000000000aa")["name"] == "ann"
+
+
+def test_create_post_refreshes_the_author(stores):
+    """MongoDB user documents carry post_count, so a new post invalidates its cached author."""
+    user = db.create_user("bob", "bob@example.com")
+    assert db.get_user(user["id"]).get("post_count", 0) == 0
+    db.create_post(user["id"], "t", "c")
+    assert db.get_user(user["id"])["post_count"] == 1
+
+
+def test_get_users_serves_cached_ids_without_a_read(stores, monkeypatch):
+    user = db.create_user("cy", "cy@example.com")
+    db.get_user(user["id"])
+    calls = []
+    original = db_mongo.mongo_get_users
+    monkeypatch.setattr(db_mongo, "mongo_get_users", lambda ids: calls.append(ids) or original(ids))
+    assert db.get_users([user["id"]])[user["id"]]["name"] == "cy"
+    assert calls == []
+    assert db_cassandra.cassandra_get_user(user["id"])["name"] == "cy"
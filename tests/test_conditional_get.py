@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import db
+import versions
+from app import _not_modified, app
+
+STAMP = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+HTTP_STAMP = "Mon, 01 Jan 2024 12:00:00 GMT"
+
+
+def _conditional(headers: dict, etag="feed-m-abc", last_modified=STAMP):
+    with app.test_request_context(headers=headers):
+        return _not_modified(etag, last_modified)
+
+
+def test_matching_etag_is_not_modified():
+    resp = _conditional({"If-None-Match": 'W/"feed-m-abc"'})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == 'W/"feed-m-abc"'
+    assert resp.headers["Last-Modified"] == HTTP_STAMP
+
+
+def test_other_etag_is_modified():
+    assert _conditional({"If-None-Match": 'W/"feed-m-old"'}) is None
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    assert _conditional({"If-None-Match": 'W/"feed-m-old"', "If-Modified-Since": HTTP_STAMP}) is None
+
+
+@pytest.mark.parametrize("since, fresh", [(HTTP_STAMP, True), ("Mon, 01 Jan 2024 11:59:59 GMT", False)])
+def test_if_modified_since(since, fresh):
+    assert (_conditional({"If-Modified-Since": since}) is not None) == fresh
+
+
+def test_if_modified_since_is_ignored_without_last_modified():
+    assert _conditional({"If-Modified-Since": HTTP_STAMP}, last_modified=None) is None
+
+
+def test_no_validators_is_modified():
+    assert _conditional({}) is None
+
+
+def test_last_modified_waits_for_the_second_to_pass():
+    """A write later in the same second would share the date, so none is given until the second is over."""
+    changed = datetime(2024, 1, 1, 11, 59, 59, 250000)
+    found = {versions.FEED: ("abc", changed)}
+    etag, last_modified = versions.validator("feed", "mongodb", [versions.FEED], found, changed + timedelta(seconds=0.5))
+    assert etag == "feed-m-abc" and last_modified is None
+    _, last_modified = versions.validator("feed", "mongodb", [versions.FEED], found, datetime(2024, 1, 1, 12))
+    assert last_modified == STAMP
+
+
+@pytest.mark.parametrize("mode", ["mongodb_only", "cassandra_only"])
+def test_feed_revalidates_until_a_write(stores, read_source, mode):
+    read_source(mode)
+    client = app.test_client()
+    author = db.create_user("ann", "ann@example.com")
+    first = client.get("/api/feed")
+    etag = first.headers["ETag"]
+    assert client.get("/api/feed", headers={"If-None-Match": etag}).status_code == 304
+    db.create_post(author["id"], "t", "c")
+    second = client.get("/api/feed", headers={"If-None-Match": etag})
+    assert second.status_code == 200 and second.headers["ETag"] != etag
+
+
+def test_same_second_write_is_not_hidden_by_if_modified_since(stores, monkeypatch):
+    """Regression: a write in the second a Last-Modified names must still revalidate as changed."""
+    client = app.test_client()
+    author = db.create_user("ann", "ann@example.com")
+    later = datetime.utcnow() + timedelta(seconds=1.1)
+    monkeypatch.setattr(db, "datetime", type("Later", (datetime,), {"utcnow": staticmethod(lambda: later)}))
+    since = client.get("/api/feed").headers["Last-Modified"]  # read once the write's second is over
+    monkeypatch.setattr(db, "datetime", datetime)
+    db.create_post(author["id"], "t", "c")
+    assert client.get("/api/feed", headers={"If-Modified-Since": since}).status_code == 200
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import db
+import db_cassandra
+import db_mongo
+from cursors import content_sort_key, decode_cursor, dt_to_ms, encode_cursor, ms_to_dt
+
+
+def test_cursor_round_trip():
+    values = {"s": "date", "t": 1704067200123, "id": "65a0000000000000000000aa"}
+    token = encode_cursor(values)
+    assert "=" not in token
+    assert decode_cursor(token) == values
+
+
+@pytest.mark.parametrize("token", [None, ""])
+def test_empty_cursor_is_first_page(token):
+    assert decode_cursor(token) is None
+
+
+@pytest.mark.parametrize("token", ["not base64 !", encode_cursor({"a": 1})[:-3] + "@@@", "WzEsMl0"])  # last: [1,2]
+def test_malformed_cursor(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_ms_round_trip_is_naive_utc():
+    dt = datetime(2024, 3, 1, 12, 30, 45, 123000)
+    assert ms_to_dt(dt_to_ms(dt)) == dt
+    assert dt_to_ms(None) is None and ms_to_dt(None) is None
+
+
+def test_content_sort_key():
+    assert content_sort_key("Hello") == "hello"
+    assert content_sort_key(None) == ""
+    assert len(content_sort_key("x" * 1000)) == 256
+
+
+def _post(user_id: str, content: str, created_at: datetime) -> str:
+    pid = str(ObjectId())
+    db_mongo.mongo_create_post(user_id, "t", content, doc_id=pid, created_at=created_at)
+    db_cassandra.cassandra_create_post(user_id, "t", content, doc_id=pid, created_at=created_at)
+    return pid
+
+
+def _walk(sort_by: str, limit: int) -> list[str]:
+    ids, cursor = [], None
+    while True:
+        posts, cursor = db.feed_page(sort_by=sort_by, limit=limit, cursor=cursor)
+        ids += [p["id"] for p in posts]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort_by", ["date", "content"])
+def test_ties_break_on_id_identically_in_both_stores(stores, read_source, sort_by):
+    """Posts sharing a created_at (or content) are paged by id: none repeated or skipped, same order everywhere."""
+    same_time = datetime(2024, 1, 5, 10, 0, 0, 500000)
+    ids = [_post("u1", "Same content", same_time) for _ in range(7)]
+    ids += [_post("u1", f"other {i}", datetime(2024, 1, 4 + i % 3)) for i in range(5)]
+
+    pages = {}
+    for mode in ("mongodb_only", "cassandra_only"):
+        read_source(mode)
+        pages[mode] = _walk(sort_by, limit=3)
+    assert sorted(pages["mongodb_only"]) == sorted(ids)
+    assert pages["mongodb_only"] == pages["cassandra_only"]
+
+
+def test_cursor_for_another_sort_is_rejected(stores):
+    for i in range(3):
+        _post("u1", f"post {i}", datetime(2024, 1, 1, i))
+    _, cursor = db.feed_page(sort_by="date", limit=1)
+    with pytest.raises(ValueError):
+        db.feed_page(sort_by="content", limit=1, cursor=cursor)
@@ -0,0 +1,113 @@
+import pytest
+
+import db
+import db_cassandra
+import db_mongo
+import write_behind
+
+
+def _fail(*args, **kwargs):
+    raise RuntimeError("backend down")
+
+
+@pytest.mark.parametrize("mode, stored", [
+    ("mongodb_only", {"mongodb"}),
+    ("double_write", {"mongodb", "cassandra"}),
+    ("read_migration", {"mongodb", "cassandra"}),
+    ("cassandra_only", {"cassandra"}),
+])
+def test_write_goes_once_to_each_target_under_one_id(stores, read_source, mode, stored):
+    read_source(mode)
+    user = db.create_user("ann", "ann@example.com")
+    assert user["writes"] == dict.fromkeys(stored, "ok")
+    found = {
+        "mongodb": db_mongo.mongo_get_user(user["id"]) is not None,
+        "cassandra": db_cassandra.cassandra_get_user(user["id"]) is not None,
+    }
+    assert {name for name, ok in found.items() if ok} == stored
+
+
+def test_failed_secondary_is_reported_not_raised(stores, monkeypatch):
+    monkeypatch.setattr(db_cassandra, "cassandra_create_user", _fail)
+    user = db.create_user("ann", "ann@example.com")
+    assert user["writes"] == {"mongodb": "ok", "cassandra": "error: backend down"}
+    assert db.get_user(user["id"])["name"] == "ann"
+
+
+@pytest.mark.parametrize("mode, module, fn", [
+    ("double_write", db_mongo, "mongo_create_user"),
+    ("read_migration", db_cassandra, "cassandra_create_user"),
+])
+def test_failed_primary_raises(stores, read_source, monkeypatch, mode, module, fn):
+    read_source(mode)
+    monkeypatch.setattr(module, fn, _fail)
+    with pytest.raises(RuntimeError, match="backend down"):
+        db.create_user("ann", "ann@example.com")
+
+
+def test_read_migration_returns_the_cassandra_write(stores, read_source, monkeypatch):
+    read_source("read_migration")
+    monkeypatch.setattr(db_mongo, "mongo_create_user", _fail)
+    user = db.create_user("ann", "ann@example.com")
+    assert user["writes"] == {"mongodb": "error: backend down", "cassandra": "ok"}
+
+
+def test_write_behind_queues_the_secondary(stores, monkeypatch):
+    queued = []
+    monkeypatch.setattr(db, "WRITE_BEHIND", True)
+    monkeypatch.setattr(write_behind, "submit", lambda fn, *args, **kwargs: queued.append((fn, args, kwargs)))
+    user = db.create_user("ann", "ann@example.com")
+    assert user["writes"] == {"mongodb": "ok", "cassandra": "queued"}
+    assert [(fn.__name__, args, kwargs["doc_id"]) for fn, args, kwargs in queued] == [
+        ("cassandra_create_user", ("ann", "ann@example.com"), user["id"])
+    ]
+    assert db_cassandra.cassandra_get_user(user["id"]) is None
+
+
+def test_bulk_write_stores_every_item_in_both_stores(stores):
+    author = db.create_user("ann", "ann@example.com")
+    results = db.create_posts([{"user_id": author["id"], "title": f"t{i}", "content": f"c{i}"} for i in range(3)])
+    assert [r["writes"] for r in results] == [{"mongodb": "ok", "cassandra": "ok"}] * 3
+    assert len({r["created_at"] for r in results}) == 1
+    for r in results:
+        assert db_mongo.mongo_get_post(r["id"])["title"] == r["title"]
+        assert db_cassandra.cassandra_get_post(r["id"])["title"] == r["title"]
+    assert db_mongo.mongo_count_posts_by_user(author["id"]) == 3
+    assert db_cassandra.cassandra_count_posts_by_user(author["id"]) == 3
+
+
+@pytest.mark.parametrize("mode, primary", [("double_write", "mongodb"), ("read_migration", "cassandra")])
+def test_bulk_item_outcome_follows_the_primary(stores, read_source, monkeypatch, mode, primary):
+    read_source(mode)
+    outcomes = {
+        "mongodb": ([None, "E11000 duplicate key", None], None),
+        "cassandra": ([None, None, "timeout"], "post_count not updated for 1 authors: down"),
+    }
+    monkeypatch.setattr(db_mongo, "mongo_create_posts", lambda docs: outcomes["mongodb"])
+    monkeypatch.setattr(db_cassandra, "cassandra_create_posts", lambda docs: outcomes["cassandra"])
+    results = db.create_posts([{"user_id": "u", "title": "t", "content": "c"}] * 3)
+
+    assert results[0]["writes"] == {"mongodb": "ok", "cassandra": "ok; post_count not updated for 1 authors: down"}
+    assert results[1]["writes"]["mongodb"] == "error: E11000 duplicate key"
+    assert results[2]["writes"]["cassandra"] == "error: timeout"
+    failed = {"mongodb": 1, "cassandra": 2}[primary]
+    assert [("error" in r) for r in results] == [i == failed for i in range(3)]
+    assert "id" in results[0]
+
+
+def test_bulk_call_failure_fails_every_item_on_that_backend(stores, monkeypatch):
+    monkeypatch.setattr(db_cassandra, "cassandra_create_users", _fail)
+    results = db.create_users([{"name": "a", "email": "a@x"}, {"name": "b", "email": "b@x"}])
+    assert [r["writes"] for r in results] == [{"mongodb": "ok", "cassandra": "error: backend down"}] * 2
+    assert all("id" in r for r in results)
+
+
+def test_bulk_write_behind_queues_one_job_for_the_list(stores, monkeypatch):
+    queued = []
+    monkeypatch.setattr(db, "WRITE_BEHIND", True)
+    monkeypatch.setattr(write_behind, "submit", lambda fn, *args: queued.append((fn.__name__, args)))
+    results = db.create_users([{"name": "a", "email": "a@x"}, {"name": "b", "email": "b@x"}])
+    assert [r["writes"] for r in results] == [{"mongodb": "ok", "cassandra": "queued"}] * 2
+    [(fn, (docs,))] = queued
+    assert fn == "cassandra_create_users"
+    assert [d["id"] for d in docs] == [r["id"] for r in results]
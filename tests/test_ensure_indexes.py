@@ -0,0 +1,51 @@
+import pytest
+
+import db_mongo
+from ensure_indexes import plan_problems
+
+
+def _explain(plan: dict) -> dict:
+    return {"queryPlanner": {"winningPlan": plan}}
+
+
+def test_index_scan_passes():
+    plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {
+        "stage": "IXSCAN", "indexName": "created_at_-1__id_-1"}}}
+    assert plan_problems(_explain(plan)) == ([], ["created_at_-1__id_-1"])
+
+
+def test_sbe_layout_is_searched():
+    plan = {"queryPlan": {"stage": "LIMIT", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1"}},
+            "slotBasedPlan": {"slots": "..."}}
+    assert plan_problems(_explain(plan)) == ([], ["user_id_1"])
+
+
+@pytest.mark.parametrize("plan, problem", [
+    ({"stage": "COLLSCAN"}, "collection scan"),
+    ({"stage": "SORT", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1"}}, "in-memory sort"),
+    ({"stage": "EOF"}, "empty plan (EOF)"),
+])
+def test_forbidden_stages_fail(plan, problem):
+    assert problem in plan_problems(_explain(plan))[0]
+
+
+def test_or_branches_are_all_checked():
+    plan = {"stage": "OR", "inputStages": [
+        {"stage": "IXSCAN", "indexName": "name_lower_1"}, {"stage": "COLLSCAN"}]}
+    assert plan_problems(_explain(plan)) == (["collection scan"], ["name_lower_1"])
+
+
+@pytest.mark.parametrize("stage", ["IDHACK", "EXPRESS_IXSCAN", "EXPRESS_CLUSTERED_IXSCAN"])
+def test_id_lookups_pass_without_an_index_name(stage):
+    assert plan_problems(_explain({"stage": stage})) == ([], [])
+
+
+def test_plan_without_an_index_fails():
+    assert plan_problems(_explain({"stage": "FETCH"})) == (["no index used"], [])
+    assert plan_problems({}) == (["no index used"], [])
+
+
+def test_every_queried_collection_is_provisioned(stores):
+    """ensure_indexes.py creates the collections the query shapes need (explain() on a missing one is EOF)."""
+    existing = set(db_mongo.get_db().list_collection_names())
+    assert {collection for _, collection, _, _ in db_mongo.mongo_query_shapes()} <= existing
@@ -0,0 +1,328 @@
+"""
+Consistency check: prove MongoDB and Cassandra hold the same users, posts and comments.
+
+Run before moving READ_SOURCE from double_write to read_migration.
+Usage:
+  python verify_migration.py                          # all collections, 1024 ranges, repairs.jsonl
+  python verify_migration.py --only posts --ranges 4096 --workers 32 --out posts_repairs.jsonl
+
+Each collection is split into --ranges slices of the Cassandra token ring. Both sides reduce
+every slice to a digest (row count + XOR of per-row hashes, so row order does not matter):
+Cassandra with one token-range scan per slice in parallel, MongoDB in a single streaming pass
+that hashes each document's id onto the ring. Only slices whose digests differ are re-read
+row by row to find the ids that disagree. Memory grows with the number of slices and the size
+of the mismatching slices, never with the collection; raise --ranges for bigger datasets.
+
+The query tables that reads are served from (users_by_prefix, posts_by_day, posts_by_content,
+post_summaries_by_*, comments_by_post) are checked the same way: the MongoDB pass derives the
+rows the write path stores for each document, and each table is scanned by its own partition
+token with rows assigned to slices by entity id. feed_buckets is compared as a set: a missing
+bucket hides its rows from the feeds, an extra one is only reported.
+
+Mismatches are written as JSON lines {"collection", "id", "action"} with action "upsert"
+(missing or different in Cassandra) or "delete" (only in Cassandra), plus "stale" query-table
+rows ({"table", "key"}) that no longer match the document and must be removed. Replay them with:
+  python migrate_mongo_to_cassandra.py --repair repairs.jsonl
+
+Exit status is 1 when any mismatch was found. Ids must be shared between the stores, which
+holds for dual-write and for migrate_mongo_to_cassandra.py runs.
+
+Requires: MongoDB running, Cassandra running.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from cassandra.metadata import Murmur3Token
+
+import db_mongo
+import db_cassandra
+from cursors import dt_to_ms
+
+COLLECTIONS = ("users", "posts", "comments")
+FIELDS = {
+    "users": ("name", "email"),
+    "posts": ("user_id", "title", "content"),
+    "comments": ("post_id", "user_id", "content"),
+}
+MIN_TOKEN = -(2 ** 63)
+MAX_TOKEN = 2 ** 63 - 1
+
+
+def token_bounds(n: int) -> list[int]:
+    """n + 1 boundaries; slice k is the token range (bounds[k], bounds[k + 1]]."""
+    span = MAX_TOKEN - MIN_TOKEN
+    return [MIN_TOKEN + (span * k) // n for k in range(n)] + [MAX_TOKEN]
+
+
+def token_of(doc_id: str) -> int:
+    return Murmur3Token.from_key(doc_id.encode()).value
+
+
+def range_of(bounds: list[int], token: int) -> int:
+    return max(bisect_left(bounds, token) - 1, 0)
+
+
+def row_hash(collection: str, row: dict) -> int:
+    """Hash of the fields both stores keep, normalised the way the migration writes them."""
+    values = [str(row["id"])]
+    values += ["" if row.get(f) is None else str(row.get(f)) for f in FIELDS[collection]]
+    values.append(dt_to_ms(row.get("created_at")))
+    return _hash(values)
+
+
+def query_row_hash(table: str, row: dict) -> int:
+    """Hash of every column of a query-table row (keys included, so a row filed under a stale key differs)."""
+    values = [table]
+    for column in sorted(row):
+        value = row[column]
+        values.append(dt_to_ms(value) if isinstance(value, datetime) else "" if value is None else str(value))
+    return _hash(values)
+
+
+def _hash(values: list) -> int:
+    digest = hashlib.blake2b(json.dumps(values).encode(), digest_size=16).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _mongo_rows(collection: str):
+    """Stream MongoDB documents as rows shaped like Cassandra's (id string, same created_at fallback)."""
+    projection = {f: 1 for f in FIELDS[collection]}
+    projection["created_at"] = 1
+    for doc in db_mongo.get_db()[collection].find({}, projection).batch_size(1000):
+        row = {f: doc.get(f) for f in FIELDS[collection]}
+        row["id"] = str(doc["_id"])
+        row["created_at"] = doc.get("created_at") or doc["_id"].generation_time.replace(tzinfo=None)
+        yield row
+
+
+def query_tables(collection: str) -> list[str]:
+    return [t for t, (base, _, _) in db_cassandra.QUERY_TABLES.items() if base == collection]
+
+
+def _write_args(collection: str, row: dict) -> tuple:
+    """Arguments of cassandra_<entity>_writes for a MongoDB row, as the migration passes them."""
+    values = [str(row[f] or "") if f.endswith("_id") else row[f] for f in FIELDS[collection]]
+    return (row["id"], *values, row["created_at"])
+
+
+def mongo_digests(collection: str, bounds: list[int]) -> tuple[dict, dict]:
+    """Slice digests of the base and query tables as MongoDB implies them, and the feed buckets it needs.
+
+    Returns ({table: [(count, xor)] per slice}, {(feed, bucket): (collection, id) of a document registering it}).
+    """
+    n = len(bounds) - 1
+    tables = [collection] + query_tables(collection)
+    counts = {t: [0] * n for t in tables}
+    xors = {t: [0] * n for t in tables}
+    buckets = {}
+    for row in _mongo_rows(collection):
+        k = range_of(bounds, token_of(row["id"]))
+        counts[collection][k] += 1
+        xors[collection][k] ^= row_hash(collection, row)
+        args = _write_args(collection, row)
+        for table, qrow in db_cassandra.cassandra_query_rows(collection, *args):
+            counts[table][k] += 1
+            xors[table][k] ^= query_row_hash(table, qrow)
+        for bucket in db_cassandra.cassandra_feed_buckets(collection, *args):
+            buckets.setdefault(bucket, (collection, row["id"]))
+    return {t: list(zip(counts[t], xors[t])) for t in tables}, buckets
+
+
+def cassandra_digest(collection: str, lo: int, hi: int) -> tuple[int, int]:
+    count, x = 0, 0
+    for row in db_cassandra.cassandra_scan_token_range(collection, lo, hi):
+        count += 1
+        x ^= row_hash(collection, row)
+    return count, x
+
+
+def _digest_scan(table: str, bounds: list[int]):
+    """scan(lo, hi) -> partial digests {slice: [count, xor]} of the query-table rows in partition tokens (lo, hi]."""
+    def scan(lo: int, hi: int) -> dict:
+        part = {}
+        for row in db_cassandra.cassandra_scan_token_range(table, lo, hi):
+            d = part.setdefault(range_of(bounds, token_of(row["id"])), [0, 0])
+            d[0] += 1
+            d[1] ^= query_row_hash(table, row)
+        return part
+    return scan
+
+
+def _scan_query_table(table: str, bounds: list[int], workers: int, scan) -> list:
+    """Results of scan(lo, hi) over every partition-token slice of a query table, in parallel."""
+    n = len(bounds) - 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda k: scan(bounds[k], bounds[k + 1]), range(n)))
+
+
+def diff_ranges(collection: str, bounds: list[int], bad: list[int], workers: int) -> list[dict]:
+    """Row-level comparison of the mismatching slices only; returns repair entries."""
+    bad_set = set(bad)
+    mongo_rows = {}
+    for row in _mongo_rows(collection):
+        if range_of(bounds, token_of(row["id"])) in bad_set:
+            mongo_rows[row["id"]] = row_hash(collection, row)
+
+    def scan(k):
+        return {row["id"]: row_hash(collection, row)
+                for row in db_cassandra.cassandra_scan_token_range(collection, bounds[k], bounds[k + 1])}
+
+    cassandra_rows = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(scan, bad):
+            cassandra_rows.update(part)
+
+    repairs = []
+    for doc_id, h in mongo_rows.items():
+        if cassandra_rows.get(doc_id) != h:
+            repairs.append({"collection": collection, "id": doc_id, "action": "upsert"})
+    for doc_id in cassandra_rows.keys() - mongo_rows.keys():
+        repairs.append({"collection": collection, "id": doc_id, "action": "delete"})
+    return repairs
+
+
+def diff_query_table(collection: str, table: str, bounds: list[int], bad: list[int], workers: int) -> list[dict]:
+    """Row-level comparison of one query table in the mismatching slices; returns repair entries."""
+    bad_set = set(bad)
+    expected = {}
+    for row in _mongo_rows(collection):
+        if range_of(bounds, token_of(row["id"])) in bad_set:
+            rows = db_cassandra.cassandra_query_rows(collection, *_write_args(collection, row))
+            expected[row["id"]] = {query_row_hash(table, r) for t, r in rows if t == table}
+
+    def scan(lo: int, hi: int) -> list:
+        return [(row["id"], query_row_hash(table, row), row)
+                for row in db_cassandra.cassandra_scan_token_range(table, lo, hi)
+                if range_of(bounds, token_of(row["id"])) in bad_set]
+
+    found = {}
+    for part in _scan_query_table(table, bounds, workers, scan):
+        for doc_id, h, row in part:
+            found.setdefault(doc_id, []).append((h, row))
+
+    repairs = []
+    for doc_id in expected.keys() | found.keys():
+        want, have = expected.get(doc_id, set()), found.get(doc_id, [])
+        if want == {h for h, _ in have} and len(have) == len(want):
+            continue
+        stale = [{"table": table, "key": _json_key(table, row)} for h, row in have if h not in want]
+        repairs.append({"collection": collection, "id": doc_id, "action": "upsert" if doc_id in expected else "delete",
+                        "stale": stale})
+    return repairs
+
+
+def _json_key(table: str, row: dict) -> dict:
+    key = db_cassandra.cassandra_query_row_key(table, row)
+    return {c: dt_to_ms(v) if isinstance(v, datetime) else v for c, v in key.items()}
+
+
+def verify_collection(collection: str, n_ranges: int, workers: int) -> tuple[list[dict], dict]:
+    """Repair entries for one collection, and the feed buckets its documents need."""
+    bounds = token_bounds(n_ranges)
+    result = {}
+
+    # MongoDB's single pass runs alongside the parallel Cassandra range scans.
+    def run_mongo():
+        result["mongo"] = mongo_digests(collection, bounds)
+
+    t = threading.Thread(target=run_mongo, name=f"verify-mongo-{collection}")
+    t.start()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        cassandra = {collection: list(
+            pool.map(lambda k: cassandra_digest(collection, bounds[k], bounds[k + 1]), range(n_ranges))
+        )}
+    for table in query_tables(collection):
+        merged = [[0, 0] for _ in range(n_ranges)]
+        for part in _scan_query_table(table, bounds, workers, _digest_scan(table, bounds)):
+            for k, (count, x) in part.items():
+                merged[k][0] += count
+                merged[k][1] ^= x
+        cassandra[table] = [tuple(d) for d in merged]
+    t.join()
+    if "mongo" not in result:
+        raise RuntimeError(f"MongoDB scan of {collection} failed")
+    mongo, buckets = result["mongo"]
+
+    repairs = {}
+    for table, digests in cassandra.items():
+        bad = [k for k in range(n_ranges) if mongo[table][k] != digests[k]]
+        print(f"{table}: {sum(c for c, _ in mongo[table])} rows expected from MongoDB, "
+              f"{sum(c for c, _ in digests)} in Cassandra, {len(bad)}/{n_ranges} ranges differ")
+        if not bad:
+            continue
+        if table == collection:
+            entries = diff_ranges(collection, bounds, bad, workers)
+        else:
+            entries = diff_query_table(collection, table, bounds, bad, workers)
+        print(f"{table}: {len(entries)} {collection} need repair")
+        for entry in entries:
+            _merge(repairs, entry)
+    return list(repairs.values()), buckets
+
+
+def _merge(repairs: dict, entry: dict):
+    """Fold an entry into repairs keyed by (collection, id): upsert wins, stale rows accumulate."""
+    key = (entry["collection"], entry["id"])
+    if key not in repairs:
+        repairs[key] = {**entry, "stale": list(entry.get("stale", ()))}
+        return
+    current = repairs[key]
+    if entry["action"] == "upsert":
+        current["action"] = "upsert"
+    current["stale"] += entry.get("stale", ())
+
+
+def verify_feed_buckets(expected: dict) -> list[dict]:
+    """Compare feed_buckets with the buckets MongoDB's documents need; a missing one is repaired by
+    re-writing a document that registers it."""
+    actual = db_cassandra.cassandra_scan_feed_buckets()
+    feeds = {feed for feed, _ in expected}
+    missing = expected.keys() - actual
+    extra = {b for b in actual if b[0] in feeds} - expected.keys()
+    print(f"feed_buckets: {len(expected)} expected, {len(missing)} missing, {len(extra)} without documents (not repaired)")
+    return [{"collection": expected[b][0], "id": expected[b][1], "action": "upsert"} for b in missing]
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(COLLECTIONS), help="comma-separated collections to check")
+    parser.add_argument("--ranges", type=int, default=1024, help="token-ring slices per collection")
+    parser.add_argument("--workers", type=int, default=16, help="parallel Cassandra range scans")
+    parser.add_argument("--out", default="repairs.jsonl", help="repair list (JSON lines)")
+    args = parser.parse_args(list(argv))
+
+    only = [c.strip() for c in args.only.split(",") if c.strip()]
+    repairs, buckets = {}, {}
+    for collection in COLLECTIONS:
+        if collection not in only:
+            continue
+        entries, needed = verify_collection(collection, args.ranges, args.workers)
+        for entry in entries:
+            _merge(repairs, entry)
+        buckets.update(needed)
+    for entry in verify_feed_buckets(buckets):
+        _merge(repairs, entry)
+    total = len(repairs)
+    with open(args.out, "w") as out:
+        for entry in repairs.values():
+            out.write(json.dumps(entry) + "\n")
+    if total:
+        print(f"{total} mismatches written to {args.out}")
+        return 1
+    print("MongoDB and Cassandra agree.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
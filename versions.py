@@ -0,0 +1,55 @@
+"""Change versions for conditional GET: one for the feed, one per post, one for every post page.
+
+Versions are stored next to the data they describe (MongoDB change_versions collection,
+Cassandra change_versions table) and every backend create function sets a new one for
+the keys it changes, so a write made by any worker, the write-behind queue, or the
+migration and repair jobs is seen by every process. Routes read the versions of the store
+reads come from with one point read (db.feed_validator / db.post_validator) and answer
+304 before loading any data.
+
+A version is a random token plus the time it was set; the token goes into the ETag and
+the time into Last-Modified. Keys never bumped report version "0" at the epoch.
+
+Last-Modified has whole seconds, so it is the end of the second the newest version was set
+in, and only once that second had passed when the versions were read: before that, a later
+write in the same second would get the same date and If-Modified-Since would miss it. Those
+responses carry no Last-Modified and only the ETag revalidates them.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+FEED = "feed"
+# Changes that can alter any post page: author post counts, bulk copies and repairs.
+ALL_POSTS = "posts"
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def post_key(post_id: str) -> str:
+    return f"post:{post_id}"
+
+
+def new_version() -> tuple[str, datetime]:
+    """(token, naive UTC time) to store for a changed key."""
+    return uuid.uuid4().hex[:16], datetime.utcnow()
+
+
+def validator(
+    name: str, store: str, keys: list[str], found: dict, read_at: datetime, variant: str = ""
+) -> tuple[str, datetime | None]:
+    """(etag, last_modified or None) from the stored versions `found` ({key: (token, at)}) of keys.
+
+    read_at is the naive UTC time taken just before the versions were read. The store name is
+    part of the ETag, so a validator issued while reads came from one backend never matches
+    after READ_SOURCE moves them to the other.
+    """
+    stored = [found.get(k) or ("0", _EPOCH) for k in keys]
+    token = "-".join([name, store[0]] + [v for v, _ in stored])
+    end_of_second = max(at for _, at in stored).replace(microsecond=0) + timedelta(seconds=1)
+    last_modified = end_of_second.replace(tzinfo=timezone.utc) if read_at >= end_of_second else None
+    return f"{token}-{variant}" if variant else token, last_modified
+
+
+def post_validator_keys(post_id: str) -> list[str]:
+    return [post_key(post_id), ALL_POSTS]
@@ -0,0 +1,423 @@
+"""Write-behind for the secondary backend during dual-write (WRITE_BEHIND=true).
+
+db._write stores the entity in the primary store (the one serving reads) synchronously and
+hands the secondary write to submit(), so request latency depends on the primary alone.
+Jobs go to a bounded in-memory queue served by background workers, which retry failures
+with exponential backoff. A job that does not fit in the queue, exhausts its attempts, or
+is still queued or in progress at exit is appended to a local JSON-lines spool file
+(fsynced); workers replay the spool once the queue has room again. Appends and claims hold
+an exclusive flock on the spool, so processes sharing it never append to a file another has
+already claimed. A replaying process claims the spool by renaming it and keeps the claimed
+file until every job in it has been applied or spooled again, recording finished lines in an
+ack file next to it; claimed files left by a process that died are adopted by the next
+replay. The same ids and created_at values are replayed, so the secondary ends up with the
+same rows as the primary.
+
+Retried creates are idempotent upserts in Cassandra. MongoDB creates run with existing_ok,
+so a document an earlier attempt already stored counts as stored and its counter and
+change-version updates run again. Either way a post retried after a partial failure may move
+its author's counter twice (recount_post_counts.py repairs that).
+"""
+
+import atexit
+import contextlib
+import fcntl
+import glob
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import db_cassandra
+import db_mongo
+import metrics
+from config import (
+    WRITE_BEHIND_BACKOFF,
+    WRITE_BEHIND_BACKOFF_MAX,
+    WRITE_BEHIND_MAX_ATTEMPTS,
+    WRITE_BEHIND_QUEUE_SIZE,
+    WRITE_BEHIND_SPOOL_FILE,
+    WRITE_BEHIND_SPOOL_INTERVAL,
+    WRITE_BEHIND_WORKERS,
+)
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_spool_lock = threading.Lock()
+_queue = None
+_pid = None
+_claims = {}  # claimed spool file -> line numbers not yet acked (under _spool_lock)
+_claim_seq = itertools.count()
+_current = {}  # worker thread id -> job it is running or backing off on (under _lock)
+_stats = {"enqueued": 0, "completed": 0, "retries": 0, "spooled": 0, "replayed": 0, "exhausted": 0}
+
+
+def _resolve(fn_name: str):
+    """Backend write function by name; only the create functions may be queued."""
+    module = db_mongo if fn_name.startswith("mongo_") else db_cassandra
+    fn = getattr(module, fn_name, None)
+    if fn is None or "_create_" not in fn_name:
+        raise ValueError(f"not a write-behind function: {fn_name!r}")
+    return fn
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if set(value) == {"$dt"}:
+            return datetime.fromisoformat(value["$dt"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+# --- Spool ---
+
+@contextlib.contextmanager
+def _locked_spool():
+    """The spool file opened for append under an exclusive flock.
+
+    A process that opened the file just before a replayer renamed it gets the lock on the
+    renamed file; it notices the path now names another file and opens the new spool instead.
+    """
+    while True:
+        f = open(WRITE_BEHIND_SPOOL_FILE, "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            current = os.path.samestat(os.fstat(f.fileno()), os.stat(WRITE_BEHIND_SPOOL_FILE))
+        except FileNotFoundError:
+            current = False
+        if current:
+            break
+        f.close()
+    try:
+        yield f
+    finally:
+        f.close()  # releases the lock
+
+
+def _spool(job: dict):
+    """Append a job to the spool file and fsync, so it survives a crash or restart."""
+    line = json.dumps(_encode({k: v for k, v in job.items() if k != "replay"})) + "\n"
+    with _spool_lock, _locked_spool() as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    with _lock:
+        _stats["spooled"] += 1
+    _ack(job)
+
+
+def _ack(job: dict):
+    """Record that a replayed job is done with (applied or spooled again); drops its claimed file once all are."""
+    source = job.pop("replay", None)
+    if source is None:
+        return
+    path, lineno = source
+    with _spool_lock:
+        pending = _claims.get(path)
+        if pending is None or lineno not in pending:
+            return
+        pending.discard(lineno)
+        if pending:
+            with open(path + ".done", "a") as f:
+                f.write(f"{lineno}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return
+    _release(path)
+
+
+def _release(path: str):
+    """Forget a fully acked claimed file and delete it with its ack file."""
+    with _spool_lock:
+        _claims.pop(path, None)
+    for name in (path, path + ".done"):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def _claim_owner_alive(path: str) -> bool:
+    """Whether the process that claimed a spool file is still running (and so still replaying it)."""
+    try:
+        pid = int(path[len(WRITE_BEHIND_SPOOL_FILE) + 1:].split(".", 1)[0])
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return path in _claims  # same pid but unknown: left by an earlier process (e.g. a restarted container)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _claim(path: str) -> str | None:
+    """Rename a spool (or stale claimed) file to a new claim of this process; None if another process got it."""
+    claimed = f"{WRITE_BEHIND_SPOOL_FILE}.{os.getpid()}.{next(_claim_seq)}.replay"
+    try:
+        os.replace(path, claimed)
+    except FileNotFoundError:
+        return None
+    if os.path.exists(path + ".done"):
+        os.replace(path + ".done", claimed + ".done")
+    return claimed
+
+
+def replay_spool() -> int:
+    """Move spooled jobs back onto the queue (those that do not fit are spooled again). Returns jobs moved.
+
+    The spool is claimed by renaming it to a per-process file first, under the spool's flock,
+    so several processes sharing one spool path never replay the same job twice and no append
+    lands in a file after it was claimed. The claimed file stays on disk
+    until each of its jobs is acked, and claimed files of processes that are gone are
+    adopted here, skipping the lines they had already acked.
+    """
+    with _spool_lock:
+        stale = [p for p in glob.glob(glob.escape(WRITE_BEHIND_SPOOL_FILE) + ".*.replay") if not _claim_owner_alive(p)]
+        for done in glob.glob(glob.escape(WRITE_BEHIND_SPOOL_FILE) + ".*.replay.done"):
+            if not os.path.exists(done[:-len(".done")]) and not _claim_owner_alive(done[:-len(".done")]):
+                os.remove(done)  # its claimed file was finished or moved mid-adoption; at worst a few jobs rerun
+        claims = [c for c in map(_claim, stale) if c is not None]
+        if os.path.exists(WRITE_BEHIND_SPOOL_FILE):
+            with _locked_spool():
+                claimed = _claim(WRITE_BEHIND_SPOOL_FILE)
+            if claimed is not None:
+                claims.append(claimed)
+        jobs = []
+        for claimed in claims:
+            try:
+                with open(claimed + ".done") as f:
+                    done = {int(n) for n in f.read().split()}
+            except FileNotFoundError:
+                done = set()
+            with open(claimed) as f:
+                lines = [(n, line.strip()) for n, line in enumerate(f) if n not in done and line.strip()]
+            _claims[claimed] = {n for n, _ in lines}
+            jobs += [(claimed, n, line) for n, line in lines]
+    for claimed in claims:
+        if not _claims.get(claimed):
+            _release(claimed)
+    q = _get_queue()
+    moved = 0
+    for claimed, n, line in jobs:
+        job = _decode(json.loads(line))
+        job["attempts"] = 0
+        job["replay"] = (claimed, n)
+        try:
+            q.put_nowait(job)
+            moved += 1
+        except queue.Full:
+            _spool(job)
+    with _lock:
+        _stats["replayed"] += moved
+    return moved
+
+
+def _spool_replayer():
+    while True:
+        time.sleep(WRITE_BEHIND_SPOOL_INTERVAL)
+        q = _queue
+        if q is None or q.qsize() > WRITE_BEHIND_QUEUE_SIZE // 2:
+            continue
+        try:
+            n = replay_spool()
+            if n:
+                log.info("write-behind: replayed %d spooled writes", n)
+        except Exception as e:
+            log.warning("write-behind: spool replay failed: %s", e)
+
+
+# --- Workers ---
+
+def _run(job: dict):
+    """Apply one job. Returns a job holding the part that still has to be retried, or None when done."""
+    fn = _resolve(job["fn"])
+    # An earlier attempt may have stored the document before failing: MongoDB creates then
+    # finish its counter and version updates instead of failing on the duplicate _id.
+    kwargs = {**job["kwargs"], "existing_ok": True} if job["fn"].startswith("mongo_") else job["kwargs"]
+    try:
+        result = fn(*job["args"], **kwargs)
+    except Exception as e:
+        job["error"] = str(e)
+        return job
+    if isinstance(result, tuple) and job["args"] and isinstance(job["args"][0], list):
+        # Bulk writes report one insert error (or None) per item: retry only the items not stored.
+        # A failed follow-up update (author counters) is not retried, since the items are stored;
+        # recount_post_counts.py repairs it.
+        errors, note = result
+        if note:
+            log.warning("write-behind: %s stored its items, %s", job["fn"], note)
+        failed = [item for item, err in zip(job["args"][0], errors) if err is not None]
+        if failed:
+            return {**job, "args": [failed] + list(job["args"][1:]), "error": f"{len(failed)} items failed"}
+    return None
+
+
+def _worker(q):
+    me = threading.get_ident()
+    while True:
+        job = q.get()
+        with _lock:
+            _current[me] = job
+        try:
+            while True:
+                retry = _run(job)
+                if retry is None:
+                    with _lock:
+                        _stats["completed"] += 1
+                        _current.pop(me, None)
+                    _ack(job)
+                    break
+                job = retry
+                with _lock:
+                    _current[me] = job
+                job["attempts"] = job.get("attempts", 0) + 1
+                if job["attempts"] >= WRITE_BEHIND_MAX_ATTEMPTS:
+                    log.error("write-behind: %s failed %d times, spooled: %s", job["fn"], job["attempts"], job["error"])
+                    with _lock:
+                        _stats["exhausted"] += 1
+                        _current.pop(me, None)
+                    _spool(job)
+                    break
+                with _lock:
+                    _stats["retries"] += 1
+                time.sleep(min(WRITE_BEHIND_BACKOFF * 2 ** (job["attempts"] - 1), WRITE_BEHIND_BACKOFF_MAX))
+        except Exception as e:
+            # A replayed job stays unacked in its claimed file and runs again after a restart.
+            log.exception("write-behind: dropping %s after unexpected error: %s", job.get("fn"), e)
+        finally:
+            with _lock:
+                _current.pop(me, None)
+            q.task_done()
+
+
+def _get_queue():
+    """Queue served by this process's workers (started lazily, restarted after fork)."""
+    global _queue, _pid
+    if _pid == os.getpid():
+        return _queue
+    with _lock:
+        if _pid != os.getpid():
+            q = queue.Queue(maxsize=WRITE_BEHIND_QUEUE_SIZE)
+            for i in range(WRITE_BEHIND_WORKERS):
+                threading.Thread(target=_worker, args=(q,), name=f"write-behind-{i}", daemon=True).start()
+            threading.Thread(target=_spool_replayer, name="write-behind-spool", daemon=True).start()
+            _queue, _pid = q, os.getpid()
+    return _queue
+
+
+def submit(fn, *args, **kwargs):
+    """Queue fn(*args, **kwargs) (a db_mongo / db_cassandra create function); spools if the queue is full."""
+    job = {"fn": fn.__name__, "args": list(args), "kwargs": kwargs, "enqueued_at": time.time(), "attempts": 0}
+    _resolve(job["fn"])
+    with _lock:
+        _stats["enqueued"] += 1
+    try:
+        _get_queue().put_nowait(job)
+    except queue.Full:
+        _spool(job)
+
+
+def drain():
+    """Block until every queued write has been applied or spooled (tests, benchmarks, shutdown)."""
+    q = _queue
+    if q is not None and _pid == os.getpid():
+        q.join()
+
+
+@atexit.register
+def _spool_pending():
+    """At exit, spool writes still queued, running, or waiting out a retry backoff instead of losing them.
+
+    A write that was running may also finish before the process ends; applying it again on
+    replay is safe (see the module docstring).
+    """
+    q = _queue
+    if q is None or _pid != os.getpid():
+        return
+    with _lock:
+        pending = list(_current.values())
+        _current.clear()
+    while True:
+        try:
+            pending.append(q.get_nowait())
+        except queue.Empty:
+            break
+    for job in pending:
+        _spool(job)
+
+
+# --- Observability ---
+
+def queue_depth() -> int:
+    q = _queue
+    return q.qsize() if q is not None and _pid == os.getpid() else 0
+
+
+def lag_seconds() -> float:
+    """Age of the oldest write still waiting in the queue (0 when it is empty)."""
+    q = _queue
+    if q is None or _pid != os.getpid():
+        return 0.0
+    with q.mutex:
+        oldest = q.queue[0]["enqueued_at"] if q.queue else None
+    return time.time() - oldest if oldest is not None else 0.0
+
+
+def spool_bytes() -> int:
+    try:
+        return os.path.getsize(WRITE_BEHIND_SPOOL_FILE)
+    except OSError:
+        return 0
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+    out["lag_seconds"] = lag_seconds()
+    out["queue_depth"] = queue_depth()
+    out["spool_bytes"] = spool_bytes()
+    return out
+
+
+@metrics.collector
+def _write_behind_metrics():
+    st = stats()
+    families = [
+        (f"write_behind_{field}_total", "counter", help_text, [({}, st[field])])
+        for field, help_text in (
+            ("enqueued", "Secondary writes handed to write-behind."),
+            ("completed", "Secondary writes applied."),
+            ("retries", "Retry attempts after a failed secondary write."),
+            ("spooled", "Writes appended to the spool file (overflow, exhausted retries, exit)."),
+            ("replayed", "Spooled writes moved back onto the queue."),
+            ("exhausted", "Writes that ran out of retry attempts."),
+        )
+    ]
+    families += [
+        ("write_behind_queue_depth", "gauge", "Secondary writes waiting for a worker.", [({}, st["queue_depth"])]),
+        ("write_behind_lag_seconds", "gauge", "Age of the oldest queued secondary write.",
+         [({}, st["lag_seconds"])]),
+        ("write_behind_spool_bytes", "gauge", "Size of the spool file.", [({}, st["spool_bytes"])]),
+    ]
+    return families